@@ -44,8 +44,9 @@ const Profile: React.FC = () => {
       const data = await profileService.getProfile();
       setProfile(data);
       reset(data);
-      if (data.profile_picture) {
-        setPreviewUrl(data.profile_picture);
+      const avatarUrl = data.profile_picture_variants?.['256']?.webp || data.profile_picture;
+      if (avatarUrl) {
+        setPreviewUrl(avatarUrl);
       }
     } catch (err) {
       setError('Erro ao carregar perfil');
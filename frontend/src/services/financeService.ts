@@ -1,5 +1,5 @@
 import api from './api';
-import type { Transaction, Category, FinancialSummary } from '../types';
+import type { Transaction, TransactionFilters, Category, FinancialSummary } from '../types';
 
 export const financeService = {
   getFinancialSummary: async (): Promise<FinancialSummary> => {
@@ -28,10 +28,11 @@ export const financeService = {
     }
   },
 
-  getTransactions: async (): Promise<Transaction[]> => {
+  // Os filtros são aplicados no servidor (ver TransactionFilter no backend)
+  getTransactions: async (filters: TransactionFilters = {}): Promise<Transaction[]> => {
     try {
-      console.log('Buscando transações');
-      const response = await api.get('/api/v1/finance/transactions/');
+      console.log('Buscando transações', filters);
+      const response = await api.get('/api/v1/finance/transactions/', { params: filters });
       console.log('Transações recebidas:', response.data);
       
       if (!response.data?.results) {
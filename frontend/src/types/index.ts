@@ -48,6 +48,17 @@ export interface Transaction {
   updated_at?: string;
 }
 
+export interface TransactionFilters {
+  start?: string;
+  end?: string;
+  type?: 'income' | 'expense';
+  category?: number | string;
+  min_amount?: number;
+  max_amount?: number;
+  search?: string;
+  ordering?: 'date' | '-date';
+}
+
 export interface Category {
   id: number;
   name: string;
@@ -69,6 +80,8 @@ export interface UserProfile {
   country?: string;
   birth_date?: string;
   profile_picture?: string;
+  // Variantes redimensionadas por lado em px ('64', '256') e formato
+  profile_picture_variants?: Record<string, { webp?: string; jpeg?: string }>;
   bio?: string;
   created_at?: string;
   updated_at?: string;
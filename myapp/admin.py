@@ -1,4 +1,4 @@
-from .models import Category, Transaction, UserProfile, UserSettings
+from .models import Category, Transaction, MonthlyBalance, UserProfile, UserSettings
 from django.contrib import admin
 
 @admin.register(Category)
@@ -14,6 +14,12 @@ class TransactionAdmin(admin.ModelAdmin):
     search_fields = ('description',)
     date_hierarchy = 'date'
 
+@admin.register(MonthlyBalance)
+class MonthlyBalanceAdmin(admin.ModelAdmin):
+    list_display = ('user', 'month', 'category', 'type', 'total', 'count')
+    list_filter = ('type', 'user', 'month')
+    date_hierarchy = 'month'
+
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'phone', 'city', 'state', 'country')
@@ -0,0 +1,126 @@
+import functools
+import logging
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.exceptions import APIException, MethodNotAllowed, NotAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .fast_serializers import ValuesSerializer
+from .filters import filter_transactions
+from .pagination import AsyncPageNumberPagination, TransactionCursorPagination
+from .serializers import CategorySerializer, TransactionSerializer
+from ...balances import add_running_balances, wants_running_balance
+from ...authentication import CachedJWTAuthentication
+from ...cache import app_cache
+from ...categories import CATEGORY_LIST_NAMESPACE, category_list_cache_part
+from ...me import aget_me_payload
+from ...metrics import timed
+from ...models import Category, Transaction
+from ...summary import aget_financial_summary
+
+logger = logging.getLogger(__name__)
+
+# Views assíncronas (Django puro, sem o dispatch síncrono do DRF) para as
+# leituras mais frequentes. Sob ASGI rodam no event loop, sem o salto para o
+# pool de threads de cada view síncrona; as respostas são as mesmas das
+# views do DRF correspondentes.
+
+authenticator = CachedJWTAuthentication()
+renderer = JSONRenderer()
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    return HttpResponse(renderer.render(data), content_type=renderer.media_type, status=status)
+
+
+def error_response(request, exc):
+    # Mesmo corpo do exception_handler do DRF
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = json_response(data, exc.status_code)
+    if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+        response['WWW-Authenticate'] = authenticator.authenticate_header(request)
+    return response
+
+
+def async_api_view(view):
+    # GET autenticado por JWT; a view recebe o usuário já resolvido
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            if request.method != 'GET':
+                raise MethodNotAllowed(request.method)
+            authenticated = await authenticator.aauthenticate(request)
+            if authenticated is None:
+                raise NotAuthenticated()
+            return await view(request, authenticated[0], *args, **kwargs)
+        except APIException as exc:
+            return error_response(request, exc)
+    return wrapper
+
+
+async def paginated_values(request, queryset, serializer_class, context, paginator, decorate=None):
+    fast_serializer = ValuesSerializer.for_serializer(serializer_class)
+    fields = await sync_to_async(fast_serializer.get_fields)(context)
+    page = await paginator.apaginate_queryset(fast_serializer.values(queryset), request)
+    with timed('serializer'):
+        data = fast_serializer.many(page, fields=fields)
+    if decorate is not None:
+        await sync_to_async(decorate)(page, data)
+    return paginator.get_paginated_response(data).data
+
+
+@async_api_view
+async def financial_summary(request, user):
+    try:
+        return json_response(await aget_financial_summary(user))
+    except Exception as e:
+        logger.error("Erro ao gerar resumo financeiro: %s", e)
+        return json_response(
+            {'error': 'Erro ao gerar resumo financeiro'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@async_api_view
+async def transaction_list(request, user):
+    request = Request(request)
+    if TransactionCursorPagination.is_requested(request):
+        paginator = TransactionCursorPagination()
+    else:
+        paginator = AsyncPageNumberPagination()
+    decorate = None
+    if wants_running_balance(request):
+        decorate = functools.partial(add_running_balances, user)
+    queryset = filter_transactions(request, Transaction.objects.filter(user=user).order_by('-date', '-id'))
+    data = await paginated_values(
+        request, queryset, TransactionSerializer, {'user_id': user.pk}, paginator, decorate
+    )
+    return json_response(data)
+
+
+@async_api_view
+async def category_list(request, user):
+    async def build():
+        queryset = Category.objects.filter(user=user).order_by('id')
+        return await paginated_values(
+            Request(request), queryset, CategorySerializer, {'user_id': user.pk}, AsyncPageNumberPagination()
+        )
+    data = await app_cache.aget_or_set(
+        CATEGORY_LIST_NAMESPACE, user.pk, category_list_cache_part(request), default=build
+    )
+    return json_response(data)
+
+
+@async_api_view
+async def me(request, user):
+    payload = await aget_me_payload(user, {'request': request})
+    response = json_response(payload['data'])
+    response['ETag'] = payload['etag']
+    response['Last-Modified'] = http_date(payload['last_modified'].timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,133 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+
+def _identity(value):
+    return value
+
+
+def _is_iso_8601(field, default):
+    output_format = getattr(field, 'format', default)
+    return isinstance(output_format, str) and output_format.lower() == ISO_8601
+
+
+def _date_converter(field):
+    if not _is_iso_8601(field, api_settings.DATE_FORMAT):
+        return field.to_representation
+    return lambda value: value.isoformat()
+
+
+def _datetime_converter(field):
+    if not _is_iso_8601(field, api_settings.DATETIME_FORMAT):
+        return field.to_representation
+
+    # O fuso do campo é resolvido uma vez por listagem, não por valor
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+
+    def convert(value):
+        if field_timezone is not None and value.tzinfo is not None:
+            value = value.astimezone(field_timezone)
+        else:
+            value = field.enforce_timezone(value)
+        value = value.isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+def _decimal_converter(field):
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.normalize_output or field.decimal_places is None:
+        return field.to_representation
+    exponent = Decimal(1).scaleb(-field.decimal_places)
+    return lambda value: '{:f}'.format(value.quantize(exponent))
+
+
+def build_converter(field):
+    # Conversores equivalentes ao to_representation do DRF para os tipos
+    # usados nos serializers da API; os demais caem no próprio campo.
+    if isinstance(field, serializers.DecimalField):
+        return _decimal_converter(field)
+    if isinstance(field, serializers.DateTimeField):
+        return _datetime_converter(field)
+    if isinstance(field, serializers.DateField):
+        return _date_converter(field)
+    if isinstance(field, (serializers.PrimaryKeyRelatedField, serializers.ChoiceField, serializers.CharField,
+                          serializers.IntegerField, serializers.BooleanField)):
+        return _identity
+    return field.to_representation
+
+
+class ValuesSerializer:
+    """
+    Caminho de leitura rápido para listas: monta os dicionários direto das
+    linhas de ``.values()``, com os conversores calculados uma vez a partir
+    dos campos do serializer original. A saída é a mesma do ModelSerializer;
+    escrita e validação continuam no serializer original.
+    """
+    _cache = {}
+
+    def __init__(self, serializer_class):
+        self.serializer_fields = [field for field in serializer_class().fields.values() if not field.write_only]
+        self.sources = {self._row_key(field): field.source_attrs for field in self.serializer_fields}
+        self._converters = {}
+
+    @staticmethod
+    def _row_key(field):
+        # Campos de relação (ex.: category.name) viram anotações com o nome do campo
+        return field.source_attrs[0] if len(field.source_attrs) == 1 else field.field_name
+
+    @classmethod
+    def for_serializer(cls, serializer_class):
+        if serializer_class not in cls._cache:
+            cls._cache[serializer_class] = cls(serializer_class)
+        return cls._cache[serializer_class]
+
+    def values(self, queryset):
+        # Atributos de relações entram como subconsulta correlacionada, e não
+        # como JOIN: o COUNT(*) da paginação descarta a anotação e continua
+        # lendo só a tabela principal, e a subconsulta roda apenas nas linhas
+        # da página.
+        lookups = []
+        expressions = {}
+        for key, source_attrs in self.sources.items():
+            if len(source_attrs) == 1:
+                lookups.append(key)
+            else:
+                relation = queryset.model._meta.get_field(source_attrs[0])
+                related = relation.related_model._default_manager.filter(
+                    pk=OuterRef(relation.attname)
+                ).values('__'.join(source_attrs[1:]))[:1]
+                expressions[key] = Subquery(related)
+        return queryset.values(*lookups, **expressions)
+
+    def get_fields(self, context=None):
+        # Conversores por fuso ativo (datetimes dependem do timezone corrente);
+        # campos com values_converter dependem do contexto (ex.: usuário) e
+        # são resolvidos a cada listagem.
+        key = timezone.get_current_timezone_name() if settings.USE_TZ else None
+        if key not in self._converters:
+            self._converters[key] = [
+                (field.field_name, self._row_key(field), build_converter(field), getattr(field, 'values_converter', None))
+                for field in self.serializer_fields
+            ]
+        return [
+            (name, row_key, values_converter(context or {}) if values_converter else convert)
+            for name, row_key, convert, values_converter in self._converters[key]
+        ]
+
+    def to_representation(self, row, fields=None, context=None):
+        return {
+            name: None if row[key] is None else convert(row[key])
+            for name, key, convert in fields or self.get_fields(context)
+        }
+
+    def many(self, rows, context=None, fields=None):
+        fields = fields or self.get_fields(context)
+        to_representation = self.to_representation
+        return [to_representation(row, fields) for row in rows]
@@ -0,0 +1,70 @@
+import django_filters
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import serializers
+
+from .pagination import TransactionCursorPagination
+from ...models import Transaction
+from ...search import search_transactions
+
+# Só ordenações servidas pelos índices compostos (user, date), (user, type,
+# date) e (category, date), percorridos nos dois sentidos; o id desempata e
+# vem de graça no índice do SQLite. Ordenar por valor exigiria ordenar em
+# memória todas as transações filtradas.
+TRANSACTION_ORDERINGS = {
+    '-date': ('-date', '-id'),
+    'date': ('date', 'id'),
+}
+DEFAULT_TRANSACTION_ORDERING = '-date'
+
+
+class NumberInFilter(django_filters.BaseInFilter, django_filters.NumberFilter):
+    pass
+
+
+class TransactionFilter(django_filters.FilterSet):
+    start = django_filters.DateFilter(field_name='date', lookup_expr='gte')
+    end = django_filters.DateFilter(field_name='date', lookup_expr='lte')
+    type = django_filters.ChoiceFilter(choices=Transaction.TYPE_CHOICES)
+    # ?category=3 ou ?category=3,7; o queryset já é restrito ao usuário
+    category = NumberInFilter(field_name='category_id')
+    min_amount = django_filters.NumberFilter(field_name='amount', lookup_expr='gte')
+    max_amount = django_filters.NumberFilter(field_name='amount', lookup_expr='lte')
+    search = django_filters.CharFilter(method='filter_search')
+    ordering = django_filters.ChoiceFilter(
+        choices=[(value, value) for value in TRANSACTION_ORDERINGS], method='filter_ordering'
+    )
+
+    class Meta:
+        model = Transaction
+        fields = []
+
+    def filter_search(self, queryset, name, value):
+        return search_transactions(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*TRANSACTION_ORDERINGS[value])
+
+    def is_valid(self):
+        valid = super().is_valid()
+        ordering = self.form.cleaned_data.get('ordering') if valid else None
+        # O cursor guarda a posição em (date, id) do mais recente para o mais antigo
+        if ordering and ordering != DEFAULT_TRANSACTION_ORDERING and TransactionCursorPagination.is_requested(self.request):
+            self.form.add_error('ordering', 'A paginação por cursor só aceita ordering=-date.')
+            valid = False
+        return valid
+
+
+def filter_transactions(request, queryset):
+    # Usado pelo filter backend das views do DRF e pela listagem assíncrona;
+    # só monta o queryset, sem consultas ao banco
+    filterset = TransactionFilter(request.query_params, queryset=queryset, request=request)
+    if not filterset.is_valid():
+        raise serializers.ValidationError({'error': 'Dados inválidos', 'details': filterset.errors})
+    return filterset.qs
+
+
+class TransactionFilterBackend(DjangoFilterBackend):
+    # Erros de filtro no formato de erro da API (400 com error/details)
+    def filter_queryset(self, request, queryset, view):
+        return filter_transactions(request, queryset)
+
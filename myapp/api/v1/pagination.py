@@ -0,0 +1,180 @@
+from base64 import b64decode, b64encode
+import asyncio
+from datetime import date
+from urllib import parse
+
+from django.core.paginator import InvalidPage, Page
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+MAX_CURSOR_ID = 2 ** 63 - 1
+
+
+class TransactionCursorPagination(CursorPagination):
+    """
+    Paginação por chave (keyset) em (date, id), do mais recente para o mais antigo.
+
+    Diferente do CursorPagination padrão, a posição guarda os dois campos da
+    ordenação, então a próxima página é um WHERE (date, id) < (?, ?) sobre o
+    índice (user, date) — sem COUNT(*) e sem OFFSET, o custo não cresce com a
+    profundidade da página. É opcional: ativada com ?pagination=cursor ou
+    quando a requisição já traz um cursor.
+    """
+    mode_query_param = 'pagination'
+    mode_query_value = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-date', '-id')
+    invalid_cursor_message = 'Cursor inválido'
+
+    @classmethod
+    def is_requested(cls, request):
+        if request is None:
+            return False
+        params = request.query_params
+        return params.get(cls.mode_query_param) == cls.mode_query_value or cls.cursor_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.set_page([item async for item in queryset])
+
+    def get_page_queryset(self, queryset, request):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.position, self.reverse = self.decode_cursor(request)
+        position = self.position
+
+        if self.reverse:
+            queryset = queryset.order_by('date', 'id')
+            if position is not None:
+                queryset = queryset.filter(Q(date__gt=position[0]) | Q(date=position[0], id__gt=position[1]))
+        else:
+            queryset = queryset.order_by('-date', '-id')
+            if position is not None:
+                queryset = queryset.filter(Q(date__lt=position[0]) | Q(date=position[0], id__lt=position[1]))
+
+        # Busca um item a mais para saber se existe outra página
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+            self.has_next = self.position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.page:
+            return self.encode_cursor((self._get_position(self.page[-1]), False))
+        return self.encode_cursor((self.position, False))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            return self.encode_cursor((self._get_position(self.page[0]), True))
+        return self.encode_cursor((self.position, True))
+
+    def _get_position(self, item):
+        # Aceita instâncias e linhas de .values()
+        if isinstance(item, dict):
+            return item['date'], item['id']
+        return item.date, item.pk
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            querystring = b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            position = (date.fromisoformat(tokens['d'][0]), int(tokens['i'][0]))
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+            # Um id fora do INTEGER de 64 bits estouraria no banco (500)
+            if not 0 <= position[1] <= MAX_CURSOR_ID:
+                raise ValueError(position[1])
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, cursor):
+        (position_date, position_id), reverse = cursor
+        tokens = {'d': position_date.isoformat(), 'i': position_id}
+        if reverse:
+            tokens['r'] = '1'
+        querystring = parse.urlencode(tokens)
+        encoded = b64encode(querystring.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    # Paginação por número de página das views assíncronas, com a mesma
+    # resposta da PageNumberPagination: o COUNT(*) e a página são buscados
+    # juntos, e o número da página é validado depois com o total em mãos.
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        # Sem get_page_number(): ele resolve "last" com um COUNT síncrono
+        page_number = request.query_params.get(self.page_query_param) or 1
+        try:
+            number = int(page_number)
+        except (TypeError, ValueError):
+            # "last" ou valor inválido: precisa do total antes da página
+            number = None
+
+        if number is not None and number >= 1:
+            bottom = (number - 1) * page_size
+            count, rows = await asyncio.gather(
+                queryset.acount(), alist(queryset[bottom:bottom + page_size])
+            )
+            paginator.count = count
+        else:
+            paginator.count = await queryset.acount()
+            if page_number in self.last_page_strings:
+                page_number = paginator.num_pages
+            rows = None
+
+        try:
+            validated = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(page_number=page_number, message=str(exc))
+            raise NotFound(msg)
+        if rows is None or validated != number:
+            bottom = (validated - 1) * page_size
+            rows = await alist(queryset[bottom:bottom + page_size])
+
+        self.page = Page(rows, validated, paginator)
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        return list(self.page)
+
+
+async def alist(queryset):
+    return [item async for item in queryset]
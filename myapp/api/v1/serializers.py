@@ -1,11 +1,93 @@
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from ...categories import build_category, get_category_map
+from ...images import InvalidImage, inspect_image, schedule_profile_picture_variants, store_profile_picture
+from ...metrics import timed
 from ...models import Category, Transaction, UserProfile, UserSettings
+from ...timeseries import (
+    GRANULARITIES,
+    TIMESERIES_MAX_BUCKETS,
+    TIMESERIES_MAX_DATE,
+    TIMESERIES_MAX_POINTS,
+    TIMESERIES_MIN_DATE,
+    count_buckets,
+    default_range,
+)
 import logging
 
 logger = logging.getLogger(__name__)
 
-class UserSettingsSerializer(serializers.ModelSerializer):
+class EagerLoadingMixin:
+    # Relações que o serializer acessa ao renderizar; as views aplicam
+    # select_related/prefetch_related com base nelas para evitar N+1.
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return queryset
+
+class TimedSerializerMixin:
+    # Tempo de validação e renderização, somado em "serializer" no
+    # Server-Timing e nas métricas do endpoint (myapp.metrics)
+    def to_representation(self, instance):
+        with timed('serializer'):
+            return super().to_representation(instance)
+
+    def run_validation(self, data=serializers.empty):
+        with timed('serializer'):
+            return super().run_validation(data)
+
+def context_user_id(context):
+    request = context.get('request')
+    return request.user.pk if request is not None else context.get('user_id')
+
+class UserCategoryField(serializers.PrimaryKeyRelatedField):
+    # Resolve a categoria pelo mapa do usuário (myapp.categories), sem
+    # consulta; a de outro usuário é tratada como inexistente.
+    default_error_messages = {
+        'does_not_exist': 'Categoria inválida.',
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        category = build_category(context_user_id(self.context), pk)
+        if category is None:
+            self.fail('does_not_exist', pk_value=data)
+        return category
+
+class CategoryNameField(serializers.ReadOnlyField):
+    # Nome da categoria pelo mapa do usuário a partir de category_id, sem JOIN
+    def __init__(self, **kwargs):
+        kwargs.setdefault('source', 'category_id')
+        super().__init__(**kwargs)
+
+    def values_converter(self, context):
+        # Usado também pelo ValuesSerializer: o mapa é lido uma vez por listagem
+        categories = get_category_map(context_user_id(context))
+
+        def convert(category_id):
+            category = categories.get(category_id)
+            return category[0] if category is not None else None
+        return convert
+
+    def to_representation(self, value):
+        if not hasattr(self, '_convert'):
+            self._convert = self.values_converter(self.context)
+        return self._convert(value)
+
+class UserSettingsSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = UserSettings
         fields = [
@@ -26,20 +108,65 @@ class UserSettingsSerializer(serializers.ModelSerializer):
         settings.save()
         return settings
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class ProfilePictureField(serializers.FileField):
+    # Valida só o cabeçalho da imagem (formato, tamanho e dimensões), sem
+    # decodificar os pixels como o ImageField do DRF
+    def to_internal_value(self, data):
+        upload = super().to_internal_value(data)
+        try:
+            inspect_image(upload)
+        except InvalidImage as e:
+            raise serializers.ValidationError(str(e))
+        return upload
+
+class UserProfileSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(read_only=True)
+    profile_picture = ProfilePictureField(required=False, allow_null=True)
+    profile_picture_variants = serializers.SerializerMethodField()
     
     class Meta:
         model = UserProfile
-        fields = ('id', 'user', 'phone', 'address', 'city', 'state', 'country', 'birth_date', 'profile_picture', 'bio', 'created_at', 'updated_at')
+        fields = ('id', 'user', 'phone', 'address', 'city', 'state', 'country', 'birth_date', 'profile_picture', 'profile_picture_variants', 'bio', 'created_at', 'updated_at')
         read_only_fields = ('id', 'user', 'created_at', 'updated_at')
 
+    def get_profile_picture_variants(self, obj):
+        # {"64": {"webp": url, "jpeg": url}, "256": {...}}; vazio até as
+        # variantes da foto atual ficarem prontas
+        request = self.context.get('request')
+        storage = obj.profile_picture.storage
+        return {
+            size: {
+                variant_format: request.build_absolute_uri(storage.url(name)) if request else storage.url(name)
+                for variant_format, name in formats.items()
+            }
+            for size, formats in obj.profile_picture_variants.items()
+        }
+
+    def store_picture(self, validated_data):
+        # A foto é gravada com nome pelo conteúdo; as variantes da anterior deixam de valer
+        if 'profile_picture' in validated_data:
+            upload = validated_data['profile_picture']
+            validated_data['profile_picture'] = store_profile_picture(upload) if upload else None
+            validated_data['profile_picture_variants'] = {}
+        return validated_data
+
+    def save_picture_variants(self, instance, validated_data):
+        if validated_data.get('profile_picture'):
+            schedule_profile_picture_variants(instance)
+        return instance
+
     def create(self, validated_data):
-        logger.info(f"Criando perfil de usuário: {validated_data}")
+        logger.debug("Criando perfil de usuário: %s", validated_data)
         validated_data['user'] = self.context['request'].user
-        return super().create(validated_data)
+        validated_data = self.store_picture(validated_data)
+        return self.save_picture_variants(super().create(validated_data), validated_data)
 
-class UserSerializer(serializers.ModelSerializer):
+    def update(self, instance, validated_data):
+        validated_data = self.store_picture(validated_data)
+        return self.save_picture_variants(super().update(instance, validated_data), validated_data)
+
+class UserSerializer(TimedSerializerMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    select_related_fields = ('profile', 'settings')
     password2 = serializers.CharField(write_only=True)
     profile = UserProfileSerializer(read_only=True)
     settings = UserSettingsSerializer(read_only=True)
@@ -56,21 +183,21 @@ class UserSerializer(serializers.ModelSerializer):
         }
 
     def validate_username(self, value):
-        logger.info(f"Validando username: {value}")
+        logger.debug("Validando username: %s", value)
         if User.objects.filter(username=value).exists():
-            logger.error(f"Username já existe: {value}")
+            logger.error("Username já existe: %s", value)
             raise serializers.ValidationError("Este nome de usuário já está em uso.")
         return value
 
     def validate_email(self, value):
-        logger.info(f"Validando email: {value}")
+        logger.debug("Validando email: %s", value)
         if User.objects.filter(email=value).exists():
-            logger.error(f"Email já existe: {value}")
+            logger.error("Email já existe: %s", value)
             raise serializers.ValidationError("Este email já está em uso.")
         return value
 
     def validate(self, data):
-        logger.info("Validando dados do usuário")
+        logger.debug("Validando dados do usuário")
         if not data.get('password'):
             logger.error("Senha não fornecida")
             raise serializers.ValidationError({"password": "A senha é obrigatória."})
@@ -90,7 +217,7 @@ class UserSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data):
-        logger.info("Criando novo usuário")
+        logger.debug("Criando novo usuário")
         try:
             validated_data.pop('password2')
             user = User.objects.create_user(
@@ -98,43 +225,62 @@ class UserSerializer(serializers.ModelSerializer):
                 email=validated_data['email'],
                 password=validated_data['password']
             )
-            logger.info(f"Usuário criado com sucesso: {user.username}")
+            logger.info("Usuário criado com sucesso: %s", user.username)
             return user
         except Exception as e:
-            logger.error(f"Erro ao criar usuário: {str(e)}", exc_info=True)
+            logger.error("Erro ao criar usuário: %s", e, exc_info=True)
             raise
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ('id', 'name', 'type', 'created_at', 'updated_at')
         read_only_fields = ('id', 'created_at', 'updated_at')
 
-    def validate(self, data):
-        logger.info(f"Validando dados da categoria: {data}")
-        user = self.context['request'].user
-        
-        # Verificar se já existe uma categoria com o mesmo nome e tipo para o usuário
-        if Category.objects.filter(
-            user=user,
-            name=data['name'],
-            type=data['type']
-        ).exists():
-            logger.error(f"Categoria já existe: {data['name']} ({data['type']})")
+    # A unicidade (nome, tipo) por usuário fica com o unique_together do
+    # modelo: sem consulta prévia, e sem corrida entre duas requisições.
+    def create(self, validated_data):
+        logger.debug("Criando categoria: %s", validated_data)
+        validated_data['user'] = self.context['request'].user
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            raise self.duplicate_error(validated_data)
+
+    def validate_type(self, value):
+        # Trocar o tipo deixaria as transações da categoria com o tipo antigo
+        # (e o consolidado mensal no tipo errado)
+        if self.instance is not None and value != self.instance.type and self.instance.transactions.exists():
             raise serializers.ValidationError(
-                f"Já existe uma categoria com o nome '{data['name']}' para o tipo {data['type']}."
+                "Não é possível alterar o tipo de uma categoria que já possui transações."
             )
-        
-        return data
+        return value
 
-    def create(self, validated_data):
-        logger.info(f"Criando categoria: {validated_data}")
-        validated_data['user'] = self.context['request'].user
-        return super().create(validated_data)
+    def update(self, instance, validated_data):
+        try:
+            with transaction.atomic():
+                return super().update(instance, validated_data)
+        except IntegrityError:
+            raise self.duplicate_error({
+                'name': validated_data.get('name', instance.name),
+                'type': validated_data.get('type', instance.type),
+            })
+
+    @staticmethod
+    def duplicate_error(data):
+        logger.error("Categoria já existe: %s (%s)", data['name'], data['type'])
+        # IntegrityError do unique_together vira o mesmo non_field_errors que o
+        # UniqueTogetherValidator do DRF produziria
+        return serializers.ValidationError({
+            api_settings.NON_FIELD_ERRORS_KEY: [
+                f"Já existe uma categoria com o nome '{data['name']}' para o tipo {data['type']}."
+            ]
+        })
 
-class TransactionSerializer(serializers.ModelSerializer):
-    category_name = serializers.CharField(source='category.name', read_only=True)
-    category = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all(), required=True)
+class TransactionSerializer(TimedSerializerMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    category_name = CategoryNameField()
+    category = UserCategoryField(queryset=Category.objects.all(), required=True)
 
     class Meta:
         model = Transaction
@@ -142,19 +288,75 @@ class TransactionSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'created_at', 'updated_at')
 
     def validate(self, data):
-        logger.info(f"Validando dados da transação: {data}")
+        logger.debug("Validando dados da transação: %s", data)
         user = self.context['request'].user
-        
-        # Verificar se a categoria pertence ao usuário
-        if data['category'].user != user:
-            logger.error(f"Categoria não pertence ao usuário: {data['category'].name}")
+
+        # A posse da categoria já foi verificada pelo campo; aqui o tipo da
+        # transação precisa ser o mesmo da categoria (no PATCH, vale o que
+        # não foi enviado)
+        categories = get_category_map(user.pk)
+        category_id = data['category'].pk if 'category' in data else self.instance.category_id
+        transaction_type = data['type'] if 'type' in data else self.instance.type
+        if category_id not in categories:
             raise serializers.ValidationError(
                 {"category": "Categoria inválida."}
             )
-        
+        if categories[category_id][1] != transaction_type:
+            logger.error("Tipo da transação difere do da categoria: %s", categories[category_id][0])
+            raise serializers.ValidationError(
+                {"type": "O tipo da transação deve ser o mesmo da categoria."}
+            )
+
         return data
 
     def create(self, validated_data):
-        logger.info(f"Criando transação: {validated_data}")
+        logger.debug("Criando transação: %s", validated_data)
         validated_data['user'] = self.context['request'].user
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+class TransactionBulkItemSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    # A categoria é validada em lote pela view (uma consulta para todas as linhas)
+    category = serializers.IntegerField(source='category_id')
+
+    class Meta:
+        model = Transaction
+        fields = ('amount', 'description', 'date', 'type', 'category')
+
+class TimeseriesQuerySerializer(TimedSerializerMixin, serializers.Serializer):
+    # Parâmetros de /finance/timeseries/; o tamanho da resposta é limitado
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    granularity = serializers.ChoiceField(choices=GRANULARITIES, default='month')
+    by_category = serializers.BooleanField(default=False)
+
+    def validate_date(self, value):
+        if not TIMESERIES_MIN_DATE <= value <= TIMESERIES_MAX_DATE:
+            raise serializers.ValidationError(
+                f'Use uma data entre {TIMESERIES_MIN_DATE.isoformat()} e {TIMESERIES_MAX_DATE.isoformat()}.'
+            )
+        return value
+
+    validate_start = validate_end = validate_date
+
+    def validate(self, data):
+        # Sem datas: o intervalo padrão da granularidade; só com "end": o
+        # mesmo tamanho do padrão, terminando em "end"
+        default_start, default_end = default_range(data['granularity'])
+        data.setdefault('end', default_end)
+        data.setdefault('start', data['end'] - (default_end - default_start))
+        if data['start'] > data['end']:
+            raise serializers.ValidationError({'start': 'A data inicial deve ser anterior à final.'})
+
+        buckets = count_buckets(data['start'], data['end'], data['granularity'])
+        if buckets > TIMESERIES_MAX_BUCKETS:
+            raise serializers.ValidationError(
+                f"Intervalo muito grande: {buckets} períodos (máximo {TIMESERIES_MAX_BUCKETS}). "
+                "Use uma granularidade maior."
+            )
+        if data['by_category']:
+            points = buckets * len(get_category_map(context_user_id(self.context)))
+            if points > TIMESERIES_MAX_POINTS:
+                raise serializers.ValidationError(
+                    f"Intervalo muito grande para separar por categoria (máximo {TIMESERIES_MAX_POINTS} pontos)."
+                )
+        return data
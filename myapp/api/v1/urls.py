@@ -1,5 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
+from ...metrics import metrics_view
 from .views import (
     RegisterView,
     UserViewSet,
@@ -8,7 +10,9 @@ from .views import (
     CategoryViewSet,
     TransactionViewSet,
     FinancialSummaryView,
+    FinancialTimeseriesView,
     UserMeView,
+    UserProfileUpdateView,
 )
 
 router = DefaultRouter()
@@ -19,8 +23,17 @@ router.register(r'finance/categories', CategoryViewSet, basename='category')
 router.register(r'finance/transactions', TransactionViewSet, basename='transaction')
 
 urlpatterns = [
+    path('users/me/profile/', UserProfileUpdateView.as_view(), name='user-me-profile'),
     path('', include(router.urls)),
     path('register/', RegisterView.as_view(), name='register'),
     path('me/', UserMeView.as_view(), name='user-me'),
     path('finance/summary/', FinancialSummaryView.as_view(), name='finance-summary'),
+    path('finance/timeseries/', FinancialTimeseriesView.as_view(), name='finance-timeseries'),
+    # Variantes assíncronas (ASGI) das leituras mais frequentes
+    path('async/finance/summary/', async_views.financial_summary, name='async-finance-summary'),
+    path('async/finance/transactions/', async_views.transaction_list, name='async-transaction-list'),
+    path('async/finance/categories/', async_views.category_list, name='async-category-list'),
+    path('async/me/', async_views.me, name='async-user-me'),
+    # Histogramas por endpoint no formato do Prometheus (myapp.metrics)
+    path('_metrics', metrics_view, name='metrics'),
 ] 
\ No newline at end of file
@@ -1,38 +1,96 @@
-from rest_framework import status, generics, viewsets, permissions
+from rest_framework import status, generics, viewsets, permissions, serializers
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
-from django.db.models import Sum, Q
-from django.utils import timezone
-from datetime import timedelta
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date
 from .serializers import (
     UserSerializer,
     UserProfileSerializer,
     UserSettingsSerializer,
     CategorySerializer,
     TransactionSerializer,
+    TransactionBulkItemSerializer,
+    TimeseriesQuerySerializer,
 )
-from ...models import Category, Transaction, UserProfile, UserSettings
+from .fast_serializers import ValuesSerializer
+from .filters import TransactionFilter, TransactionFilterBackend
+from .pagination import TransactionCursorPagination
+from ...balances import add_running_balances, wants_running_balance
+from ...bulk import bulk_create_transactions, upsert_categories
+from ...categories import get_category_list, get_category_map
+from ...exporters import EXPORT_FORMATS, iter_export
+from ...importers import STATEMENT_FORMATS, StatementImporter, detect_format
+from ...me import get_me_payload
+from ...metrics import timed
+from ...models import Category, Transaction, UserProfile, UserSettings, ensure_user_rows
+from ...summary import get_financial_summary
+from ...timeseries import get_financial_timeseries
+import csv
 import logging
 
 logger = logging.getLogger(__name__)
 
+BULK_MAX_ROWS = 5000
+
+class EagerLoadingViewMixin:
+    # filter_queryset é chamado tanto no list quanto no get_object (retrieve,
+    # update, destroy), então o formato da consulta segue o serializer em uso.
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        setup_eager_loading = getattr(self.get_serializer_class(), 'setup_eager_loading', None)
+        return setup_eager_loading(queryset) if setup_eager_loading else queryset
+
+class FastListMixin:
+    # Listagens renderizadas a partir de .values() pelo ValuesSerializer,
+    # sem instanciar modelos nem passar pelo to_representation do DRF.
+    def list(self, request, *args, **kwargs):
+        fast_serializer = ValuesSerializer.for_serializer(self.get_serializer_class())
+        queryset = fast_serializer.values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            with timed('serializer'):
+                data = self.serialize_rows(fast_serializer, page)
+            return self.get_paginated_response(data)
+        rows = list(queryset)
+        with timed('serializer'):
+            data = self.serialize_rows(fast_serializer, rows)
+        return Response(data)
+
+    def serialize_rows(self, fast_serializer, rows):
+        return fast_serializer.many(rows, self.get_serializer_context())
+
+class MePayloadMixin:
+    # /me e /users/me/ servem o payload em cache com ETag e Last-Modified; o
+    # ConditionalGetMiddleware responde 304 quando o cliente já tem a versão.
+    def retrieve(self, request, *args, **kwargs):
+        payload = get_me_payload(request.user, self.get_serializer_context())
+        response = Response(payload['data'])
+        response['ETag'] = payload['etag']
+        response['Last-Modified'] = http_date(payload['last_modified'].timestamp())
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
 class RegisterView(generics.CreateAPIView):
     permission_classes = [AllowAny]
     serializer_class = UserSerializer
 
     def create(self, request, *args, **kwargs):
-        logger.info(f"[REGISTRO] Recebendo requisição de registro: {request.method} {request.path}")
-        logger.info(f"[REGISTRO] Headers da requisição: {dict(request.headers)}")
-        logger.info(f"[REGISTRO] Dados recebidos: {request.data}")
+        logger.debug("[REGISTRO] Recebendo requisição de registro: %s %s", request.method, request.path)
+        logger.debug("[REGISTRO] Headers da requisição: %s", request.headers)
+        logger.debug("[REGISTRO] Dados recebidos: %s", request.data)
         
         serializer = self.get_serializer(data=request.data)
         
         if not serializer.is_valid():
-            logger.error(f"[REGISTRO] Erros de validação: {serializer.errors}")
+            logger.error("[REGISTRO] Erros de validação: %s", serializer.errors)
             return Response({
                 'error': 'Dados inválidos',
                 'details': serializer.errors
@@ -41,26 +99,26 @@ class RegisterView(generics.CreateAPIView):
         try:
             # Validar a senha
             password = request.data.get('password')
-            logger.info("[REGISTRO] Validando senha...")
+            logger.debug("[REGISTRO] Validando senha...")
             validate_password(password)
             
             # Criar o usuário
-            logger.info("[REGISTRO] Criando usuário...")
+            logger.debug("[REGISTRO] Criando usuário...")
             user = serializer.save()
-            logger.info(f"[REGISTRO] Usuário criado com sucesso: {user.username}")
+            logger.info("[REGISTRO] Usuário criado com sucesso: %s", user.username)
             
             return Response({
                 'message': 'Usuário criado com sucesso',
                 'user': serializer.data
             }, status=status.HTTP_201_CREATED)
         except ValidationError as e:
-            logger.error(f"[REGISTRO] Erro de validação da senha: {e}")
+            logger.error("[REGISTRO] Erro de validação da senha: %s", e)
             return Response({
                 'error': 'Senha inválida',
                 'details': list(e.messages)
             }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            logger.error(f"[REGISTRO] Erro inesperado ao criar usuário: {str(e)}", exc_info=True)
+            logger.error("[REGISTRO] Erro inesperado ao criar usuário: %s", e, exc_info=True)
             return Response({
                 'error': 'Erro ao criar usuário',
                 'details': str(e)
@@ -82,7 +140,7 @@ class UserSettingsViewSet(viewsets.ModelViewSet):
     def perform_update(self, serializer):
         serializer.save(user=self.request.user)
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(MePayloadMixin, EagerLoadingViewMixin, viewsets.ModelViewSet):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -90,7 +148,7 @@ class UserViewSet(viewsets.ModelViewSet):
         return User.objects.filter(id=self.request.user.id)
 
     def get_object(self):
-        return self.request.user
+        return ensure_user_rows(self.request.user)
 
 class UserProfileViewSet(viewsets.ModelViewSet):
     serializer_class = UserProfileSerializer
@@ -108,105 +166,247 @@ class UserProfileViewSet(viewsets.ModelViewSet):
     def perform_update(self, serializer):
         serializer.save(user=self.request.user)
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(FastListMixin, viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Category.objects.filter(user=self.request.user)
+        return Category.objects.filter(user=self.request.user).order_by('id')
+
+    def list(self, request, *args, **kwargs):
+        # A listagem já renderizada fica no cache compartilhado, por usuário e URL
+        data = get_category_list(request, lambda: super(CategoryViewSet, self).list(request, *args, **kwargs).data)
+        return Response(data)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class TransactionViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        # Cria (ou, com "on_conflict": "update", renova) uma lista de categorias
+        # numa única instrução, apoiada no unique_together do modelo
+        if isinstance(request.data, dict):
+            rows = request.data.get('categories')
+            on_conflict = request.data.get('on_conflict', 'ignore')
+        else:
+            rows, on_conflict = request.data, 'ignore'
+        if not isinstance(rows, list) or not rows:
+            return Response({
+                'error': 'Dados inválidos',
+                'details': 'Envie uma lista de categorias.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > BULK_MAX_ROWS:
+            return Response({
+                'error': 'Dados inválidos',
+                'details': f'Máximo de {BULK_MAX_ROWS} categorias por requisição.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if on_conflict not in ('ignore', 'update'):
+            return Response({
+                'error': 'Dados inválidos',
+                'details': 'on_conflict deve ser "ignore" ou "update".'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        item_serializer = CategorySerializer()
+        errors = {}
+        validated_rows = []
+        for index, row in enumerate(rows):
+            try:
+                validated_rows.append(item_serializer.run_validation(row))
+            except serializers.ValidationError as e:
+                errors[index] = e.detail
+        if errors:
+            return Response({
+                'error': 'Dados inválidos',
+                'details': [{'index': index, 'errors': errors[index]} for index in sorted(errors)]
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        created = upsert_categories(request.user, validated_rows, update=on_conflict == 'update')
+        logger.info("Categorias em lote: %d criadas", created)
+        pairs = {(data['name'], data['type']) for data in validated_rows}
+        categories = [
+            category for category in self.get_queryset().filter(name__in={name for name, _ in pairs})
+            if (category.name, category.type) in pairs
+        ]
+        return Response({
+            'created': created,
+            'categories': CategorySerializer(categories, many=True).data,
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+class TransactionViewSet(FastListMixin, EagerLoadingViewMixin, viewsets.ModelViewSet):
     serializer_class = TransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # Só para o schema (modelo dos filtros); as consultas usam get_queryset
+    queryset = Transaction.objects.none()
+    filter_backends = [TransactionFilterBackend]
+    filterset_class = TransactionFilter
+
+    @property
+    def paginator(self):
+        # Paginação por cursor é opcional (?pagination=cursor); o padrão continua
+        # sendo a paginação por número de página usada pelo frontend.
+        if not hasattr(self, '_paginator'):
+            if TransactionCursorPagination.is_requested(getattr(self, 'request', None)):
+                self._paginator = TransactionCursorPagination()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
 
     def get_queryset(self):
-        return Transaction.objects.filter(user=self.request.user)
+        return Transaction.objects.filter(user=self.request.user).order_by('-date', '-id')
+
+    def serialize_rows(self, fast_serializer, rows):
+        data = super().serialize_rows(fast_serializer, rows)
+        # Opcional (?running_balance=true): saldo da conta depois de cada transação
+        if wants_running_balance(self.request):
+            add_running_balances(self.request.user, rows, data)
+        return data
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        rows = request.data.get('transactions') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list) or not rows:
+            return Response({
+                'error': 'Dados inválidos',
+                'details': 'Envie uma lista de transações.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > BULK_MAX_ROWS:
+            return Response({
+                'error': 'Dados inválidos',
+                'details': f'Máximo de {BULK_MAX_ROWS} transações por requisição.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Um único serializer valida todas as linhas, como o ListSerializer,
+        # mas guardando os erros de cada linha pelo índice
+        item_serializer = TransactionBulkItemSerializer()
+        errors = {}
+        validated_rows = []
+        for index, row in enumerate(rows):
+            try:
+                validated_rows.append((index, item_serializer.run_validation(row)))
+            except serializers.ValidationError as e:
+                errors[index] = e.detail
+
+        # Posse e tipo das categorias conferidos no mapa do usuário, sem consulta
+        categories = get_category_map(request.user.pk)
+        for index, data in validated_rows:
+            category = categories.get(data['category_id'])
+            if category is None:
+                errors.setdefault(index, {})['category'] = ['Categoria inválida.']
+            elif category[1] != data['type']:
+                errors.setdefault(index, {})['type'] = ['O tipo da transação deve ser o mesmo da categoria.']
+
+        if errors:
+            logger.error("Importação em lote com %d linhas inválidas", len(errors))
+            return Response({
+                'error': 'Dados inválidos',
+                'details': [{'index': index, 'errors': errors[index]} for index in sorted(errors)]
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        created = bulk_create_transactions(
+            Transaction(user=request.user, **data) for _, data in validated_rows
+        )
+        logger.info("Importação em lote: %d transações criadas", created)
+        return Response({'created': created}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_statement(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({
+                'error': 'Dados inválidos',
+                'details': 'Envie o extrato no campo "file".'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        statement_format = request.data.get('format') or detect_format(upload.name)
+        if statement_format not in STATEMENT_FORMATS:
+            return Response({
+                'error': 'Dados inválidos',
+                'details': f'Formato não suportado: {statement_format}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # O upload já está em disco (TemporaryFileUploadHandler) ou em memória;
+        # o importador lê linha a linha sem carregar o arquivo inteiro.
+        try:
+            result = StatementImporter(request.user).run(
+                upload, statement_format, request.data.get('encoding') or 'utf-8-sig'
+            )
+        except (UnicodeDecodeError, LookupError, csv.Error) as e:
+            logger.error("Erro ao importar extrato: %s", e)
+            return Response({
+                'error': 'Arquivo inválido',
+                'details': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        # ?output= em vez de ?format=, que o DRF reserva para a negociação de conteúdo
+        export_format = request.query_params.get('output', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response({
+                'error': 'Dados inválidos',
+                'details': f'Formato não suportado: {export_format}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(
+            iter_export(request.user, export_format),
+            content_type=EXPORT_FORMATS[export_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="transacoes.{export_format}"'
+        return response
+
 class FinancialSummaryView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
         try:
-            # Período atual (mês atual)
-            today = timezone.now()
-            start_of_month = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            end_of_month = (start_of_month + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-
-            # Total de receitas
-            total_income = Transaction.objects.filter(
-                user=request.user,
-                type='income',
-                date__range=[start_of_month, end_of_month]
-            ).aggregate(total=Sum('amount'))['total'] or 0
-
-            # Total de despesas
-            total_expense = Transaction.objects.filter(
-                user=request.user,
-                type='expense',
-                date__range=[start_of_month, end_of_month]
-            ).aggregate(total=Sum('amount'))['total'] or 0
-
-            # Saldo
-            balance = total_income - total_expense
-
-            # Transações recentes
-            recent_transactions = Transaction.objects.filter(
-                user=request.user
-            ).order_by('-date')[:5]
-
-            # Resumo por categoria
-            category_summary = Category.objects.filter(
-                user=request.user
-            ).annotate(
-                total=Sum('transactions__amount', filter=Q(transactions__date__range=[start_of_month, end_of_month]))
-            ).values('name', 'total')
-
-            return Response({
-                'total_income': total_income,
-                'total_expense': total_expense,
-                'balance': balance,
-                'recent_transactions': TransactionSerializer(recent_transactions, many=True).data,
-                'category_summary': category_summary,
-            })
+            return Response(get_financial_summary(request.user))
         except Exception as e:
-            logger.error(f"Erro ao gerar resumo financeiro: {str(e)}")
+            logger.error("Erro ao gerar resumo financeiro: %s", e)
             return Response(
                 {'error': 'Erro ao gerar resumo financeiro'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class UserMeView(generics.RetrieveAPIView):
+class FinancialTimeseriesView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        # Receitas, despesas e saldo por dia, semana ou mês, agregados no banco
+        serializer = TimeseriesQuerySerializer(data=request.query_params, context={'request': request})
+        if not serializer.is_valid():
+            return Response({
+                'error': 'Dados inválidos',
+                'details': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return Response(get_financial_timeseries(request.user, **serializer.validated_data))
+
+class UserMeView(MePayloadMixin, generics.RetrieveAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = UserSerializer
 
     def get_object(self):
-        return self.request.user 
+        return ensure_user_rows(self.request.user)
 
-class UserProfileUpdateView(generics.UpdateAPIView):
+class UserProfileUpdateView(generics.RetrieveUpdateAPIView):
+    # /users/me/profile/, usado pela página de perfil do frontend
     permission_classes = [IsAuthenticated]
     serializer_class = UserProfileSerializer
 
     def get_object(self):
-        try:
-            return self.request.user.profile
-        except UserProfile.DoesNotExist:
-            logger.info(f"Criando perfil para o usuário: {self.request.user.username}")
-            return UserProfile.objects.create(user=self.request.user)
+        return ensure_user_rows(self.request.user).profile
 
     def update(self, request, *args, **kwargs):
-        logger.info(f"Atualizando perfil do usuário: {request.user.username}")
+        logger.debug("Atualizando perfil do usuário: %s", request.user.username)
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         
         if not serializer.is_valid():
-            logger.error(f"Erros de validação: {serializer.errors}")
+            logger.error("Erros de validação: %s", serializer.errors)
             return Response({
                 'error': 'Dados inválidos',
                 'details': serializer.errors
@@ -214,10 +414,10 @@ class UserProfileUpdateView(generics.UpdateAPIView):
 
         try:
             self.perform_update(serializer)
-            logger.info(f"Perfil atualizado com sucesso: {request.user.username}")
+            logger.info("Perfil atualizado com sucesso: %s", request.user.username)
             return Response(serializer.data)
         except Exception as e:
-            logger.error(f"Erro ao atualizar perfil: {str(e)}", exc_info=True)
+            logger.error("Erro ao atualizar perfil: %s", e, exc_info=True)
             return Response({
                 'error': 'Erro ao atualizar perfil',
                 'details': str(e)
@@ -231,13 +431,13 @@ class UserUpdateView(generics.UpdateAPIView):
         return self.request.user
 
     def update(self, request, *args, **kwargs):
-        logger.info(f"Atualizando dados do usuário: {request.user.username}")
+        logger.debug("Atualizando dados do usuário: %s", request.user.username)
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         
         if not serializer.is_valid():
-            logger.error(f"Erros de validação: {serializer.errors}")
+            logger.error("Erros de validação: %s", serializer.errors)
             return Response({
                 'error': 'Dados inválidos',
                 'details': serializer.errors
@@ -245,10 +445,10 @@ class UserUpdateView(generics.UpdateAPIView):
 
         try:
             self.perform_update(serializer)
-            logger.info(f"Usuário atualizado com sucesso: {request.user.username}")
+            logger.info("Usuário atualizado com sucesso: %s", request.user.username)
             return Response(serializer.data)
         except Exception as e:
-            logger.error(f"Erro ao atualizar usuário: {str(e)}", exc_info=True)
+            logger.error("Erro ao atualizar usuário: %s", e, exc_info=True)
             return Response({
                 'error': 'Erro ao atualizar usuário',
                 'details': str(e)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class NewConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'myapp'
+
+    def ready(self):
+        # Registra os receivers do consolidado mensal, dos caches, da busca, das métricas e do detector de consultas
+        from . import authentication, categories, me, metrics, queryinspector, rollup, search, summary  # noqa: F401
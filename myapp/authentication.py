@@ -0,0 +1,155 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+User = get_user_model()
+
+AUTH_USER_CACHE_KEY = 'auth:user:{user_id}'
+# Na ordem dos campos do modelo, como User.from_db espera
+AUTH_USER_FIELDS = tuple(
+    field.attname for field in User._meta.concrete_fields
+    if field.attname in ('id', 'username', 'email', 'first_name', 'last_name', 'is_active', 'is_staff', 'is_superuser')
+)
+TOKEN_CACHE_SIZE = 1024
+
+
+class TokenCache:
+    # LRU em memória de tokens já validados (assinatura e claims), limitado
+    # em tamanho; uma entrada nunca é usada depois do "exp" do token.
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.tokens = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, raw_token):
+        with self.lock:
+            token = self.tokens.get(raw_token)
+            if token is None:
+                return None
+            if token.payload.get('exp', 0) <= time.time():
+                del self.tokens[raw_token]
+                return None
+            self.tokens.move_to_end(raw_token)
+            return token
+
+    def set(self, raw_token, token):
+        with self.lock:
+            self.tokens[raw_token] = token
+            self.tokens.move_to_end(raw_token)
+            while len(self.tokens) > self.maxsize:
+                self.tokens.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.tokens.clear()
+
+
+token_cache = TokenCache()
+
+
+def auth_user_cache_key(user_id):
+    return AUTH_USER_CACHE_KEY.format(user_id=user_id)
+
+
+def invalidate_auth_user(user_id):
+    key = auth_user_cache_key(user_id)
+    cache.delete(key)
+    # De novo depois do commit: uma requisição concorrente pode ter relido e
+    # guardado o registro anterior à alteração (ex.: ainda ativo)
+    transaction.on_commit(functools.partial(cache.delete, key))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication sem ida ao banco por requisição: o token validado fica
+    num LRU em memória e um registro enxuto do usuário fica no cache por
+    AUTH_USER_CACHE_TTL. O usuário é montado com User.from_db apenas com os
+    campos do cache; os demais ficam adiados, então um save() grava só os
+    campos carregados.
+    """
+
+    def get_validated_token(self, raw_token):
+        token = token_cache.get(raw_token)
+        if token is None:
+            token = super().get_validated_token(raw_token)
+            token_cache.set(raw_token, token)
+        return token
+
+    def uses_user_cache(self):
+        # A verificação de revogação depende do hash da senha, que não vai para o cache
+        return not jwt_settings.CHECK_REVOKE_TOKEN and jwt_settings.USER_ID_FIELD == 'id'
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def build_user(self, values):
+        user = User.from_db(router.db_for_read(User), AUTH_USER_FIELDS, values)
+        if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+    def get_user(self, validated_token):
+        if not self.uses_user_cache():
+            return super().get_user(validated_token)
+
+        user_id = self.get_user_id(validated_token)
+        key = auth_user_cache_key(user_id)
+        values = cache.get(key)
+        if values is None:
+            values = User.objects.filter(id=user_id).values_list(*AUTH_USER_FIELDS).first()
+            if values is None:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            cache.set(key, values, getattr(settings, 'AUTH_USER_CACHE_TTL', 300))
+        return self.build_user(values)
+
+    async def aauthenticate(self, request):
+        # Mesmo fluxo do authenticate() para as views assíncronas (request do
+        # Django, não do DRF): o token vem do LRU e o usuário do cache.
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        if not self.uses_user_cache():
+            return await sync_to_async(super().get_user)(validated_token)
+
+        user_id = self.get_user_id(validated_token)
+        key = auth_user_cache_key(user_id)
+        values = await cache.aget(key)
+        if values is None:
+            values = await User.objects.filter(id=user_id).values_list(*AUTH_USER_FIELDS).afirst()
+            if values is None:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            await cache.aset(key, values, getattr(settings, 'AUTH_USER_CACHE_TTL', 300))
+        return self.build_user(values)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_auth_user_on_change(sender, instance, update_fields=None, **kwargs):
+    # Troca de senha, desativação ou qualquer outra alteração do usuário;
+    # o last_login gravado a cada login não faz parte do registro em cache.
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_auth_user(instance.pk)
@@ -0,0 +1,93 @@
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, Q, Sum, When, Window
+from django.db.models.expressions import RowRange
+from django.db.models.functions import TruncMonth
+
+from .models import MonthlyBalance, Transaction
+
+BALANCE_FIELD = DecimalField(max_digits=14, decimal_places=2)
+CENTS = Decimal('0.01')
+RUNNING_BALANCE_PARAM = 'running_balance'
+
+
+def money(value):
+    # Valores monetários saem como string com duas casas, como o amount
+    # (DecimalField); o JSONEncoder do DRF transformaria Decimal em float
+    return '{:f}'.format(value.quantize(CENTS))
+
+
+def signed(field):
+    # Receitas somam, despesas subtraem
+    return Case(
+        When(type='income', then=F(field)),
+        default=-F(field),
+        output_field=BALANCE_FIELD,
+    )
+
+
+def running_balances(user, rows):
+    """
+    Saldo da conta depois de cada transação da página, {id: saldo}.
+
+    Cada mês que aparece na página parte de um checkpoint: a soma do
+    consolidado mensal dos meses anteriores. Dentro do mês, uma window
+    function (SUM OVER PARTITION BY mês ORDER BY date, id) acumula as
+    transações do início do mês até a última linha da página naquele mês.
+    Com filtros (busca, tipo, categoria) a página pode pular anos de
+    transações; o custo continua O(meses do histórico + transações dos meses
+    da página até as linhas pedidas), e não cresce com o intervalo entre a
+    primeira e a última linha.
+    """
+    if not rows:
+        return {}
+    # Última posição (date, id) da página em cada mês
+    cutoffs = {}
+    for row in rows:
+        month = row['date'].replace(day=1)
+        cutoffs[month] = max(cutoffs.get(month, (row['date'], row['id'])), (row['date'], row['id']))
+
+    # Checkpoints: consolidado acumulado até o início de cada mês da página
+    totals = list(MonthlyBalance.objects.filter(user_id=user.pk, month__lt=max(cutoffs)).values('month').annotate(
+        total=Sum(signed('total'))
+    ).values_list('month', 'total'))
+    opening = {
+        month: sum((total for total_month, total in totals if total_month < month), Decimal('0'))
+        for month in cutoffs
+    }
+
+    # Só o prefixo de cada mês até a última linha da página naquele mês
+    prefix = Q()
+    for month, (last_date, last_id) in cutoffs.items():
+        prefix |= Q(date__gte=month) & (Q(date__lt=last_date) | Q(date=last_date, id__lte=last_id))
+    balances = Transaction.objects.filter(user_id=user.pk).filter(prefix).annotate(
+        month_balance=Window(
+            Sum(signed('amount')),
+            partition_by=[TruncMonth('date')],
+            order_by=[F('date').asc(), F('id').asc()],
+            frame=RowRange(start=None, end=0),
+            output_field=BALANCE_FIELD,
+        ),
+    ).values_list('id', 'date', 'month_balance')
+
+    # O prefixo traz transações fora da página (e fora dos filtros): entram
+    # no saldo, mas não na resposta. No SQLite expressões decimais voltam
+    # como float, daí o quantize.
+    page_ids = {row['id'] for row in rows}
+    return {
+        pk: (opening[date.replace(day=1)] + balance).quantize(CENTS)
+        for pk, date, balance in balances if pk in page_ids
+    }
+
+
+def add_running_balances(user, rows, data):
+    # rows: linhas de .values() da página; data: os mesmos itens já serializados
+    balances = running_balances(user, rows)
+    for item in data:
+        balance = balances.get(item['id'])
+        item['running_balance'] = None if balance is None else money(balance)
+    return data
+
+
+def wants_running_balance(request):
+    return request.query_params.get(RUNNING_BALANCE_PARAM) in ('true', '1')
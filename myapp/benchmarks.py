@@ -0,0 +1,300 @@
+import json
+import random
+import subprocess
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from itertools import islice
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import Client
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import Category, Transaction, UserProfile, UserSettings
+from .rollup import rebuild_monthly_balances
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+DESCRIPTIONS = (
+    'Mercado', 'Aluguel', 'Salário', 'Farmácia', 'Restaurante', 'Combustível',
+    'Internet', 'Academia', 'Padaria', 'Transferência', 'Cinema', 'Energia',
+)
+
+
+@contextmanager
+def rollback():
+    # Os dados gerados para o benchmark nunca são gravados de fato
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def bulk_insert(model, objects, batch_size=5000):
+    # bulk_create transforma o iterável numa lista; em lotes, milhões de
+    # linhas não precisam caber na memória de uma vez
+    objects = iter(objects)
+    total = 0
+    while batch := list(islice(objects, batch_size)):
+        model.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+def create_benchmark_user(username='benchmark', categories=5, transactions=1000, batch_size=5000):
+    user = User.objects.create_user(username, f'{username}@example.com', BENCHMARK_PASSWORD)
+    category_objects = Category.objects.bulk_create(
+        Category(name=f'Categoria {index}', type='income' if index % 2 else 'expense', user=user)
+        for index in range(categories)
+    )
+    start = date.today() - timedelta(days=transactions // 10)
+    bulk_insert(
+        Transaction,
+        (
+            Transaction(
+                amount=Decimal(index % 1000) + Decimal('0.99'),
+                description=f'Transação {index}',
+                date=start + timedelta(days=index // 10),
+                type=category_objects[index % categories].type,
+                category=category_objects[index % categories],
+                user=user,
+            )
+            for index in range(transactions)
+        ),
+        batch_size,
+    )
+    return user
+
+
+def generate_benchmark_data(users=10, categories=10, transactions=10000, prefix='bench', seed=0,
+                            batch_size=5000, log=None):
+    """
+    Gera `users` usuários (`<prefix>-0`, `<prefix>-1`, ...), cada um com
+    `categories` categorias e `transactions` transações nos últimos anos, só
+    com bulk_create e com os valores sorteados a partir de `seed`. Os usuários
+    existentes com o mesmo prefixo são removidos antes.
+    """
+    log = log or (lambda message: None)
+    rng = random.Random(seed)
+    # Um hash só para todos: o PBKDF2 por usuário dominaria a geração
+    password = make_password(BENCHMARK_PASSWORD)
+    with transaction.atomic():
+        User.objects.filter(username__startswith=f'{prefix}-').delete()
+        user_objects = User.objects.bulk_create(
+            User(username=f'{prefix}-{index}', email=f'{prefix}-{index}@example.com', password=password)
+            for index in range(users)
+        )
+        UserProfile.objects.bulk_create(UserProfile(user=user) for user in user_objects)
+        UserSettings.objects.bulk_create(UserSettings(user=user) for user in user_objects)
+        category_objects = Category.objects.bulk_create(
+            Category(name=f'Categoria {index}', type='income' if index % 4 == 0 else 'expense', user=user)
+            for user in user_objects
+            for index in range(categories)
+        )
+    log(f'{users} usuários e {len(category_objects)} categorias criados')
+
+    days = max(transactions // 20, 1)
+    end = date.today()
+    for position, user in enumerate(user_objects):
+        user_categories = category_objects[position * categories:(position + 1) * categories]
+        with transaction.atomic():
+            bulk_insert(
+                Transaction,
+                (
+                    Transaction(
+                        amount=Decimal(rng.randint(100, 500000)) / 100,
+                        description=f'{rng.choice(DESCRIPTIONS)} {index}',
+                        date=end - timedelta(days=rng.randrange(days)),
+                        type=category.type,
+                        category=category,
+                        user=user,
+                    )
+                    for index, category in ((index, rng.choice(user_categories)) for index in range(transactions))
+                ),
+                batch_size,
+            )
+        rebuild_monthly_balances(user)
+        log(f'{user.username}: {transactions} transações')
+
+    if connection.vendor in ('sqlite', 'postgresql'):
+        # Estatísticas do planejador para os índices e a busca
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+    return user_objects
+
+
+def best_of(function, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def percentiles(timings, points=(50, 95, 99)):
+    # Percentis pelo método do vizinho mais próximo, em milissegundos
+    ordered = sorted(timings)
+    if not ordered:
+        return {f'p{point}': None for point in points}
+    return {
+        f'p{point}': round(ordered[min(len(ordered) - 1, round(point / 100 * (len(ordered) - 1)))] * 1000, 2)
+        for point in points
+    }
+
+
+# Workloads: cada um faz uma requisição para um usuário e devolve o status.
+# `target` é um TestClientTarget (processo atual) ou HTTPTarget (servidor local).
+
+BenchmarkUser = namedtuple('BenchmarkUser', 'username authorization categories pages')
+
+
+def benchmark_users(prefix='bench'):
+    users = []
+    for user in User.objects.filter(username__startswith=f'{prefix}-').order_by('id'):
+        categories = list(Category.objects.filter(user=user).order_by('id').values_list('id', 'type'))
+        pages = max(Transaction.objects.filter(user=user).count() // settings.REST_FRAMEWORK['PAGE_SIZE'], 1)
+        users.append(BenchmarkUser(user.username, f'Bearer {AccessToken.for_user(user)}', categories, pages))
+    return users
+
+
+def login(target, user, index):
+    return target.request('POST', '/api/token/', {'username': user.username, 'password': BENCHMARK_PASSWORD})
+
+
+def summary(target, user, index):
+    return target.request('GET', '/api/v1/finance/summary/', authorization=user.authorization)
+
+
+def transaction_page(target, user, index):
+    # Páginas espalhadas pelo histórico, não só a primeira
+    page = index * 7919 % min(user.pages, 100) + 1
+    return target.request('GET', f'/api/v1/finance/transactions/?page={page}', authorization=user.authorization)
+
+
+def create_transaction(target, user, index):
+    category_id, category_type = user.categories[index % len(user.categories)]
+    return target.request('POST', '/api/v1/finance/transactions/', {
+        'amount': f'{index % 1000 + 1}.50',
+        'description': f'Benchmark {index}',
+        'date': date.today().isoformat(),
+        'type': category_type,
+        'category': category_id,
+    }, authorization=user.authorization)
+
+
+def update_profile(target, user, index):
+    return target.request('PATCH', '/api/v1/users/me/profile/', {'bio': f'Benchmark {index}'},
+                          authorization=user.authorization)
+
+
+WORKLOADS = {
+    'login': login,
+    'summary': summary,
+    'list': transaction_page,
+    'create': create_transaction,
+    'profile': update_profile,
+}
+
+
+class TestClientTarget:
+    # Handler do Django no próprio processo, sem rede (um Client por thread)
+    name = 'test-client'
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def request(self, method, path, data=None, authorization=None):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = Client()
+        extra = {'HTTP_AUTHORIZATION': authorization} if authorization else {}
+        body = json.dumps(data) if data is not None else ''
+        return client.generic(method, path, body, content_type='application/json', **extra).status_code
+
+
+class HTTPTarget:
+    def __init__(self, base_url):
+        self.name = self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, data=None, authorization=None):
+        headers = {'Content-Type': 'application/json'}
+        if authorization:
+            headers['Authorization'] = authorization
+        body = json.dumps(data).encode() if data is not None else None
+        try:
+            with urlopen(Request(self.base_url + path, body, headers, method=method), timeout=30) as response:
+                response.read()
+                return response.status
+        except HTTPError as e:
+            return e.code
+
+
+def run_workload(target, workload, users, requests=200, concurrency=1, warmup=10):
+    def call(index):
+        started = time.perf_counter()
+        status = workload(target, users[index % len(users)], index)
+        return time.perf_counter() - started, status
+
+    for index in range(warmup):
+        call(index)
+    started = time.perf_counter()
+    if concurrency == 1:
+        results = [call(index) for index in range(warmup, warmup + requests)]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(call, range(warmup, warmup + requests)))
+    elapsed = time.perf_counter() - started
+
+    timings = [timing for timing, _ in results]
+    statuses = Counter(status for _, status in results)
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(requests / elapsed, 1),
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 2),
+        **percentiles(timings),
+        'errors': sum(count for status, count in statuses.items() if status >= 400),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmark(target, workloads, users, requests=200, concurrency=1, warmup=10, log=None):
+    """
+    Roda os workloads em sequência contra o mesmo alvo e devolve o relatório
+    (o mesmo formato do JSON de --output, comparável entre execuções).
+    """
+    log = log or (lambda name, result: None)
+    report = {
+        'target': target.name,
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'dataset': {
+            'users': len(users),
+            'transactions': Transaction.objects.filter(user__username__in=[user.username for user in users]).count(),
+        },
+        'workloads': {},
+    }
+    for name in workloads:
+        result = run_workload(target, WORKLOADS[name], users, requests, concurrency, warmup)
+        report['workloads'][name] = result
+        log(name, result)
+    return report
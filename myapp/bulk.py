@@ -0,0 +1,57 @@
+from itertools import islice
+
+from django.db import transaction
+
+from .categories import get_category_map, invalidate_category_list, invalidate_category_map
+from .models import Category, Transaction
+from .rollup import apply_bulk_to_monthly_balances
+from .summary import invalidate_financial_summary
+
+BULK_BATCH_SIZE = 500
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def bulk_create_transactions(transactions, batch_size=BULK_BATCH_SIZE):
+    # bulk_create não dispara signals: o consolidado mensal e o cache do
+    # resumo são atualizados aqui, uma vez por lote.
+    created = 0
+    user_ids = set()
+    with transaction.atomic():
+        for batch in batched(transactions, batch_size):
+            Transaction.objects.bulk_create(batch)
+            apply_bulk_to_monthly_balances(batch)
+            user_ids.update(instance.user_id for instance in batch)
+            created += len(batch)
+    for user_id in user_ids:
+        invalidate_financial_summary(user_id)
+    return created
+
+
+def upsert_categories(user, rows, update=False):
+    # Um INSERT por lote com ON CONFLICT sobre o unique_together (nome,
+    # usuário, tipo): existentes são ignoradas ou, com update=True, têm o
+    # updated_at renovado. Devolve quantas categorias eram novas (pelo mapa
+    # de categorias, sem consulta extra).
+    pairs = list(dict.fromkeys((row['name'], row['type']) for row in rows))
+    existing = set(get_category_map(user.pk).values())
+    categories = [Category(name=name, type=type, user=user) for name, type in pairs]
+    if update:
+        conflict_options = {
+            'update_conflicts': True,
+            'unique_fields': ['name', 'user', 'type'],
+            'update_fields': ['updated_at'],
+        }
+    else:
+        conflict_options = {'ignore_conflicts': True}
+    Category.objects.bulk_create(categories, batch_size=BULK_BATCH_SIZE, **conflict_options)
+
+    # bulk_create não dispara signals; as invalidações rodam no commit
+    invalidate_category_list(user.pk)
+    invalidate_category_map(user.pk)
+    invalidate_financial_summary(user.pk)
+    return sum(1 for pair in pairs if pair not in existing)
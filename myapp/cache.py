@@ -0,0 +1,131 @@
+import functools
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+VERSION_TIMEOUT = None
+
+
+class AppCache:
+    """
+    Camada de cache da aplicação sobre um alias de CACHES (APP_CACHE_ALIAS).
+
+    As chaves são separadas por namespace e usuário e carregam a versão
+    corrente do par (namespace, usuário): invalidar é incrementar a versão,
+    o que descarta de uma vez todas as entradas daquele usuário no namespace
+    (ex.: todas as páginas da listagem de categorias) sem precisar
+    conhecê-las. Acertos e falhas são contados por namespace, por processo.
+    """
+
+    def __init__(self, alias=None, prefix='app'):
+        self.alias = alias
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.counters = defaultdict(lambda: {'hits': 0, 'misses': 0})
+
+    @property
+    def backend(self):
+        return caches[self.alias or getattr(settings, 'APP_CACHE_ALIAS', 'default')]
+
+    def version_key(self, namespace, user_id):
+        return f'{self.prefix}:{namespace}:{user_id}:version'
+
+    def initial_version(self):
+        # Versões novas partem do relógio, não de 1: depois de um clear() ou da
+        # remoção da chave de versão, nenhuma versão antiga volta a valer
+        # (inclusive para quem guarda dados por versão fora deste cache).
+        return time.time_ns() // 1000
+
+    def get_version(self, namespace, user_id):
+        key = self.version_key(namespace, user_id)
+        version = self.backend.get(key)
+        if version is None:
+            # add() não sobrescreve a versão gravada por outro worker no meio tempo
+            version = self.initial_version()
+            self.backend.add(key, version, VERSION_TIMEOUT)
+            version = self.backend.get(key, version)
+        return version
+
+    def make_key(self, namespace, user_id, *parts, version=None):
+        if version is None:
+            version = self.get_version(namespace, user_id)
+        return ':'.join(str(part) for part in (self.prefix, namespace, user_id, f'v{version}', *parts))
+
+    def get(self, namespace, user_id, *parts, default=None, version=None):
+        value = self.backend.get(self.make_key(namespace, user_id, *parts, version=version))
+        self._count(namespace, 'misses' if value is None else 'hits')
+        return default if value is None else value
+
+    def set(self, namespace, user_id, *parts, value, timeout=None, version=None):
+        if timeout is None:
+            timeout = getattr(settings, 'CACHE_TTL', None)
+        self.backend.set(self.make_key(namespace, user_id, *parts, version=version), value, timeout)
+
+    def get_or_set(self, namespace, user_id, *parts, default, timeout=None):
+        # A versão é lida antes de calcular o valor: se houver invalidação no
+        # meio tempo, o valor calculado fica na versão antiga e nunca é servido.
+        version = self.get_version(namespace, user_id)
+        value = self.get(namespace, user_id, *parts, version=version)
+        if value is None:
+            value = default() if callable(default) else default
+            self.set(namespace, user_id, *parts, value=value, timeout=timeout, version=version)
+        return value
+
+    def _get_versioned(self, namespace, user_id, *parts):
+        version = self.get_version(namespace, user_id)
+        return version, self.get(namespace, user_id, *parts, version=version)
+
+    async def aget_or_set(self, namespace, user_id, *parts, default, timeout=None):
+        # Versão do cache: leitura (versão + valor) e escrita numa ida cada ao
+        # backend síncrono; default é uma corrotina que calcula o valor.
+        version, value = await sync_to_async(self._get_versioned)(namespace, user_id, *parts)
+        if value is None:
+            value = await default()
+            await sync_to_async(self.set)(namespace, user_id, *parts, value=value, timeout=timeout, version=version)
+        return value
+
+    def invalidate(self, namespace, user_id):
+        key = self.version_key(namespace, user_id)
+        try:
+            self.backend.incr(key)
+        except ValueError:
+            # Sem versão gravada: a próxima leitura já começa numa versão nova
+            self.backend.add(key, self.initial_version(), VERSION_TIMEOUT)
+
+    def invalidate_on_commit(self, namespace, user_id, using=None):
+        # Só depois do commit: antes dele, uma leitura concorrente ainda vê as
+        # linhas antigas e guardaria os dados desatualizados na versão nova.
+        # Os pares ficam num conjunto por conexão e o primeiro callback a
+        # rodar invalida todos: uma exclusão em cascata de 300 transações
+        # vira uma invalidação por usuário, não 300 escritas no cache.
+        connection = transaction.get_connection(using)
+        pending = connection.__dict__.setdefault('app_cache_pending', set())
+        pending.add((namespace, user_id))
+        transaction.on_commit(functools.partial(self._invalidate_pending, pending), using)
+
+    def _invalidate_pending(self, pending):
+        # Pares de uma transação desfeita podem sobrar no conjunto: invalidar
+        # a mais no commit seguinte é inofensivo
+        while pending:
+            self.invalidate(*pending.pop())
+
+    def _count(self, namespace, outcome):
+        with self.lock:
+            self.counters[namespace][outcome] += 1
+
+    def stats(self):
+        with self.lock:
+            return {namespace: dict(counter) for namespace, counter in self.counters.items()}
+
+    def reset_stats(self):
+        with self.lock:
+            self.counters.clear()
+
+
+app_cache = AppCache()
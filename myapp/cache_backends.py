@@ -0,0 +1,193 @@
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class SQLiteCache(BaseCache):
+    """
+    Cache compartilhado entre processos num arquivo SQLite próprio (fora do
+    banco da aplicação), sem serviço externo. Cada thread abre sua conexão;
+    o arquivo usa WAL, então leituras não esperam escritas de outro worker.
+
+        CACHES = {'default': {
+            'BACKEND': 'myapp.cache_backends.SQLiteCache',
+            'LOCATION': BASE_DIR / 'cache.sqlite3',
+        }}
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+    cull_every = 100
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.location = str(location)
+        self._local = threading.local()
+        self._schema_ready = False
+        self._writes = 0
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.location, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            if not self._schema_ready:
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS cache '
+                    '(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+                )
+                connection.execute('CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)')
+                self._schema_ready = True
+            self._local.connection = connection
+        return connection
+
+    def _expiry(self, timeout):
+        # get_backend_timeout já devolve o instante absoluto (None = sem expiração)
+        return self.get_backend_timeout(timeout)
+
+    def _is_live(self, expires):
+        return expires is None or expires > time.time()
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self.connection.execute('SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None or not self._is_live(row[1]):
+            return default
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not key_map:
+            return {}
+        rows = self.connection.execute(
+            'SELECT key, value, expires FROM cache WHERE key IN (%s)' % ', '.join('?' * len(key_map)),
+            list(key_map),
+        )
+        return {key_map[key]: pickle.loads(value) for key, value, expires in rows if self._is_live(expires)}
+
+    def _write(self, key, value, timeout, version, mode):
+        key = self.make_and_validate_key(key, version=version)
+        expires = self._expiry(timeout)
+        connection = self.connection
+        if not self._is_live(expires):
+            # timeout <= 0: nada é gravado; o set apaga a entrada atual e o add
+            # só "acerta" se não houver entrada válida
+            if mode == 'add':
+                row = connection.execute('SELECT expires FROM cache WHERE key = ?', (key,)).fetchone()
+                return row is None or not self._is_live(row[0])
+            connection.execute('DELETE FROM cache WHERE key = ?', (key,))
+            return True
+        blob = pickle.dumps(value, self.pickle_protocol)
+        if mode == 'add':
+            # Só grava se não houver entrada válida; a expirada é substituída
+            cursor = connection.execute(
+                'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires '
+                'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+                (key, blob, expires, time.time()),
+            )
+        else:
+            cursor = connection.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)', (key, blob, expires)
+            )
+        self._maybe_cull()
+        return cursor.rowcount > 0
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write(key, value, timeout, version, 'set')
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._write(key, value, timeout, version, 'add')
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self._expiry(timeout)
+        if not self._is_live(expires):
+            self.delete_many(data, version=version)
+            return []
+        rows = [
+            (self.make_and_validate_key(key, version=version), pickle.dumps(value, self.pickle_protocol), expires)
+            for key, value in data.items()
+        ]
+        connection = self.connection
+        connection.execute('BEGIN')
+        try:
+            connection.executemany('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)', rows)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expires = self._expiry(timeout)
+        if not self._is_live(expires):
+            cursor = self.connection.execute(
+                'DELETE FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time())
+            )
+        else:
+            cursor = self.connection.execute(
+                'UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (expires, key, time.time()),
+            )
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self.connection.execute('DELETE FROM cache WHERE key = ?', (key,)).rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if keys:
+            self.connection.execute('DELETE FROM cache WHERE key IN (%s)' % ', '.join('?' * len(keys)), keys)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self.connection.execute('SELECT expires FROM cache WHERE key = ?', (key,)).fetchone()
+        return row is not None and self._is_live(row[0])
+
+    def incr(self, key, delta=1, version=None):
+        # Leitura e escrita na mesma transação de escrita (BEGIN IMMEDIATE),
+        # então incrementos concorrentes de workers diferentes não se perdem.
+        key = self.make_and_validate_key(key, version=version)
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+            if row is None or not self._is_live(row[1]):
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?', (pickle.dumps(value, self.pickle_protocol), key)
+            )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return value
+
+    def clear(self):
+        self.connection.execute('DELETE FROM cache')
+
+    def _maybe_cull(self):
+        # A limpeza roda a cada cull_every escritas do processo: remove os
+        # expirados e, acima de MAX_ENTRIES, 1/CULL_FREQUENCY das entradas
+        # (as que expiram primeiro), como no DatabaseCache.
+        self._writes += 1
+        if self._writes % self.cull_every:
+            return
+        connection = self.connection
+        connection.execute('DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries and self._cull_frequency:
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires IS NULL, expires LIMIT ?)',
+                (count // self._cull_frequency,),
+            )
+
+    def close(self, **kwargs):
+        # Conexões ficam abertas entre requisições (uma por thread)
+        pass
@@ -0,0 +1,126 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import router
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import app_cache
+from .models import Category
+
+CATEGORY_LIST_NAMESPACE = 'categories'
+CATEGORY_MAP_NAMESPACE = 'category_map'
+CATEGORY_MAP_LOCAL_SIZE = 1024
+
+
+class CategoryMap:
+    """
+    Mapa id -> (nome, tipo) das categorias de um usuário, lido do banco uma
+    vez e guardado no cache compartilhado e num LRU em memória do processo.
+    As duas camadas são indexadas pela versão do namespace no AppCache, então
+    a invalidação feita por qualquer worker (signals de Category) vale para
+    todos: o custo por uso é a leitura da versão.
+    """
+
+    def __init__(self, maxsize=CATEGORY_MAP_LOCAL_SIZE):
+        self.maxsize = maxsize
+        self.local = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        version = app_cache.get_version(CATEGORY_MAP_NAMESPACE, user_id)
+        with self.lock:
+            entry = self.local.get(user_id)
+            if entry is not None and entry[0] == version:
+                self.local.move_to_end(user_id)
+                return entry[1]
+
+        categories = app_cache.get(CATEGORY_MAP_NAMESPACE, user_id, version=version)
+        if categories is None:
+            categories = {
+                pk: (name, type)
+                for pk, name, type in Category.objects.filter(user_id=user_id).values_list('id', 'name', 'type')
+            }
+            app_cache.set(CATEGORY_MAP_NAMESPACE, user_id, version=version, value=categories)
+
+        with self.lock:
+            self.local[user_id] = (version, categories)
+            self.local.move_to_end(user_id)
+            while len(self.local) > self.maxsize:
+                self.local.popitem(last=False)
+        return categories
+
+    def clear(self):
+        with self.lock:
+            self.local.clear()
+
+
+category_map = CategoryMap()
+
+
+def get_category_map(user_id):
+    return category_map.get(user_id)
+
+
+def build_category(user_id, category_id, categories=None):
+    # Instância de Category montada do mapa, sem consulta; None se a
+    # categoria não existe ou é de outro usuário
+    categories = get_category_map(user_id) if categories is None else categories
+    if category_id not in categories:
+        return None
+    name, type = categories[category_id]
+    return Category.from_db(
+        router.db_for_read(Category), ('id', 'name', 'type', 'user_id'), (category_id, name, type, user_id)
+    )
+
+
+def category_list_cache_part(request):
+    # Uma entrada por URL (página, page_size); os links de paginação são absolutos
+    return hashlib.md5(request.build_absolute_uri().encode(), usedforsecurity=False).hexdigest()
+
+
+def get_category_list(request, build):
+    return app_cache.get_or_set(
+        CATEGORY_LIST_NAMESPACE, request.user.pk, category_list_cache_part(request), default=build
+    )
+
+
+def invalidate_category_list(user_id):
+    # Incrementa a versão no commit: todas as páginas do usuário saem do
+    # cache de uma vez
+    app_cache.invalidate_on_commit(CATEGORY_LIST_NAMESPACE, user_id)
+
+
+def invalidate_category_map(user_id):
+    # Idem: com a versão trocada antes do commit, o mapa relido sem a
+    # categoria nova faria o UserCategoryField recusá-la
+    app_cache.invalidate_on_commit(CATEGORY_MAP_NAMESPACE, user_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_categories_on_change(sender, instance, **kwargs):
+    invalidate_category_list(instance.user_id)
+    invalidate_category_map(instance.user_id)
+
+
+def seed_default_categories(user):
+    # Uma única instrução (INSERT ... ON CONFLICT DO NOTHING) para as
+    # categorias de DEFAULT_CATEGORIES, no formato [(nome, tipo), ...]
+    defaults = getattr(settings, 'DEFAULT_CATEGORIES', ())
+    if not defaults:
+        return
+    Category.objects.bulk_create(
+        [Category(name=name, type=type, user=user) for name, type in defaults], ignore_conflicts=True
+    )
+    invalidate_category_list(user.pk)
+    invalidate_category_map(user.pk)
+
+
+@receiver(post_save, sender=User)
+def seed_categories_on_user_creation(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        seed_default_categories(instance)
@@ -0,0 +1,52 @@
+import csv
+import json
+
+from .models import Transaction
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FIELDS = ('id', 'date', 'description', 'amount', 'type', 'category', 'category_name')
+
+
+class Echo:
+    # "Arquivo" que devolve o que recebe, para o csv.writer gerar linha a linha
+    def write(self, value):
+        return value
+
+
+def export_rows(user):
+    # values_list com JOIN em category__name: nenhuma instância de modelo e
+    # nenhuma consulta por linha; iterator() busca em blocos do cursor.
+    return Transaction.objects.filter(user=user).order_by('date', 'id').values_list(
+        'id', 'date', 'description', 'amount', 'type', 'category_id', 'category__name'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def iter_csv_export(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for pk, date, description, amount, type, category_id, category_name in rows:
+        yield writer.writerow((pk, date.isoformat(), description, str(amount), type, category_id, category_name))
+
+
+def iter_ndjson_export(rows):
+    for pk, date, description, amount, type, category_id, category_name in rows:
+        yield json.dumps({
+            'id': pk,
+            'date': date.isoformat(),
+            'description': description,
+            'amount': str(amount),
+            'type': type,
+            'category': category_id,
+            'category_name': category_name,
+        }, ensure_ascii=False) + '\n'
+
+
+def iter_export(user, export_format):
+    rows = export_rows(user)
+    if export_format == 'ndjson':
+        return iter_ndjson_export(rows)
+    return iter_csv_export(rows)
@@ -0,0 +1,157 @@
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+
+from .models import UserProfile
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROFILE_PICTURE_DIR = 'profile_pictures'
+# Formato detectado pelo Pillow -> extensão gravada
+IMAGE_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+VARIANT_OPTIONS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+VARIANT_EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+# <hash>.<ext> e <hash>_<tamanho>.<ext>: o nome identifica o conteúdo
+CONTENT_NAME_RE = re.compile(r'^(?P<digest>[0-9a-f]{32}(_\d+)?)\.\w+$')
+
+# As variantes são geradas fora da requisição; o Pillow libera o GIL ao
+# decodificar, redimensionar e codificar, então threads bastam.
+executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'IMAGE_WORKERS', 2), thread_name_prefix='images'
+)
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def inspect_image(upload):
+    """
+    Valida o upload lendo só o cabeçalho: o Image.open do Pillow é
+    preguiçoso e não decodifica os pixels. Retorna a extensão do formato.
+    """
+    if upload.size > settings.MAX_IMAGE_SIZE:
+        raise InvalidImage(f'A imagem deve ter no máximo {settings.MAX_IMAGE_SIZE // (1024 * 1024)}MB.')
+    try:
+        upload.seek(0)
+        with Image.open(upload) as image:
+            extension = IMAGE_EXTENSIONS.get(image.format)
+            width, height = image.size
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise InvalidImage('Envie uma imagem válida.')
+    finally:
+        upload.seek(0)
+    if extension not in settings.ALLOWED_IMAGE_EXTENSIONS:
+        raise InvalidImage(f"Formatos aceitos: {', '.join(settings.ALLOWED_IMAGE_EXTENSIONS)}.")
+    if width * height > settings.MAX_IMAGE_PIXELS:
+        raise InvalidImage('A imagem tem dimensões grandes demais.')
+    return extension
+
+
+def content_name(upload, extension):
+    # Nome pelo conteúdo: o mesmo arquivo nunca muda de URL, então pode ser
+    # servido com cache longo
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return f'{PROFILE_PICTURE_DIR}/{digest.hexdigest()[:32]}.{extension}'
+
+
+def content_digest(name):
+    # Hash embutido no nome gerado por content_name()/variant_name(), ou None
+    match = CONTENT_NAME_RE.match(os.path.basename(name))
+    return match.group('digest') if match else None
+
+
+def store_profile_picture(upload):
+    name = content_name(upload, inspect_image(upload))
+    if not default_storage.exists(name):
+        name = default_storage.save(name, upload)
+    return name
+
+
+def variant_name(name, size, variant_format):
+    stem = os.path.splitext(name)[0]
+    return f'{stem}_{size}.{VARIANT_EXTENSIONS[variant_format]}'
+
+
+def render_variant(image, size, variant_format):
+    thumbnail = ImageOps.fit(image, (size, size), Image.LANCZOS)
+    if variant_format == 'jpeg' and thumbnail.mode != 'RGB':
+        # JPEG não tem transparência: fundo branco
+        background = Image.new('RGB', thumbnail.size, 'white')
+        background.paste(thumbnail, mask=thumbnail.getchannel('A') if thumbnail.mode == 'RGBA' else None)
+        thumbnail = background
+    buffer = BytesIO()
+    thumbnail.save(buffer, **VARIANT_OPTIONS[variant_format])
+    return buffer.getvalue()
+
+
+def build_variants(name):
+    """Gera (ou reaproveita) as variantes de uma foto; {tamanho: {formato: nome}}."""
+    sizes = settings.PROFILE_PICTURE_SIZES
+    formats = settings.PROFILE_PICTURE_FORMATS
+    variants = {
+        str(size): {variant_format: variant_name(name, size, variant_format) for variant_format in formats}
+        for size in sizes
+    }
+    missing = [
+        (size, variant_format) for size in sizes for variant_format in formats
+        if not default_storage.exists(variants[str(size)][variant_format])
+    ]
+    if not missing:
+        return variants
+
+    with default_storage.open(name, 'rb') as original, Image.open(original) as image:
+        # Em JPEG, draft() decodifica já reduzido (escala da DCT)
+        image.draft('RGB', (max(sizes) * 2, max(sizes) * 2))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        for size, variant_format in missing:
+            default_storage.save(
+                variants[str(size)][variant_format], ContentFile(render_variant(image, size, variant_format))
+            )
+    return variants
+
+
+def attach_profile_picture_variants(profile_id, name):
+    variants = build_variants(name)
+    profile = UserProfile.objects.get(pk=profile_id)
+    # Outra foto pode ter sido enviada enquanto esta era processada
+    if profile.profile_picture.name != name:
+        return None
+    profile.profile_picture_variants = variants
+    # O post_save invalida o payload do /me em cache
+    profile.save(update_fields=['profile_picture_variants'])
+    return variants
+
+
+def profile_picture_job(profile_id, name):
+    try:
+        attach_profile_picture_variants(profile_id, name)
+        logger.info("Variantes da foto de perfil geradas: %s", name)
+    except Exception as e:
+        logger.error("Erro ao gerar variantes da foto de perfil %s: %s", name, e, exc_info=True)
+    finally:
+        # Conexões abertas por esta thread de trabalho
+        connections.close_all()
+
+
+def schedule_profile_picture_variants(profile):
+    # Só depois do commit: a thread de trabalho lê o perfil já gravado
+    profile_id, name = profile.pk, profile.profile_picture.name
+    transaction.on_commit(lambda: executor.submit(profile_picture_job, profile_id, name))
@@ -0,0 +1,181 @@
+import codecs
+import csv
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from .bulk import BULK_BATCH_SIZE, bulk_create_transactions
+from .categories import get_category_map
+from .models import Category, Transaction
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_FORMATS = ('csv', 'ofx')
+DEFAULT_CATEGORY_NAME = 'Importado'
+MAX_REPORTED_ERRORS = 50
+
+CSV_COLUMNS = {
+    'date': 'date', 'data': 'date',
+    'description': 'description', 'descricao': 'description', 'descrição': 'description',
+    'amount': 'amount', 'valor': 'amount',
+    'type': 'type', 'tipo': 'type',
+    'category': 'category', 'categoria': 'category',
+}
+TYPE_ALIASES = {
+    'income': 'income', 'receita': 'income', 'credit': 'income', 'credito': 'income', 'crédito': 'income',
+    'expense': 'expense', 'despesa': 'expense', 'debit': 'expense', 'debito': 'expense', 'débito': 'expense',
+}
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y')
+
+OFX_BLOCK_START = '<STMTTRN>'
+OFX_BOUNDARY = re.compile(r'</?STMTTRN>|</BANKTRANLIST>', re.IGNORECASE)
+OFX_TAG = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+
+def detect_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return extension if extension in STATEMENT_FORMATS else 'csv'
+
+
+def iter_text_lines(fileobj, encoding='utf-8-sig'):
+    # Itera o arquivo linha a linha decodificando incrementalmente: funciona
+    # com arquivos temporários de upload e arquivos abertos em modo binário
+    # sem nunca chamar read() no conteúdo inteiro.
+    return codecs.iterdecode(iter(fileobj), encoding)
+
+
+def iter_csv_rows(lines):
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [CSV_COLUMNS.get(name.strip().lower()) for name in header]
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        yield reader.line_num, {
+            column: value.strip() for column, value in zip(columns, row) if column
+        }
+
+
+def iter_ofx_rows(lines):
+    # Lê blocos <STMTTRN> de forma incremental; o buffer guarda só o bloco de
+    # transação ainda aberto. O bloco termina no </STMTTRN> ou, nos arquivos
+    # SGML que o omitem, no próximo <STMTTRN> ou no fim da lista.
+    block = None
+    number = 0
+    for line in lines:
+        position = 0
+        for match in OFX_BOUNDARY.finditer(line):
+            if block is not None:
+                block += line[position:match.start()]
+                if block.strip():
+                    number += 1
+                    yield number, ofx_row(block)
+                block = None
+            if match.group().upper() == OFX_BLOCK_START:
+                block = ''
+            position = match.end()
+        if block is not None:
+            block += line[position:]
+    if block is not None and block.strip():
+        yield number + 1, ofx_row(block)
+
+
+def ofx_row(block):
+    tags = {tag.upper(): value.strip() for tag, value in OFX_TAG.findall(block)}
+    return {
+        'date': tags.get('DTPOSTED', '')[:8],
+        'description': tags.get('NAME') or tags.get('MEMO', ''),
+        'amount': tags.get('TRNAMT', ''),
+        'type': tags.get('TRNTYPE', ''),
+    }
+
+
+def parse_amount(value):
+    value = value.replace('R$', '').replace(' ', '')
+    # O último separador é o decimal: "1.234,56" (pt-BR) ou "1,234.56"
+    if ',' in value and value.rfind(',') > value.rfind('.'):
+        value = value.replace('.', '').replace(',', '.')
+    else:
+        value = value.replace(',', '')
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f'Valor inválido: {value!r}')
+    if not amount.is_finite() or abs(amount) >= Decimal('1e8'):
+        raise ValueError(f'Valor inválido: {value!r}')
+    return amount.quantize(Decimal('0.01'))
+
+
+def parse_date(value):
+    if re.fullmatch(r'\d{8}', value):
+        return date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            pass
+    raise ValueError(f'Data inválida: {value!r}')
+
+
+class CategoryResolver:
+    # Tabela (nome, tipo) -> id montada do mapa de categorias do usuário;
+    # categorias novas são criadas sob demanda e entram na tabela.
+    def __init__(self, user):
+        self.user = user
+        self.categories = {
+            (name.lower(), type): pk for pk, (name, type) in get_category_map(user.pk).items()
+        }
+
+    def resolve(self, name, type):
+        name = (name or DEFAULT_CATEGORY_NAME)[:100]
+        key = (name.lower(), type)
+        if key not in self.categories:
+            # Sem diferenciar maiúsculas, como a tabela: o mapa pode não ter
+            # ainda uma categoria criada nesta mesma transação
+            category, _ = Category.objects.get_or_create(
+                user=self.user, name__iexact=name, type=type, defaults={'name': name}
+            )
+            self.categories[key] = category.pk
+        return self.categories[key]
+
+
+class StatementImporter:
+    def __init__(self, user, batch_size=BULK_BATCH_SIZE):
+        self.user = user
+        self.batch_size = batch_size
+        self.categories = CategoryResolver(user)
+        self.skipped = 0
+        self.errors = []
+
+    def run(self, fileobj, format='csv', encoding='utf-8-sig'):
+        lines = iter_text_lines(fileobj, encoding)
+        rows = iter_ofx_rows(lines) if format == 'ofx' else iter_csv_rows(lines)
+        created = bulk_create_transactions(self.build_transactions(rows), self.batch_size)
+        logger.info("Importação de extrato: %d criadas, %d ignoradas", created, self.skipped)
+        return {'created': created, 'skipped': self.skipped, 'errors': self.errors}
+
+    def build_transactions(self, rows):
+        for number, row in rows:
+            try:
+                yield self.build_transaction(row)
+            except ValueError as e:
+                self.skipped += 1
+                if len(self.errors) < MAX_REPORTED_ERRORS:
+                    self.errors.append({'line': number, 'error': str(e)})
+
+    def build_transaction(self, row):
+        amount = parse_amount(row.get('amount', ''))
+        # Valores negativos são despesas; sem tipo reconhecido, receita
+        type = 'expense' if amount < 0 else TYPE_ALIASES.get(row.get('type', '').lower(), 'income')
+        description = row.get('description') or '-'
+        return Transaction(
+            user=self.user,
+            amount=abs(amount),
+            description=description[:200],
+            date=parse_date(row.get('date', '')),
+            type=type,
+            category_id=self.categories.resolve(row.get('category'), type),
+        )
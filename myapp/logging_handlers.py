@@ -0,0 +1,73 @@
+import atexit
+import copy
+import logging
+import logging.handlers
+import queue
+
+LOG_QUEUE_SIZE = 10000
+
+
+class BlockingSentinelListener(logging.handlers.QueueListener):
+    # Com a fila cheia o sentinela de parada espera vaga, em vez de falhar
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class AsyncRotatingFileHandler(logging.handlers.QueueHandler):
+    """
+    Handler de arquivo com escrita fora da thread da requisição: o registro
+    vai para uma fila limitada e uma thread (QueueListener) grava no arquivo.
+    Com a fila cheia o registro é descartado e contado em ``dropped``, em vez
+    de bloquear a requisição.
+
+    Com ``maxBytes`` a rotação é feita aqui (RotatingFileHandler), o que só
+    é seguro com um processo gravando o arquivo (runserver). Com vários
+    workers use ``maxBytes=0``: cada processo grava com WatchedFileHandler,
+    que reabre o arquivo quando uma rotação externa (logrotate) o troca.
+    """
+
+    def __init__(self, filename, maxBytes=0, backupCount=0, encoding=None, queue_size=LOG_QUEUE_SIZE):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        if maxBytes:
+            self.target = logging.handlers.RotatingFileHandler(
+                filename, maxBytes=maxBytes, backupCount=backupCount, encoding=encoding, delay=True
+            )
+        else:
+            self.target = logging.handlers.WatchedFileHandler(filename, encoding=encoding, delay=True)
+        self.dropped = 0
+        self.listener = BlockingSentinelListener(self.queue, self.target, respect_handler_level=False)
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def setFormatter(self, fmt):
+        # A formatação acontece na thread de escrita
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Só resolve a mensagem (os argumentos podem mudar depois da chamada);
+        # asctime, exceção e o restante do formato ficam para o listener. A
+        # cópia, como no QueueHandler.prepare, preserva o registro original
+        # para os demais handlers (o console ainda precisa do exc_info).
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+            self.target.close()
+
+    def close(self):
+        self.stop()
+        super().close()
@@ -0,0 +1,134 @@
+import asyncio
+import io
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from rest_framework_simplejwt.tokens import AccessToken
+
+from myapp.benchmarks import create_benchmark_user, percentiles
+from myapp.rollup import rebuild_monthly_balances
+
+ENDPOINTS = [
+    ('summary', '/api/v1/finance/summary/', '/api/v1/async/finance/summary/'),
+    ('transactions', '/api/v1/finance/transactions/?page=2', '/api/v1/async/finance/transactions/?page=2'),
+    ('categories', '/api/v1/finance/categories/', '/api/v1/async/finance/categories/'),
+    ('me', '/api/v1/me/', '/api/v1/async/me/'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Teste de carga local: views síncronas sob WSGI (pool de threads) x views '
+        'assíncronas sob ASGI, com vazão e latências p50/p99 por endpoint'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Requisições por endpoint e modo')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--transactions', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        # Os handlers rodam em outras threads e conexões, então os dados são
+        # gravados de fato (e removidos no final), não dentro de rollback().
+        user = create_benchmark_user(f'bench-asgi-{uuid.uuid4().hex[:8]}', categories=10,
+                                     transactions=options['transactions'])
+        rebuild_monthly_balances(user)
+        authorization = f'Bearer {AccessToken.for_user(user)}'
+        try:
+            wsgi = get_wsgi_application()
+            asgi = get_asgi_application()
+            for name, sync_url, async_url in ENDPOINTS:
+                cases = [
+                    ('WSGI, view síncrona', lambda: self.run_wsgi(wsgi, sync_url, authorization, options)),
+                    ('ASGI, view síncrona', lambda: self.run_asgi(asgi, sync_url, authorization, options)),
+                    ('ASGI, view assíncrona', lambda: self.run_asgi(asgi, async_url, authorization, options)),
+                ]
+                for mode, run in cases:
+                    elapsed, timings, statuses = run()
+                    latency = percentiles(timings, (50, 99))
+                    self.stdout.write(
+                        f'{name} | {mode}: {len(timings) / elapsed:,.0f} req/s | '
+                        f'p50 {latency["p50"]} ms | p99 {latency["p99"]} ms'
+                        + ('' if statuses == {200} else f' | status {sorted(statuses)}')
+                    )
+        finally:
+            user.delete()
+
+    def run_wsgi(self, application, url, authorization, options):
+        parts = urlsplit(url)
+
+        def request():
+            environ = {
+                'REQUEST_METHOD': 'GET',
+                'PATH_INFO': parts.path,
+                'QUERY_STRING': parts.query,
+                'SERVER_NAME': 'localhost',
+                'SERVER_PORT': '8000',
+                'HTTP_HOST': 'localhost',
+                'HTTP_AUTHORIZATION': authorization,
+                'wsgi.url_scheme': 'http',
+                'wsgi.input': io.BytesIO(),
+                'wsgi.errors': io.StringIO(),
+            }
+            status = []
+            started = time.perf_counter()
+            response = application(environ, lambda code, headers, exc_info=None: status.append(int(code[:3])))
+            b''.join(response)
+            response.close()
+            return time.perf_counter() - started, status[0]
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            results = list(executor.map(lambda _: request(), range(options['requests'])))
+        return time.perf_counter() - started, [timing for timing, _ in results], {code for _, code in results}
+
+    def run_asgi(self, application, url, authorization, options):
+        parts = urlsplit(url)
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': parts.path,
+            'raw_path': parts.path.encode(),
+            'query_string': parts.query.encode(),
+            'headers': [(b'host', b'localhost'), (b'authorization', authorization.encode())],
+            'server': ('localhost', 8000),
+            'client': ('127.0.0.1', 0),
+        }
+
+        async def request():
+            status = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+
+            started = time.perf_counter()
+            await application(dict(scope), receive, send)
+            return time.perf_counter() - started, status[0]
+
+        async def run():
+            # "concurrency" clientes, cada um com uma requisição por vez
+            remaining = iter(range(options['requests']))
+            results = []
+
+            async def client():
+                for _ in remaining:
+                    results.append(await request())
+
+            started = time.perf_counter()
+            await asyncio.gather(*(client() for _ in range(options['concurrency'])))
+            return time.perf_counter() - started, results
+
+        elapsed, results = asyncio.run(run())
+        return elapsed, [timing for timing, _ in results], {code for _, code in results}
@@ -0,0 +1,67 @@
+import logging
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand
+
+from myapp.benchmarks import best_of
+from myapp.logging_handlers import AsyncRotatingFileHandler
+
+PAYLOAD = {'username': 'usuario', 'email': 'usuario@example.com', 'first_name': 'Nome', 'last_name': 'Sobrenome'}
+HEADERS = {'Content-Type': 'application/json', 'User-Agent': 'Mozilla/5.0', 'Accept': '*/*'}
+
+
+def eager_request(logger):
+    # Registro antigo: f-strings em INFO, formatadas mesmo quando descartadas
+    logger.info(f"[REGISTRO] Recebendo requisição de registro: POST /api/v1/auth/register/")
+    logger.info(f"[REGISTRO] Headers da requisição: {dict(HEADERS)}")
+    logger.info(f"[REGISTRO] Dados recebidos: {PAYLOAD}")
+    logger.info(f"Validando username: {PAYLOAD['username']}")
+    logger.info(f"Usuário criado com sucesso: {PAYLOAD['username']}")
+
+
+def lazy_request(logger):
+    logger.debug("[REGISTRO] Recebendo requisição de registro: %s %s", 'POST', '/api/v1/auth/register/')
+    logger.debug("[REGISTRO] Headers da requisição: %s", HEADERS)
+    logger.debug("[REGISTRO] Dados recebidos: %s", PAYLOAD)
+    logger.debug("Validando username: %s", PAYLOAD['username'])
+    logger.info("Usuário criado com sucesso: %s", PAYLOAD['username'])
+
+
+class Command(BaseCommand):
+    help = 'Mede o custo de log por requisição: FileHandler síncrono x handler assíncrono com chamadas preguiçosas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        requests = options['requests']
+        formatter = logging.Formatter('{levelname} {asctime} {module} {process:d} {thread:d} {message}', style='{')
+
+        with tempfile.TemporaryDirectory() as directory:
+            cases = [
+                ('FileHandler síncrono, f-strings, DEBUG', logging.DEBUG, eager_request,
+                 lambda: logging.FileHandler(os.path.join(directory, 'sync.log'), delay=True)),
+                ('assíncrono, f-strings, DEBUG', logging.DEBUG, eager_request,
+                 lambda: AsyncRotatingFileHandler(os.path.join(directory, 'async.log'))),
+                ('assíncrono, preguiçoso, DEBUG', logging.DEBUG, lazy_request,
+                 lambda: AsyncRotatingFileHandler(os.path.join(directory, 'async-lazy.log'))),
+                ('assíncrono, preguiçoso, INFO', logging.INFO, lazy_request,
+                 lambda: AsyncRotatingFileHandler(os.path.join(directory, 'async-info.log'))),
+            ]
+            for name, level, request, make_handler in cases:
+                handler = make_handler()
+                handler.setFormatter(formatter)
+                logger = logging.getLogger(f'myapp.bench_logging.{level}.{request.__name__}')
+                logger.handlers = [handler]
+                logger.setLevel(level)
+                logger.propagate = False
+
+                elapsed = best_of(lambda: [request(logger) for _ in range(requests)], options['repeat'])
+                dropped = getattr(handler, 'dropped', 0)
+                handler.close()
+                self.stdout.write(
+                    f'{name}: {elapsed / requests * 1e6:.1f} µs/requisição'
+                    + (f' | {dropped} registros descartados' if dropped else '')
+                )
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from myapp.api.v1.fast_serializers import ValuesSerializer
+from myapp.api.v1.serializers import CategorySerializer, TransactionSerializer
+from myapp.benchmarks import best_of, create_benchmark_user, rollback
+from myapp.models import Category, Transaction
+
+
+class Command(BaseCommand):
+    help = 'Compara linhas/segundo do ModelSerializer com o caminho rápido via .values() nas listagens'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with rollback():
+            user = create_benchmark_user(categories=50, transactions=rows)
+            cases = [
+                ('transactions', TransactionSerializer, Transaction.objects.filter(user=user)),
+                ('categories', CategorySerializer, Category.objects.filter(user=user)),
+            ]
+            for name, serializer_class, queryset in cases:
+                count = queryset.count()
+                fast_serializer = ValuesSerializer.for_serializer(serializer_class)
+                if hasattr(serializer_class, 'setup_eager_loading'):
+                    queryset = serializer_class.setup_eager_loading(queryset)
+                context = {'user_id': user.pk}
+                model_time = best_of(
+                    lambda: serializer_class(queryset, many=True, context=context).data, options['repeat']
+                )
+                fast_time = best_of(
+                    lambda: fast_serializer.many(fast_serializer.values(queryset), context), options['repeat']
+                )
+                self.stdout.write(
+                    f'{name}: {count} linhas | ModelSerializer {count / model_time:,.0f} linhas/s | '
+                    f'values() {count / fast_time:,.0f} linhas/s | {model_time / fast_time:.1f}x'
+                )
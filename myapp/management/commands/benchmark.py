@@ -0,0 +1,78 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment
+
+from myapp.benchmarks import WORKLOADS, HTTPTarget, TestClientTarget, benchmark_users, run_benchmark
+
+COMPARED = (('throughput_rps', 'req/s'), ('p50', 'p50'), ('p95', 'p95'), ('p99', 'p99'))
+
+
+class Command(BaseCommand):
+    help = (
+        'Roda os workloads (login, resumo, listagem, criação, perfil) sobre a massa do '
+        'generate_benchmark_data, pelo test client ou contra um servidor local, com vazão, '
+        'p50/p95/p99 e relatório em JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Servidor local (ex.: http://127.0.0.1:8000); sem ele, usa o test client')
+        parser.add_argument('--workloads', default=','.join(WORKLOADS),
+                            help=f'Separados por vírgula, entre: {", ".join(WORKLOADS)}')
+        parser.add_argument('--requests', type=int, default=200, help='Requisições medidas por workload')
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument('--warmup', type=int, default=10, help='Requisições descartadas antes da medição')
+        parser.add_argument('--prefix', default='bench')
+        parser.add_argument('--output', help='Grava o relatório em JSON neste arquivo')
+        parser.add_argument('--compare', help='Relatório JSON de uma execução anterior, para comparar')
+
+    def handle(self, *args, **options):
+        workloads = [name.strip() for name in options['workloads'].split(',') if name.strip()]
+        unknown = [name for name in workloads if name not in WORKLOADS]
+        if unknown:
+            raise CommandError(f'Workloads desconhecidos: {", ".join(unknown)}')
+        users = benchmark_users(options['prefix'])
+        if not users:
+            raise CommandError(
+                f'Nenhum usuário "{options["prefix"]}-*"; gere a massa com python manage.py generate_benchmark_data'
+            )
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)['workloads']
+
+        if options['url']:
+            target = HTTPTarget(options['url'])
+        else:
+            # Libera o host "testserver" do test client
+            setup_test_environment()
+            target = TestClientTarget()
+
+        def log(name, result):
+            line = (
+                f'{name}: {result["throughput_rps"]:,.1f} req/s | p50 {result["p50"]} ms | '
+                f'p95 {result["p95"]} ms | p99 {result["p99"]} ms'
+            )
+            if result['errors']:
+                line += f' | erros {result["errors"]} {result["statuses"]}'
+            if baseline and name in baseline:
+                line += ' | anterior: ' + ' '.join(
+                    f'{label} {change(baseline[name][metric], result[metric])}' for metric, label in COMPARED
+                )
+            self.stdout.write(line)
+
+        self.stdout.write(f'{target.name}: {len(users)} usuários, {options["requests"]} requisições por workload, '
+                          f'concorrência {options["concurrency"]}')
+        report = run_benchmark(target, workloads, users, options['requests'], options['concurrency'],
+                               options['warmup'], log=log)
+        report['options'] = {key: options[key] for key in ('requests', 'concurrency', 'warmup', 'prefix')}
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Relatório gravado em {options["output"]}'))
+
+
+def change(before, after):
+    if not before or after is None:
+        return '-'
+    return f'{(after - before) / before:+.0%}'
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from myapp.benchmarks import BENCHMARK_PASSWORD, generate_benchmark_data
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera a massa de dados do benchmark: N usuários x M categorias x K transações '
+        '(reprodutível por --seed), substituindo a gerada antes com o mesmo prefixo'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--categories', type=int, default=10, help='Categorias por usuário')
+        parser.add_argument('--transactions', type=int, default=10000, help='Transações por usuário')
+        parser.add_argument('--prefix', default='bench', help='Usuários <prefix>-0, <prefix>-1, ...')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        users = generate_benchmark_data(
+            users=options['users'],
+            categories=options['categories'],
+            transactions=options['transactions'],
+            prefix=options['prefix'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        total = len(users) * options['transactions']
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(users)} usuários e {total:,} transações em {elapsed:.1f} s ({total / elapsed:,.0f} linhas/s); '
+            f'senha: {BENCHMARK_PASSWORD}'
+        ))
@@ -0,0 +1,40 @@
+import csv
+
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.bulk import BULK_BATCH_SIZE
+from myapp.importers import STATEMENT_FORMATS, StatementImporter, detect_format
+
+
+class Command(BaseCommand):
+    help = 'Importa extratos CSV/OFX como transações de um usuário, lendo os arquivos em streaming'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('paths', nargs='+')
+        parser.add_argument('--format', choices=STATEMENT_FORMATS, help='Padrão: pela extensão do arquivo')
+        parser.add_argument('--encoding', default='utf-8-sig')
+        parser.add_argument('--batch-size', type=int, default=BULK_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"Usuário não encontrado: {options['username']}")
+
+        for path in options['paths']:
+            statement_format = options['format'] or detect_format(path)
+            importer = StatementImporter(user, batch_size=options['batch_size'])
+            try:
+                with open(path, 'rb') as fileobj:
+                    result = importer.run(File(fileobj), statement_format, options['encoding'])
+            except (OSError, UnicodeDecodeError, LookupError, csv.Error) as e:
+                raise CommandError(f'Erro ao importar {path}: {e}')
+
+            self.stdout.write(self.style.SUCCESS(
+                f"{path}: {result['created']} transações importadas, {result['skipped']} linhas ignoradas"
+            ))
+            for error in result['errors']:
+                self.stdout.write(self.style.WARNING(f"  linha {error['line']}: {error['error']}"))
@@ -0,0 +1,22 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.rollup import rebuild_monthly_balances
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói do zero o consolidado mensal (MonthlyBalance) a partir das transações'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username para reconstruir apenas um usuário')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"Usuário não encontrado: {options['user']}")
+
+        total = rebuild_monthly_balances(user)
+        self.stdout.write(self.style.SUCCESS(f'Consolidado mensal reconstruído: {total} linhas'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from myapp.models import Transaction
+from myapp.search import create_search_index, uses_fts
+
+
+class Command(BaseCommand):
+    help = 'Recria os triggers e reconstrói o índice de busca (FTS5) das descrições das transações'
+
+    def handle(self, *args, **options):
+        if not uses_fts(connection):
+            raise CommandError('O índice de busca só existe no SQLite; nos demais bancos a busca usa icontains')
+
+        create_search_index(connection, rebuild=True)
+        total = Transaction.objects.count()
+        self.stdout.write(self.style.SUCCESS(f'Índice de busca reconstruído: {total} transações'))
@@ -0,0 +1,86 @@
+import re
+from collections import defaultdict
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+SAMPLE_RE = re.compile(r'^(\w+)\{(.*)\} (\S+)$')
+LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+PREFIX = 'myapp_http_'
+COLUMNS = (
+    ('request_duration_seconds', 'ms', 1000),
+    ('request_db_queries', 'queries', 1),
+    ('request_db_duration_seconds', 'db ms', 1000),
+    ('request_serializer_duration_seconds', 'ser. ms', 1000),
+    ('response_size_bytes', 'bytes', 1),
+)
+
+
+def parse_histograms(text):
+    # {(endpoint, method): {métrica: {'buckets': [(le, n)], 'sum': x, 'count': n}}}
+    series = defaultdict(lambda: defaultdict(lambda: {'buckets': [], 'sum': 0.0, 'count': 0}))
+    for line in text.splitlines():
+        match = SAMPLE_RE.match(line)
+        if not match or not match.group(1).startswith(PREFIX):
+            continue
+        name, labels, value = match.groups()
+        labels = dict(LABEL_RE.findall(labels))
+        if 'endpoint' not in labels or 'status' in labels:
+            continue
+        metric, kind = name[len(PREFIX):].rsplit('_', 1)
+        entry = series[labels['endpoint'], labels['method']][metric]
+        if kind == 'bucket':
+            entry['buckets'].append((float(labels['le']), float(value)))
+        elif kind in ('sum', 'count'):
+            entry[kind] = float(value)
+    return series
+
+
+def bucket_percentile(buckets, count, percentile):
+    # Limite superior do primeiro bucket que alcança o percentil
+    for bound, cumulative in buckets:
+        if cumulative >= count * percentile / 100:
+            return bound
+    return float('inf')
+
+
+class Command(BaseCommand):
+    help = (
+        'Resume as métricas de /api/v1/_metrics de um processo em execução: '
+        'requisições, tempo médio e p95, consultas, banco, serializers e tamanho por endpoint'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/api/v1/_metrics')
+        parser.add_argument('--raw', action='store_true', help='Mostra o texto no formato do Prometheus')
+
+    def handle(self, *args, **options):
+        try:
+            with urlopen(options['url'], timeout=10) as response:
+                text = response.read().decode()
+        except (URLError, OSError) as e:
+            raise CommandError(f'Não foi possível ler {options["url"]}: {e}')
+        if options['raw']:
+            self.stdout.write(text, ending='')
+            return
+
+        series = parse_histograms(text)
+        if not series:
+            self.stdout.write('Nenhuma requisição registrada')
+            return
+        header = ['endpoint', 'método', 'reqs', 'p95 ms'] + [label for _, label, _ in COLUMNS]
+        rows = []
+        for (endpoint, method), metrics in sorted(series.items()):
+            duration = metrics['request_duration_seconds']
+            count = duration['count']
+            p95 = bucket_percentile(duration['buckets'], count, 95)
+            row = [endpoint, method, f'{count:.0f}', '+Inf' if p95 == float('inf') else f'<= {p95 * 1000:g}']
+            for metric, _, scale in COLUMNS:
+                entry = metrics.get(metric)
+                row.append(f'{entry["sum"] / entry["count"] * scale:.1f}' if entry and entry['count'] else '-')
+            rows.append(row)
+        widths = [max(len(str(row[i])) for row in [header] + rows) for i in range(len(header))]
+        for row in [header] + rows:
+            self.stdout.write('  '.join(str(value).ljust(width) for value, width in zip(row, widths)))
+        self.stdout.write('Médias por requisição; p95 pelo limite do bucket do histograma.')
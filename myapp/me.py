@@ -0,0 +1,78 @@
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .api.v1.serializers import UserSerializer
+from .cache import app_cache
+from .models import UserProfile, UserSettings, ensure_user_rows
+
+ME_NAMESPACE = 'me'
+
+
+def build_me_payload(user, context=None):
+    data = dict(UserSerializer(user, context=context).data)
+    body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True).encode()
+    return {
+        'data': data,
+        'etag': '"%s"' % hashlib.md5(body, usedforsecurity=False).hexdigest(),
+        'last_modified': timezone.now().replace(microsecond=0),
+    }
+
+
+def get_me_payload(user, context=None):
+    # Payload do /me montado com uma consulta (select_related em perfil e
+    # configurações) e guardado no cache junto com o ETag e a data de geração,
+    # usados pelo ConditionalGetMiddleware para responder 304.
+    def build():
+        loaded = ensure_user_rows(User.objects.select_related('profile', 'settings').get(pk=user.pk))
+        return build_me_payload(loaded, context)
+    return app_cache.get_or_set(ME_NAMESPACE, user.pk, default=build)
+
+
+def has_user_rows(user):
+    try:
+        user.profile
+        user.settings
+    except (UserProfile.DoesNotExist, UserSettings.DoesNotExist):
+        return False
+    return True
+
+
+async def aget_me_payload(user, context=None):
+    async def build():
+        loaded = await User.objects.select_related('profile', 'settings').aget(pk=user.pk)
+        if not has_user_rows(loaded):
+            # Raro (usuário sem perfil/configurações): cria na thread síncrona
+            loaded = await sync_to_async(ensure_user_rows)(loaded)
+        return build_me_payload(loaded, context)
+    return await app_cache.aget_or_set(ME_NAMESPACE, user.pk, default=build)
+
+
+def invalidate_me_payload(user_id):
+    # Depois do commit, para uma leitura concorrente não guardar na versão
+    # nova o payload montado com as linhas antigas
+    app_cache.invalidate_on_commit(ME_NAMESPACE, user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_me_on_user_change(sender, instance, update_fields=None, **kwargs):
+    # last_login não faz parte do payload
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_me_payload(instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_save, sender=UserSettings)
+@receiver(post_delete, sender=UserSettings)
+def invalidate_me_on_related_change(sender, instance, **kwargs):
+    invalidate_me_payload(instance.user_id)
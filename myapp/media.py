@@ -0,0 +1,153 @@
+import functools
+import hashlib
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotAllowed
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .images import content_digest
+
+# Arquivos com o hash no nome nunca mudam: cache de um ano, sem revalidar
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+@functools.lru_cache(maxsize=1024)
+def file_digest(path, mtime_ns, size):
+    # Arquivos sem hash no nome (uploads antigos): o hash é calculado uma vez
+    # por versão do arquivo (mtime + tamanho) e fica em memória
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+def byte_range(header, size):
+    """
+    Intervalo (início, fim) pedido no cabeçalho Range, inclusivo. None quando
+    o arquivo deve ir inteiro (sem Range, sintaxe não suportada ou vários
+    intervalos); ValueError quando o intervalo está fora do arquivo.
+    """
+    match = RANGE_RE.match(header or '')
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if not start:
+        # bytes=-N: os últimos N bytes
+        if int(end) == 0:
+            raise ValueError(header)
+        return max(size - int(end), 0), size - 1
+    start = int(start)
+    if end and int(end) < start:
+        return None
+    if start >= size:
+        raise ValueError(header)
+    return start, min(int(end), size - 1) if end else size - 1
+
+
+class RangeFile:
+    """
+    Arquivo aberto limitado a ``length`` bytes a partir da posição atual: o
+    FileResponse lê o intervalo em blocos, sem carregá-lo inteiro. Não expõe
+    fileno() nem seek(), para que nenhum servidor envie além do intervalo.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def range_response(path, start, end, size, content_type):
+    f = open(path, 'rb')
+    f.seek(start)
+    response = FileResponse(RangeFile(f, end - start + 1), status=206, content_type=content_type)
+    response['Content-Length'] = end - start + 1
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+def file_response(request, path, size, etag, last_modified):
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    # If-Range: o intervalo só vale se o cliente ainda tem esta versão
+    if_range = request.headers.get('If-Range')
+    if request.method == 'GET' and (if_range is None or if_range in (etag, http_date(last_modified))):
+        try:
+            requested = byte_range(request.headers.get('Range'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if requested is not None:
+            return range_response(path, *requested, size, content_type)
+    return FileResponse(open(path, 'rb'), content_type=content_type)
+
+
+def serve_media(request, name):
+    """
+    Serve um arquivo de MEDIA_ROOT com ETag forte, Last-Modified, respostas
+    condicionais (304/412) e Range de um intervalo. O arquivo inteiro vai
+    como FileResponse de um arquivo aberto, que o servidor WSGI pode enviar
+    com os.sendfile (wsgi.file_wrapper).
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    try:
+        path = safe_join(settings.MEDIA_ROOT, name)
+        file_stat = os.stat(path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404('Arquivo não encontrado')
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise Http404('Arquivo não encontrado')
+
+    digest = content_digest(name)
+    immutable = digest is not None
+    etag = '"%s"' % (digest or file_digest(path, file_stat.st_mtime_ns, file_stat.st_size))
+    last_modified = int(file_stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = file_response(request, path, file_stat.st_size, etag, last_modified)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    if immutable:
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+class MediaFilesMiddleware:
+    """
+    Atende MEDIA_URL antes das demais middlewares (sessão, autenticação,
+    GZip — imagens já são comprimidas e a compressão impediria o sendfile),
+    com DEBUG ligado ou não. Substitui o static() do urls.py.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        prefix = settings.MEDIA_URL
+        if prefix.startswith('/') and request.path.startswith(prefix):
+            return serve_media(request, request.path[len(prefix):])
+        return self.get_response(request)
@@ -0,0 +1,257 @@
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .cache import app_cache
+
+# Métricas por endpoint, agregadas em memória por processo (como os
+# contadores do app_cache): cada worker expõe as suas em /api/v1/_metrics.
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+METRICS_VIEW_NAME = 'metrics'
+
+current_metrics = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.timings = {}
+        self.active = set()
+
+    def add(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def timed(name):
+    # Soma o tempo do bloco na métrica `name` da requisição atual; blocos
+    # aninhados com o mesmo nome contam uma vez só
+    metrics = current_metrics.get()
+    if metrics is None or name in metrics.active:
+        yield
+        return
+    metrics.active.add(name)
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.active.discard(name)
+        metrics.add(name, perf_counter() - start)
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_queries += 1
+        metrics.db_time += perf_counter() - start
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # Instalado em cada conexão, e não por requisição com execute_wrapper():
+    # as conexões são por thread, e as views assíncronas consultam o banco
+    # nas threads do sync_to_async (que herdam o contexto da requisição)
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets, labels=('endpoint', 'method')):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.labels = labels
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def observe(self, label_values, value):
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def exposition(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            snapshot = [(labels, list(counts), total, count) for labels, (counts, total, count) in self.series.items()]
+        for label_values, counts, total, count in sorted(snapshot):
+            labels = format_labels(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total}')
+            lines.append(f'{self.name}_count{{{labels}}} {count}')
+        return lines
+
+    def reset(self):
+        with self.lock:
+            self.series.clear()
+
+
+class Counter:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, label_values):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + 1
+
+    def exposition(self, values=None):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        if values is None:
+            with self.lock:
+                values = dict(self.values)
+        for label_values, value in sorted(values.items()):
+            lines.append(f'{self.name}{{{format_labels(zip(self.labels, label_values))}}} {value}')
+        return lines
+
+    def reset(self):
+        with self.lock:
+            self.values.clear()
+
+
+def format_labels(pairs):
+    return ','.join('%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"')) for name, value in pairs)
+
+
+REQUEST_DURATION = Histogram('myapp_http_request_duration_seconds', 'Tempo total da requisição', DURATION_BUCKETS)
+DB_QUERIES = Histogram('myapp_http_request_db_queries', 'Consultas ao banco por requisição', QUERY_BUCKETS)
+DB_DURATION = Histogram('myapp_http_request_db_duration_seconds', 'Tempo no banco por requisição', DURATION_BUCKETS)
+SERIALIZER_DURATION = Histogram(
+    'myapp_http_request_serializer_duration_seconds', 'Tempo nos serializers por requisição', DURATION_BUCKETS
+)
+RESPONSE_SIZE = Histogram('myapp_http_response_size_bytes', 'Tamanho do corpo da resposta', SIZE_BUCKETS)
+RESPONSES = Counter('myapp_http_responses_total', 'Respostas por status', ('endpoint', 'method', 'status'))
+CACHE_REQUESTS = Counter('myapp_app_cache_requests_total', 'Leituras do cache da aplicação', ('namespace', 'outcome'))
+HISTOGRAMS = (REQUEST_DURATION, DB_QUERIES, DB_DURATION, SERIALIZER_DURATION, RESPONSE_SIZE)
+
+
+def response_size(response):
+    if not response.streaming:
+        return len(response.content)
+    length = response.get('Content-Length')
+    return int(length) if length else None
+
+
+def record_request(request, response, metrics, duration):
+    match = request.resolver_match
+    endpoint = match.view_name if match else 'unmatched'
+    if endpoint == METRICS_VIEW_NAME:
+        return
+    labels = (endpoint, request.method)
+    REQUEST_DURATION.observe(labels, duration)
+    DB_QUERIES.observe(labels, metrics.db_queries)
+    DB_DURATION.observe(labels, metrics.db_time)
+    SERIALIZER_DURATION.observe(labels, metrics.timings.get('serializer', 0.0))
+    size = response_size(response)
+    if size is not None:
+        RESPONSE_SIZE.observe(labels, size)
+    RESPONSES.inc(labels + (response.status_code,))
+
+
+def server_timing(metrics, duration):
+    entries = [
+        'total;dur=%.2f' % (duration * 1000),
+        'db;dur=%.2f;desc="%d queries"' % (metrics.db_time * 1000, metrics.db_queries),
+    ]
+    entries.extend('%s;dur=%.2f' % (name, seconds * 1000) for name, seconds in sorted(metrics.timings.items()))
+    return ', '.join(entries)
+
+
+class PerformanceMiddleware:
+    """
+    Mede cada requisição (tempo total, consultas e tempo no banco, tempo nos
+    serializers e tamanho da resposta), devolve os números no cabeçalho
+    Server-Timing e os agrega nos histogramas deste módulo. Fica no início
+    da pilha para cobrir as demais middlewares e ver o corpo já comprimido.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERFORMANCE_METRICS', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics, perf_counter() - start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        start = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics, perf_counter() - start)
+
+    def finish(self, request, response, metrics, duration):
+        record_request(request, response, metrics, duration)
+        response['Server-Timing'] = server_timing(metrics, duration)
+        return response
+
+
+def exposition():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.exposition())
+    lines.extend(RESPONSES.exposition())
+    cache_values = {
+        (namespace, outcome): value
+        for namespace, counters in app_cache.stats().items()
+        for outcome, value in counters.items()
+    }
+    lines.extend(CACHE_REQUESTS.exposition(cache_values))
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    for histogram in HISTOGRAMS:
+        histogram.reset()
+    RESPONSES.reset()
+
+
+def metrics_view(request):
+    # Formato texto do Prometheus; só para os IPs de METRICS_ALLOWED_IPS
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.21 on 2026-10-17 21:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import TruncMonth
+
+
+def populate_monthly_balances(apps, schema_editor):
+    Transaction = apps.get_model('myapp', 'Transaction')
+    MonthlyBalance = apps.get_model('myapp', 'MonthlyBalance')
+    rows = Transaction.objects.annotate(
+        month=TruncMonth('date')
+    ).values('user_id', 'month', 'category_id', 'type').annotate(
+        total=models.Sum('amount'), count=models.Count('id')
+    ).order_by()
+    MonthlyBalance.objects.bulk_create(
+        (MonthlyBalance(**row) for row in rows.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('myapp', '0004_userprofile_created_at_userprofile_updated_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('type', models.CharField(choices=[('income', 'Receita'), ('expense', 'Despesa')], max_length=10)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_balances', to='myapp.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_balances', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'month', 'category', 'type')},
+            },
+        ),
+        migrations.RunPython(populate_monthly_balances, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -36,14 +36,38 @@ class Transaction(models.Model):
     description = models.CharField(max_length=200)
     date = models.DateField()
     type = models.CharField(max_length=10, choices=TYPE_CHOICES)
-    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='transactions')
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transactions')
+    # Sem índice próprio: os índices compostos abaixo começam por estas colunas
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='transactions', db_index=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transactions', db_index=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='transaction_user_date_idx'),
+            models.Index(fields=['user', 'type', 'date'], name='transaction_user_type_date_idx'),
+            models.Index(fields=['category', 'date'], name='transaction_category_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.description} - R$ {self.amount}"
 
+# Consolidado mensal das transações por usuário, categoria e tipo.
+# Mantido incrementalmente pelos receivers em myapp/rollup.py.
+class MonthlyBalance(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='monthly_balances')
+    month = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='monthly_balances')
+    type = models.CharField(max_length=10, choices=Transaction.TYPE_CHOICES)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['user', 'month', 'category', 'type']
+
+    def __str__(self):
+        return f"{self.user_id} {self.month:%Y-%m} {self.category_id} {self.type}: {self.total}"
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     phone = models.CharField(max_length=20, blank=True, null=True)
@@ -53,6 +77,8 @@ class UserProfile(models.Model):
     country = models.CharField(max_length=100, blank=True, null=True)
     birth_date = models.DateField(null=True, blank=True)
     profile_picture = models.ImageField(upload_to='profile_pictures/', null=True, blank=True)
+    # {tamanho: {formato: nome do arquivo}}, preenchido por myapp/images.py
+    profile_picture_variants = models.JSONField(default=dict, blank=True)
     bio = models.TextField(max_length=500, blank=True, null=True)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(default=timezone.now)
@@ -60,23 +86,27 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"{self.user.username}'s profile"
 
-@receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
-    logger.info(f"Signal post_save para usuário: {instance.username}")
-    if created:
-        logger.info(f"Criando perfil para novo usuário: {instance.username}")
-        UserProfile.objects.create(user=instance)
-        UserSettings.objects.create(user=instance)
-    else:
+def ensure_user_rows(user):
+    # Materializa no primeiro acesso o perfil e as configurações que faltarem
+    # (ex.: usuários criados antes do signal ou via bulk_create).
+    for related_name, model in (('profile', UserProfile), ('settings', UserSettings)):
         try:
-            instance.profile.save()
-            instance.settings.save()
-        except UserProfile.DoesNotExist:
-            logger.info(f"Perfil não encontrado, criando para usuário: {instance.username}")
-            UserProfile.objects.create(user=instance)
-        except UserSettings.DoesNotExist:
-            logger.info(f"Configurações não encontradas, criando para usuário: {instance.username}")
-            UserSettings.objects.create(user=instance)
+            getattr(user, related_name)
+        except model.DoesNotExist:
+            logger.debug("Criando %s ausente para o usuário: %s", related_name, user.username)
+            setattr(user, related_name, model.objects.get_or_create(user=user)[0])
+    return user
+
+@receiver(post_save, sender=User)
+def create_user_profile(sender, instance, created, raw=False, **kwargs):
+    # Só na criação: saves posteriores (ex.: last_login a cada login) não
+    # tocam nas tabelas de perfil e configurações.
+    if not created or raw:
+        return
+    logger.debug("Criando perfil e configurações para novo usuário: %s", instance.username)
+    with transaction.atomic():
+        instance.profile = UserProfile.objects.create(user=instance)
+        instance.settings = UserSettings.objects.create(user=instance)
 
 class UserSettings(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='settings')
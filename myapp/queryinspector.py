@@ -0,0 +1,182 @@
+import logging
+import os
+import re
+import threading
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Views inspecionadas pela middleware (pelo módulo da view resolvida)
+INSPECTED_MODULES = ('myapp.api.v1',)
+
+STRING_RE = re.compile(r"'(?:''|[^'])*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+SPACE_RE = re.compile(r'\s+')
+
+STACK_DEPTH = 12
+DJANGO_DB_DIR = os.path.join(os.sep, 'django', 'db', '')
+WRAPPER_FILES = {__file__, metrics.__file__}
+
+current_inspector = ContextVar('query_inspector', default=None)
+reported = set()
+reported_lock = threading.Lock()
+
+
+class QueryProblem(AssertionError):
+    """N+1 ou consulta lenta detectada com QUERY_INSPECTOR_RAISE ligado."""
+
+
+def normalize_sql(sql):
+    # Assinatura da consulta: literais e parâmetros viram "?" e listas de IN
+    # de qualquer tamanho viram "(...)"
+    sql = STRING_RE.sub('?', sql.replace('%s', '?'))
+    sql = IN_LIST_RE.sub('(...)', NUMBER_RE.sub('?', sql))
+    return SPACE_RE.sub(' ', sql).strip()
+
+
+def query_stack():
+    # Os frames mais internos fora da maquinaria do ORM e dos wrappers de
+    # consulta: o acesso (campo do serializer, laço na view) que disparou a consulta
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if DJANGO_DB_DIR not in frame.filename and frame.filename not in WRAPPER_FILES
+    ]
+    return frames[-STACK_DEPTH:]
+
+
+class QueryInspector:
+    def __init__(self, label='', repeat_threshold=None, slow_query_ms=None):
+        self.label = label
+        self.repeat_threshold = repeat_threshold or settings.QUERY_REPEAT_THRESHOLD
+        self.slow_query = (slow_query_ms or settings.QUERY_SLOW_MS) / 1000
+        self.counts = {}
+        self.slowest = {}
+        self.problems = {}
+
+    def record(self, sql, duration):
+        signature = normalize_sql(sql)
+        count = self.counts[signature] = self.counts.get(signature, 0) + 1
+        # A pilha é capturada só quando há problema, na repetição que passa
+        # do limite (já dentro do laço) ou na consulta lenta
+        if count == self.repeat_threshold + 1:
+            self.problems['repetida', signature] = query_stack()
+        if duration > self.slow_query:
+            if signature not in self.slowest:
+                self.problems['lenta', signature] = query_stack()
+            self.slowest[signature] = max(duration, self.slowest.get(signature, 0))
+
+    def describe(self, kind, signature):
+        if kind == 'repetida':
+            return f'consulta repetida {self.counts[signature]}x (limite {self.repeat_threshold}): {signature}'
+        duration = self.slowest[signature] * 1000
+        return f'consulta lenta ({duration:.1f} ms, limite {self.slow_query * 1000:g} ms): {signature}'
+
+    def report(self):
+        messages = []
+        for (kind, signature), stack in self.problems.items():
+            message = f'{self.label}: {self.describe(kind, signature)}'
+            messages.append(message)
+            # A pilha é logada uma vez por assinatura em cada processo
+            with reported_lock:
+                if (self.label, kind, signature) in reported:
+                    continue
+                reported.add((self.label, kind, signature))
+            logger.warning('%s\n%s', message, ''.join(traceback.format_list(stack)).rstrip())
+        if messages and settings.QUERY_INSPECTOR_RAISE:
+            raise QueryProblem('\n'.join(messages))
+
+
+def inspect_query(execute, sql, params, many, context):
+    inspector = current_inspector.get()
+    if inspector is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        inspector.record(sql, perf_counter() - start)
+
+
+@receiver(connection_created)
+def install_query_inspector(sender, connection, **kwargs):
+    # Mesmo esquema do myapp.metrics: wrapper fixo em cada conexão (as views
+    # assíncronas consultam o banco em outras threads) e estado no contexto
+    if inspect_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(inspect_query)
+
+
+@contextmanager
+def inspect_queries(label, repeat_threshold=None, slow_query_ms=None):
+    """
+    Inspeciona as consultas do bloco e, ao final, loga (ou levanta
+    QueryProblem, com QUERY_INSPECTOR_RAISE) as repetidas e as lentas.
+    """
+    inspector = QueryInspector(label, repeat_threshold, slow_query_ms)
+    token = current_inspector.set(inspector)
+    try:
+        yield inspector
+    finally:
+        current_inspector.reset(token)
+    inspector.report()
+
+
+def is_inspected(request):
+    match = request.resolver_match
+    return match is not None and match.func.__module__.startswith(INSPECTED_MODULES)
+
+
+class QueryInspectorMiddleware:
+    """
+    Detector opcional (QUERY_INSPECTOR) de N+1 e consultas lentas nas views
+    de myapp.api.v1. Lê os settings a cada requisição, para que os testes
+    possam ligá-lo com override_settings.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not settings.QUERY_INSPECTOR:
+            return self.get_response(request)
+        inspector = QueryInspector()
+        token = current_inspector.set(inspector)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_inspector.reset(token)
+        return self.finish(request, response, inspector)
+
+    async def __acall__(self, request):
+        if not settings.QUERY_INSPECTOR:
+            return await self.get_response(request)
+        inspector = QueryInspector()
+        token = current_inspector.set(inspector)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_inspector.reset(token)
+        return self.finish(request, response, inspector)
+
+    def finish(self, request, response, inspector):
+        if is_inspected(request):
+            inspector.label = f'{request.method} {request.resolver_match.view_name}'
+            inspector.report()
+        return response
@@ -0,0 +1,168 @@
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, QuerySet, Sum
+from django.db.models.functions import TruncMonth
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Category, MonthlyBalance, Transaction
+import logging
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_FIELDS = ('user_id', 'date', 'category_id', 'type', 'amount')
+# Nomes aceitos em save(update_fields=...) para os mesmos campos
+ROLLUP_FIELD_NAMES = {'user', 'user_id', 'date', 'category', 'category_id', 'type', 'amount'}
+# Exclusões que chegam às transações em cascata a partir destes modelos
+# levam junto, pelo mesmo CASCADE, todas as linhas do consolidado afetadas
+CASCADE_ORIGINS = (Category, User)
+
+
+def month_of(date):
+    return date.replace(day=1)
+
+
+def adjust_monthly_balance(user_id, month, category_id, type, amount, count):
+    # Aplica um delta ao consolidado com UPDATE atômico (F()), criando a linha
+    # apenas quando o delta é positivo e ela ainda não existe.
+    key = {'user_id': user_id, 'month': month, 'category_id': category_id, 'type': type}
+    with transaction.atomic():
+        updated = MonthlyBalance.objects.filter(**key).update(
+            total=F('total') + amount,
+            count=F('count') + count,
+        )
+        if updated:
+            if count < 0:
+                MonthlyBalance.objects.filter(count__lte=0, **key).delete()
+            return
+        if count <= 0:
+            return
+        try:
+            with transaction.atomic():
+                MonthlyBalance.objects.create(total=amount, count=count, **key)
+        except IntegrityError:
+            # Outra requisição criou a linha entre o UPDATE e o INSERT
+            MonthlyBalance.objects.filter(**key).update(
+                total=F('total') + amount,
+                count=F('count') + count,
+            )
+
+
+def _snapshot(instance, fallback=None):
+    # Lê direto do __dict__ para não disparar consultas em campos adiados.
+    # Campos não carregados não são gravados pelo save(), então valem os do
+    # estado anterior (fallback); sem ele, retorna None.
+    values = instance.__dict__
+    state = []
+    for index, field in enumerate(ROLLUP_FIELDS):
+        if field in values:
+            state.append(values[field])
+        elif fallback is not None:
+            state.append(fallback[index])
+        else:
+            return None
+    user_id, date, category_id, type, amount = state
+    date = Transaction._meta.get_field('date').to_python(date)
+    amount = Transaction._meta.get_field('amount').to_python(amount)
+    return (user_id, date, category_id, type, amount)
+
+
+def _apply(state, sign):
+    if state is None or None in state:
+        return
+    user_id, date, category_id, type, amount = state
+    adjust_monthly_balance(user_id, month_of(date), category_id, type, sign * amount, sign)
+
+
+def _load_state(instance):
+    return Transaction.objects.filter(pk=instance.pk).values_list(*ROLLUP_FIELDS).first()
+
+
+@receiver(pre_save, sender=Transaction)
+def load_rollup_state(sender, instance, raw=False, update_fields=None, **kwargs):
+    # O estado anterior vem do banco só no save de uma linha existente que
+    # pode mexer no consolidado; leituras (listagens, exportação) não pagam nada
+    instance._rollup_state = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not ROLLUP_FIELD_NAMES.intersection(update_fields):
+        return
+    instance._rollup_state = _load_state(instance)
+
+
+@receiver(post_save, sender=Transaction)
+def update_rollup_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        _apply(_snapshot(instance), 1)
+        return
+    old_state = getattr(instance, '_rollup_state', None)
+    if old_state is None:
+        return
+    new_state = _snapshot(instance, old_state)
+    if old_state != new_state:
+        _apply(old_state, -1)
+        _apply(new_state, 1)
+
+
+def is_cascade(origin):
+    # origin: a instância ou o queryset em que delete() foi chamado
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(model, CASCADE_ORIGINS)
+
+
+@receiver(pre_delete, sender=Transaction)
+def load_rollup_state_for_delete(sender, instance, origin=None, **kwargs):
+    # Na cascata de uma categoria ou usuário o consolidado sai inteiro no
+    # mesmo DELETE; ajustá-lo linha a linha seria uma ida ao banco por transação
+    if origin is not None and is_cascade(origin):
+        instance._rollup_state = None
+        return
+    # Instâncias carregadas com only()/defer() não têm todos os campos
+    instance._rollup_state = _snapshot(instance) or _load_state(instance)
+
+
+@receiver(post_delete, sender=Transaction)
+def update_rollup_on_delete(sender, instance, origin=None, **kwargs):
+    if origin is not None and is_cascade(origin):
+        return
+    state = getattr(instance, '_rollup_state', None)
+    if state is None:
+        logger.warning("Transação %s removida sem estado para o consolidado mensal", instance.pk)
+    _apply(state, -1)
+
+
+def apply_bulk_to_monthly_balances(transactions, sign=1):
+    # Para caminhos que não disparam signals (bulk_create): agrega os deltas
+    # em memória e aplica um UPDATE por chave, não um por transação.
+    deltas = {}
+    for instance in transactions:
+        user_id, date, category_id, type, amount = _snapshot(instance)
+        key = (user_id, month_of(date), category_id, type)
+        total, count = deltas.get(key, (0, 0))
+        deltas[key] = (total + amount, count + 1)
+    for (user_id, month, category_id, type), (total, count) in deltas.items():
+        adjust_monthly_balance(user_id, month, category_id, type, sign * total, sign * count)
+
+
+def rebuild_monthly_balances(user=None):
+    # Recalcula o consolidado do zero a partir das transações
+    transactions = Transaction.objects.all()
+    balances = MonthlyBalance.objects.all()
+    if user is not None:
+        transactions = transactions.filter(user=user)
+        balances = balances.filter(user=user)
+
+    rows = transactions.annotate(month=TruncMonth('date')).values(
+        'user_id', 'month', 'category_id', 'type'
+    ).annotate(total=Sum('amount'), count=Count('id')).order_by()
+
+    with transaction.atomic():
+        balances.delete()
+        created = MonthlyBalance.objects.bulk_create(
+            (MonthlyBalance(**row) for row in rows.iterator()),
+            batch_size=1000,
+        )
+    logger.info("Consolidado mensal reconstruído: %d linhas", len(created))
+    return len(created)
@@ -0,0 +1,96 @@
+import re
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+
+# Busca textual na descrição das transações. No SQLite, uma tabela FTS5 de
+# conteúdo externo (sem cópia do texto) espelha myapp_transaction e é mantida
+# por triggers, então bulk_create, update() e deletes em cascata também a
+# atualizam. Em outros bancos a busca cai para icontains.
+SEARCH_TABLE = 'myapp_transaction_search'
+SEARCH_MAX_TERMS = 8
+
+SEARCH_TABLE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "description, content='myapp_transaction', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+SEARCH_TRIGGERS_SQL = (
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ai AFTER INSERT ON myapp_transaction BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, description) VALUES (new.id, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ad AFTER DELETE ON myapp_transaction BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, description) VALUES ('delete', old.id, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_au AFTER UPDATE OF description ON myapp_transaction BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, description) VALUES ('delete', old.id, old.description);
+        INSERT INTO {SEARCH_TABLE}(rowid, description) VALUES (new.id, new.description);
+    END""",
+)
+
+
+def uses_fts(connection):
+    return connection.vendor == 'sqlite'
+
+
+def create_search_index(connection, rebuild=False):
+    if not uses_fts(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(SEARCH_TABLE_SQL)
+        for sql in SEARCH_TRIGGERS_SQL:
+            cursor.execute(sql)
+        if rebuild:
+            cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+            # Com estatísticas o planejador parte dos ids da busca (rowid IN)
+            # em vez de varrer todas as transações do usuário pelo índice
+            # (user, date) testando cada uma contra a lista
+            cursor.execute("ANALYZE myapp_transaction")
+
+
+def drop_search_index(connection):
+    if not uses_fts(connection):
+        return
+    with connection.cursor() as cursor:
+        for suffix in ('ai', 'ad', 'au'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_{suffix}")
+        cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+@receiver(post_migrate)
+def ensure_search_triggers(sender, app_config=None, using='default', plan=None, **kwargs):
+    # Migrações que recriam myapp_transaction no SQLite (ALTER via cópia da
+    # tabela) apagam os triggers; o índice continua válido, pois os ids são
+    # preservados, então basta recriá-los.
+    if app_config is None or app_config.label != 'myapp':
+        return
+    connection = connections[using]
+    if uses_fts(connection) and SEARCH_TABLE in connection.introspection.table_names():
+        create_search_index(connection)
+
+
+def search_terms(text):
+    return re.findall(r'\w+', text or '')[:SEARCH_MAX_TERMS]
+
+
+def match_expression(terms):
+    # Todos os termos, cada um como prefixo: "merc" encontra "Mercado"
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_transactions(queryset, text):
+    terms = search_terms(text)
+    if not terms:
+        return queryset
+    if uses_fts(connections[queryset.db]):
+        return queryset.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s",
+            (match_expression(terms),),
+        ))
+    condition = Q()
+    for term in terms:
+        condition &= Q(description__icontains=term)
+    return queryset.filter(condition)
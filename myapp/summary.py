@@ -0,0 +1,115 @@
+import asyncio
+from datetime import timedelta
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .api.v1.fast_serializers import ValuesSerializer
+from .api.v1.serializers import TransactionSerializer
+from .cache import app_cache
+from .models import Category, Transaction
+import logging
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_NAMESPACE = 'summary'
+
+
+def current_month_range(today=None):
+    today = today or timezone.localdate()
+    start_of_month = today.replace(day=1)
+    end_of_month = (start_of_month + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return start_of_month, end_of_month
+
+
+def summary_rows(user, start, end):
+    # Uma única consulta com agregação condicional sobre o consolidado mensal
+    # (MonthlyBalance): O(categorias) linhas em vez de todas as transações.
+    # Os totais de receitas e despesas saem da mesma consulta.
+    in_period = Q(monthly_balances__month__range=[start, end])
+    return Category.objects.filter(user=user).annotate(
+        total=Sum('monthly_balances__total', filter=in_period),
+        income=Sum('monthly_balances__total', filter=in_period & Q(monthly_balances__type='income')),
+        expense=Sum('monthly_balances__total', filter=in_period & Q(monthly_balances__type='expense')),
+    ).values('name', 'total', 'income', 'expense')
+
+
+def recent_transactions_rows(user):
+    fast_serializer = ValuesSerializer.for_serializer(TransactionSerializer)
+    return fast_serializer.values(Transaction.objects.filter(user=user).order_by('-date'))[:5]
+
+
+def build_financial_summary(rows):
+    total_income = Decimal('0')
+    total_expense = Decimal('0')
+    category_summary = []
+    for row in rows:
+        total_income += row['income'] or 0
+        total_expense += row['expense'] or 0
+        category_summary.append({'name': row['name'], 'total': row['total']})
+
+    return {
+        'total_income': total_income,
+        'total_expense': total_expense,
+        'balance': total_income - total_expense,
+        'category_summary': category_summary,
+    }
+
+
+def compute_financial_summary(user, start, end):
+    return build_financial_summary(summary_rows(user, start, end))
+
+
+def get_financial_summary(user):
+    # Resumo do mês atual, servido do cache por usuário e mês; o cache guarda
+    # os dados já serializados e é invalidado pelos receivers abaixo.
+    start, end = current_month_range()
+
+    def build():
+        data = compute_financial_summary(user, start, end)
+        fast_serializer = ValuesSerializer.for_serializer(TransactionSerializer)
+        data['recent_transactions'] = fast_serializer.many(recent_transactions_rows(user), {'user_id': user.pk})
+        return data
+    return app_cache.get_or_set(SUMMARY_NAMESPACE, user.pk, start.isoformat(), default=build)
+
+
+async def alist(queryset):
+    return [row async for row in queryset]
+
+
+async def aget_financial_summary(user):
+    # Versão assíncrona: as duas consultas independentes são disparadas juntas
+    # (asyncio.gather). No ORM assíncrono do Django 4.2 elas ainda passam pela
+    # thread síncrona compartilhada, então só correm em paralelo com a
+    # montagem do mapa de categorias e com o restante do event loop.
+    start, end = current_month_range()
+
+    async def build():
+        fast_serializer = ValuesSerializer.for_serializer(TransactionSerializer)
+        rows, recent, fields = await asyncio.gather(
+            alist(summary_rows(user, start, end)),
+            alist(recent_transactions_rows(user)),
+            sync_to_async(fast_serializer.get_fields)({'user_id': user.pk}),
+        )
+        data = build_financial_summary(rows)
+        data['recent_transactions'] = fast_serializer.many(recent, fields=fields)
+        return data
+    return await app_cache.aget_or_set(SUMMARY_NAMESPACE, user.pk, start.isoformat(), default=build)
+
+
+def invalidate_financial_summary(user_id):
+    # No commit, uma vez por usuário, por mais transações que ele altere
+    app_cache.invalidate_on_commit(SUMMARY_NAMESPACE, user_id)
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_summary_on_change(sender, instance, **kwargs):
+    logger.debug("Invalidando cache do resumo financeiro do usuário %s", instance.user_id)
+    invalidate_financial_summary(instance.user_id)
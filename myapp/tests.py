@@ -1,3 +1,1642 @@
-from django.test import TestCase
+from base64 import b64encode
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+import csv
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import shutil
+import tempfile
+import time
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import Permission, User, update_last_login
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection
+from django.db.models import F, Sum
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import images, metrics
+from .authentication import CachedJWTAuthentication, auth_user_cache_key, token_cache
+from .cache import app_cache
+from .cache_backends import SQLiteCache
+from .logging_handlers import AsyncRotatingFileHandler
+from .bulk import BULK_BATCH_SIZE, bulk_create_transactions, upsert_categories
+from .categories import CATEGORY_LIST_NAMESPACE, CATEGORY_MAP_NAMESPACE, get_category_map
+from .exporters import iter_csv_export, iter_ndjson_export
+from .importers import CategoryResolver, StatementImporter, parse_amount, parse_date
+from .api.v1.pagination import TransactionCursorPagination
+from .api.v1.fast_serializers import ValuesSerializer
+from .api.v1.serializers import CategorySerializer, TransactionSerializer, UserSerializer
+from .benchmarks import WORKLOADS, TestClientTarget, benchmark_users, generate_benchmark_data, run_benchmark
+from .me import ME_NAMESPACE
+from .models import Category, MonthlyBalance, Transaction, UserProfile, UserSettings, ensure_user_rows
+from .rollup import apply_bulk_to_monthly_balances, rebuild_monthly_balances
+from .queryinspector import QueryProblem, inspect_queries, normalize_sql
+from .summary import SUMMARY_NAMESPACE, current_month_range
+
+
+class TransactionIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('indexes', 'indexes@example.com', 'senha-segura-123')
+        cls.category = Category.objects.create(name='Mercado', type='expense', user=cls.user)
+        Transaction.objects.create(
+            amount='10.00', description='Compra', date=date(2024, 1, 10),
+            type='expense', category=cls.category, user=cls.user,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertUsesIndex(self, sql, params, index_name):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Plano de execução verificado apenas no SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertRegex(plan, rf'USING (COVERING )?INDEX {index_name}\b', sql)
+
+    def assertQuerySetUsesIndex(self, queryset, index_name):
+        sql, params = queryset.query.sql_with_params()
+        self.assertUsesIndex(sql, params, index_name)
+
+    def assertEndpointUsesIndex(self, url, index_name):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        transaction_queries = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and 'FROM "myapp_transaction"' in query['sql']
+        ]
+        self.assertTrue(transaction_queries)
+        for sql in transaction_queries:
+            self.assertUsesIndex(sql, (), index_name)
+
+    def test_list_uses_user_date_index(self):
+        self.assertEndpointUsesIndex('/api/v1/finance/transactions/', 'transaction_user_date_idx')
+
+    def test_summary_uses_user_date_index(self):
+        self.assertEndpointUsesIndex('/api/v1/finance/summary/', 'transaction_user_date_idx')
+
+    def test_month_range_by_type_uses_user_type_date_index(self):
+        queryset = Transaction.objects.filter(
+            user=self.user, type='expense', date__range=[date(2024, 1, 1), date(2024, 1, 31)]
+        ).values('user').annotate(total=Sum('amount'))
+        self.assertQuerySetUsesIndex(queryset, 'transaction_user_type_date_idx')
+
+    def test_month_range_by_category_uses_category_date_index(self):
+        queryset = Transaction.objects.filter(
+            category=self.category, date__range=[date(2024, 1, 1), date(2024, 1, 31)]
+        )
+        self.assertQuerySetUsesIndex(queryset, 'transaction_category_date_idx')
+
+
+class MonthlyBalanceRollupTests(TestCase):
+    # Depois de cada escrita, o consolidado mantido pelos signals tem que ser
+    # igual ao reconstruído do zero
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('rollup', 'rollup@example.com', 'senha-segura-123')
+        cls.market = Category.objects.create(name='Mercado', type='expense', user=cls.user)
+        cls.pharmacy = Category.objects.create(name='Farmácia', type='expense', user=cls.user)
+        cls.salary = Category.objects.create(name='Salário', type='income', user=cls.user)
+
+    def balances(self):
+        return sorted(MonthlyBalance.objects.filter(user=self.user).values_list(
+            'month', 'category_id', 'type', 'total', 'count'
+        ))
+
+    def assertMatchesRebuild(self):
+        incremental = self.balances()
+        rebuild_monthly_balances(self.user)
+        self.assertEqual(incremental, self.balances())
+        return incremental
+
+    def create(self, **kwargs):
+        values = {'amount': Decimal('10.00'), 'description': 'Compra', 'date': date(2024, 1, 15),
+                  'type': 'expense', 'category': self.market, 'user': self.user}
+        values.update(kwargs)
+        return Transaction.objects.create(**values)
+
+    def test_incremental_rows_match_rebuild_after_each_write(self):
+        first = self.create()
+        self.create(amount=Decimal('5.50'))
+        self.assertEqual(self.assertMatchesRebuild(), [(date(2024, 1, 1), self.market.pk, 'expense', Decimal('15.50'), 2)])
+
+        first.amount = Decimal('20.00')
+        first.save()
+        self.assertMatchesRebuild()
+
+        first.date = date(2024, 3, 2)
+        first.save()
+        self.assertMatchesRebuild()
+
+        first.category = self.pharmacy
+        first.save()
+        self.assertMatchesRebuild()
+
+        first.type, first.category = 'income', self.salary
+        first.save()
+        self.assertMatchesRebuild()
+
+        # Instância com campos adiados: os não carregados valem os do banco
+        deferred = Transaction.objects.only('id', 'amount').get(pk=first.pk)
+        deferred.amount = Decimal('99.99')
+        deferred.save()
+        self.assertMatchesRebuild()
+
+        Transaction.objects.only('id', 'user').get(pk=first.pk).delete()
+        self.assertEqual(self.assertMatchesRebuild(), [(date(2024, 1, 1), self.market.pk, 'expense', Decimal('5.50'), 1)])
+
+        batch = [
+            Transaction(amount=Decimal('1.25'), description='Lote', date=date(2024, month, 1), type='expense',
+                        category=self.market, user=self.user)
+            for month in (1, 1, 2)
+        ]
+        Transaction.objects.bulk_create(batch)
+        apply_bulk_to_monthly_balances(batch)
+        self.assertMatchesRebuild()
+        Transaction.objects.filter(pk__in=[item.pk for item in batch]).delete()
+        self.assertEqual(self.assertMatchesRebuild(), [(date(2024, 1, 1), self.market.pk, 'expense', Decimal('5.50'), 1)])
+
+    def test_reads_and_unrelated_saves_do_not_query_the_previous_state(self):
+        transaction_id = self.create().pk
+        with self.assertNumQueries(1):
+            loaded = Transaction.objects.get(pk=transaction_id)
+        self.assertFalse(hasattr(loaded, '_rollup_state'))
+        loaded.description = 'Feira'
+        with self.assertNumQueries(1):
+            loaded.save(update_fields=['description', 'updated_at'])
+        self.assertMatchesRebuild()
+
+    def cascade_queries(self, rows, delete):
+        # Uma categoria nova com `rows` transações; devolve as consultas de `delete`
+        category = Category.objects.create(name=f'Cascata {rows}', type='expense', user=self.user)
+        batch = self.build_batch(rows, category)
+        Transaction.objects.bulk_create(batch)
+        apply_bulk_to_monthly_balances(batch)
+        with CaptureQueriesContext(connection) as ctx:
+            delete(category)
+        return len(ctx)
+
+    def build_batch(self, rows, category):
+        return [
+            Transaction(amount=Decimal('2.00'), description='Lote', date=date(2024, 1 + index % 6, 1),
+                        type='expense', category=category, user=self.user)
+            for index in range(rows)
+        ]
+
+    def test_category_cascade_does_not_adjust_the_rollup_per_row(self):
+        kept = self.create()
+        small = self.cascade_queries(3, lambda category: category.delete())
+        large = self.cascade_queries(300, lambda category: category.delete())
+        # Só os DELETEs em lotes crescem com as linhas, não há UPDATE por transação
+        self.assertLess(large, 10)
+        self.assertLessEqual(large - small, 3)
+        self.assertEqual(self.assertMatchesRebuild(), [(date(2024, 1, 1), self.market.pk, 'expense', Decimal('10.00'), 1)])
+
+        queries = self.cascade_queries(300, lambda category: Category.objects.filter(pk=category.pk).delete())
+        self.assertLess(queries, 10)
+        self.assertEqual(Transaction.objects.filter(user=self.user).get(), kept)
+        self.assertMatchesRebuild()
+
+    def test_user_cascade_does_not_adjust_the_rollup_per_row(self):
+        user = User.objects.create_user('cascata', 'cascata@example.com', 'senha-segura-123')
+        category = Category.objects.create(name='Mercado', type='expense', user=user)
+        batch = [
+            Transaction(amount=Decimal('1.00'), description='Lote', date=date(2024, 1, 1),
+                        type='expense', category=category, user=user)
+            for _ in range(300)
+        ]
+        Transaction.objects.bulk_create(batch)
+        apply_bulk_to_monthly_balances(batch)
+        self.create()
+        with CaptureQueriesContext(connection) as ctx:
+            user.delete()
+        self.assertLess(len(ctx), 25)
+        self.assertFalse(MonthlyBalance.objects.filter(user_id=user.pk).exists())
+        self.assertMatchesRebuild()
+
+
+class ValuesSerializerTests(TestCase):
+    # O caminho rápido das listagens tem que produzir exatamente a saída do ModelSerializer
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('valores', 'valores@example.com', 'senha-segura-123')
+        cls.market = Category.objects.create(name='Mercado', type='expense', user=cls.user)
+        cls.salary = Category.objects.create(name='Salário', type='income', user=cls.user)
+        for amount, day, category in (('12.5', 1, cls.market), ('3000', 2, cls.salary), ('0.01', 3, cls.market)):
+            Transaction.objects.create(
+                amount=amount, description=f'Transação {day}', date=date(2024, 2, day),
+                type=category.type, category=category, user=cls.user,
+            )
+        # Datetimes com e sem microssegundos
+        Transaction.objects.filter(amount='3000').update(
+            created_at=datetime(2024, 2, 2, 13, 5, tzinfo=dt_timezone.utc),
+            updated_at=datetime(2024, 2, 2, 13, 5, 7, 123456, tzinfo=dt_timezone.utc),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def assertSameOutput(self, serializer_class, queryset, instances=None):
+        context = {'user_id': self.user.pk}
+        fast_serializer = ValuesSerializer.for_serializer(serializer_class)
+        fast = fast_serializer.many(fast_serializer.values(queryset), context)
+        expected = serializer_class(queryset if instances is None else instances, many=True, context=context).data
+        self.assertEqual(fast, expected)
+        return fast
+
+    def test_transactions(self):
+        queryset = Transaction.objects.filter(user=self.user).order_by('date')
+        data = self.assertSameOutput(TransactionSerializer, queryset)
+        self.assertEqual([item['amount'] for item in data], ['12.50', '3000.00', '0.01'])
+        self.assertEqual(data[0]['date'], '2024-02-01')
+        self.assertEqual(data[0]['category'], self.market.pk)
+        self.assertEqual(data[0]['category_name'], 'Mercado')
+        self.assertEqual((data[1]['created_at'], data[1]['updated_at']),
+                         ('2024-02-02T13:05:00Z', '2024-02-02T13:05:07.123456Z'))
+        with timezone.override('America/Sao_Paulo'):
+            data = self.assertSameOutput(TransactionSerializer, queryset)
+        self.assertEqual(data[1]['created_at'], '2024-02-02T10:05:00-03:00')
+
+    def test_null_category(self):
+        # A FK é obrigatória no banco; a linha sem categoria é montada em memória
+        fast_serializer = ValuesSerializer.for_serializer(TransactionSerializer)
+        context = {'user_id': self.user.pk}
+        row = dict(fast_serializer.values(Transaction.objects.filter(user=self.user).order_by('date'))[0])
+        row['category'] = row['category_id'] = None
+        instance = Transaction.objects.filter(user=self.user).order_by('date').first()
+        instance.category = None
+        fast = fast_serializer.to_representation(row, context=context)
+        self.assertEqual(fast, TransactionSerializer(instance, context=context).data)
+        self.assertIsNone(fast['category'])
+        self.assertIsNone(fast['category_name'])
+
+    def test_categories(self):
+        self.assertSameOutput(CategorySerializer, Category.objects.filter(user=self.user).order_by('id'))
+
+
+class QueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('queries', 'queries@example.com', 'senha-segura-123')
+        categories = [
+            Category.objects.create(name=f'Categoria {index}', type='expense', user=cls.user)
+            for index in range(3)
+        ]
+        cls.transactions = [
+            Transaction.objects.create(
+                amount='10.00', description=f'Compra {index}', date=date(2024, 1, 1 + index),
+                type='expense', category=categories[index % 3], user=cls.user,
+            )
+            for index in range(12)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        # O mapa de categorias do usuário é carregado uma vez e fica em cache
+        get_category_map(self.user.pk)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertQueryCount(self, url, expected):
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list_query_count_does_not_depend_on_page_size(self):
+        # COUNT(*) da paginação + página; o nome da categoria vem do mapa
+        for page_size in (1, 10):
+            with mock.patch.object(PageNumberPagination, 'page_size', page_size):
+                self.assertQueryCount('/api/v1/finance/transactions/', 2)
+        for page_size in (1, 10):
+            self.assertQueryCount(f'/api/v1/finance/transactions/?pagination=cursor&page_size={page_size}', 1)
+
+    def test_retrieve_query_count(self):
+        self.assertQueryCount(f'/api/v1/finance/transactions/{self.transactions[0].pk}/', 1)
+
+    def test_summary_query_count(self):
+        # Agregação por categoria + transações recentes; depois, só o cache
+        self.assertQueryCount('/api/v1/finance/summary/', 2)
+        self.assertQueryCount('/api/v1/finance/summary/', 0)
+
+
+class AppCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cache', 'cache@example.com', 'senha-segura-123')
+        Category.objects.create(name='Salário', type='income', user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        app_cache.reset_stats()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_tests_never_use_the_development_cache(self):
+        # TEST_RUNNER troca o SQLiteCache (cache.sqlite3) pelo de TEST_CACHES
+        self.assertEqual(settings.CACHES, settings.TEST_CACHES)
+        self.assertNotIsInstance(app_cache.backend, SQLiteCache)
+
+    def test_invalidate_drops_every_key_of_the_user_namespace(self):
+        app_cache.set('ns', self.user.pk, 'a', value=1)
+        app_cache.set('ns', self.user.pk, 'b', value=2)
+        app_cache.set('ns', self.user.pk + 1, 'a', value=3)
+        app_cache.invalidate('ns', self.user.pk)
+        self.assertIsNone(app_cache.get('ns', self.user.pk, 'a'))
+        self.assertIsNone(app_cache.get('ns', self.user.pk, 'b'))
+        self.assertEqual(app_cache.get('ns', self.user.pk + 1, 'a'), 3)
+        self.assertEqual(app_cache.stats()['ns'], {'hits': 1, 'misses': 2})
+
+    def test_category_list_is_cached_until_a_category_changes(self):
+        with self.assertNumQueries(2):
+            self.client.get('/api/v1/finance/categories/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/v1/finance/categories/')
+        self.assertEqual(response.data['count'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/v1/finance/categories/', {'name': 'Aluguel', 'type': 'expense'})
+        response = self.client.get('/api/v1/finance/categories/')
+        self.assertEqual(response.data['count'], 2)
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.cache = SQLiteCache(os.path.join(directory, 'cache.sqlite3'), {})
+
+    def test_entries_expire_after_their_timeout(self):
+        now = time.time()
+        self.cache.set('curta', 'valor', 1)
+        self.cache.set_many({'lote': 'valor'}, 1)
+        self.cache.set('longa', 'valor', 300)
+        self.assertEqual(self.cache.get('curta'), 'valor')
+        with mock.patch('time.time', return_value=now + 2):
+            self.assertIsNone(self.cache.get('curta'))
+            self.assertEqual(self.cache.get_many(['curta', 'lote', 'longa']), {'longa': 'valor'})
+            self.assertEqual(self.cache.get('curta', 'padrão'), 'padrão')
+        with mock.patch('time.time', return_value=now + 301):
+            self.assertIsNone(self.cache.get('longa'))
+
+    def test_non_positive_timeout_removes_instead_of_storing(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.set('a', 10, 0)
+        self.cache.set_many({'b': 20, 'c': 30}, -1)
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {})
+        self.cache.set('d', 4)
+        self.assertTrue(self.cache.touch('d', 0))
+        self.assertIsNone(self.cache.get('d'))
+        self.assertTrue(self.cache.add('e', 5, 0))
+        self.assertIsNone(self.cache.get('e'))
+
+
+class AsyncRotatingFileHandlerTests(SimpleTestCase):
+    def test_traceback_reaches_console_and_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        filename = os.path.join(directory, 'debug.log')
+        formatter = logging.Formatter('%(levelname)s %(message)s')
+        # O handler de arquivo vem antes do console, como em settings.LOGGING
+        file_handler = AsyncRotatingFileHandler(filename)
+        file_handler.setFormatter(formatter)
+        self.addCleanup(file_handler.close)
+        stream = StringIO()
+        console_handler = logging.StreamHandler(stream)
+        console_handler.setFormatter(formatter)
+        logger = logging.getLogger('myapp.tests.logging_handlers')
+        logger.propagate = False
+        logger.addHandler(file_handler)
+        logger.addHandler(console_handler)
+        self.addCleanup(logger.removeHandler, file_handler)
+        self.addCleanup(logger.removeHandler, console_handler)
+        records = []
+        capture_handler = logging.Handler()
+        capture_handler.emit = records.append
+        logger.addHandler(capture_handler)
+        self.addCleanup(logger.removeHandler, capture_handler)
+
+        try:
+            raise ValueError('falhou')
+        except ValueError:
+            logger.exception('Erro ao processar %s', 'importação')
+        file_handler.stop()
+
+        # Os handlers seguintes recebem o registro intacto
+        self.assertIs(records[0].exc_info[0], ValueError)
+        self.assertEqual(records[0].args, ('importação',))
+        with open(filename, encoding='utf-8') as log_file:
+            outputs = {'arquivo': log_file.read(), 'console': stream.getvalue()}
+        for name, output in outputs.items():
+            with self.subTest(name):
+                self.assertIn('ERROR Erro ao processar importação', output)
+                self.assertIn('Traceback (most recent call last):', output)
+                self.assertIn('ValueError: falhou', output)
+
+
+    def test_without_max_bytes_the_file_follows_external_rotation(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        filename = os.path.join(directory, 'debug.log')
+        handler = AsyncRotatingFileHandler(filename)
+        self.addCleanup(handler.close)
+        self.assertIsInstance(handler.target, logging.handlers.WatchedFileHandler)
+        rotating = AsyncRotatingFileHandler(os.path.join(directory, 'rotativo.log'), maxBytes=1024)
+        self.addCleanup(rotating.close)
+        self.assertIsInstance(rotating.target, logging.handlers.RotatingFileHandler)
+
+        def emit(message):
+            handler.handle(logging.makeLogRecord({'msg': message, 'levelno': logging.INFO}))
+            # Espera a thread de escrita esvaziar a fila
+            handler.queue.join()
+
+        emit('antes')
+        # Como o logrotate: o arquivo é renomeado e o seguinte é criado pelo handler
+        os.rename(filename, filename + '.1')
+        emit('depois')
+        with open(filename + '.1', encoding='utf-8') as rotated, open(filename, encoding='utf-8') as current:
+            self.assertEqual((rotated.read(), current.read()), ('antes\n', 'depois\n'))
+
+
+class OnCommitInvalidationTests(TestCase):
+    # As versões do cache só mudam depois do commit de quem escreveu
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('commit', 'commit@example.com', 'senha-segura-123')
+        cls.expense = Category.objects.create(name='Mercado', type='expense', user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertInvalidatedOnCommit(self, namespace, write):
+        version = app_cache.get_version(namespace, self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            write()
+            self.assertEqual(app_cache.get_version(namespace, self.user.pk), version)
+        self.assertTrue(callbacks)
+        self.assertNotEqual(app_cache.get_version(namespace, self.user.pk), version)
+
+    def test_each_user_and_namespace_is_invalidated_once_per_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            other = User.objects.create_user('commit2', 'commit2@example.com', 'senha-segura-123')
+            other_category = Category.objects.create(name='Mercado', type='expense', user=other)
+            category = Category.objects.create(name='Cascata', type='expense', user=self.user)
+        Transaction.objects.bulk_create(
+            Transaction(amount=Decimal('1.00'), description='Lote', date=date.today(), type='expense',
+                        category=category, user=self.user)
+            for _ in range(300)
+        )
+        with mock.patch.object(app_cache, 'invalidate', wraps=app_cache.invalidate) as invalidate:
+            with self.captureOnCommitCallbacks(execute=True):
+                category.delete()
+                Transaction.objects.create(amount=Decimal('1.00'), description='Outro', date=date.today(),
+                                           type='expense', category=other_category, user=other)
+                invalidate.assert_not_called()
+        self.assertCountEqual(invalidate.call_args_list, [
+            mock.call(SUMMARY_NAMESPACE, self.user.pk),
+            mock.call(CATEGORY_LIST_NAMESPACE, self.user.pk),
+            mock.call(CATEGORY_MAP_NAMESPACE, self.user.pk),
+            mock.call(SUMMARY_NAMESPACE, other.pk),
+        ])
+
+    def test_summary(self):
+        self.assertEqual(self.client.get('/api/v1/finance/summary/').data['total_expense'], 0)
+        self.assertInvalidatedOnCommit(SUMMARY_NAMESPACE, lambda: Transaction.objects.create(
+            amount=Decimal('42.00'), description='Feira', date=date.today(), type='expense',
+            category=self.expense, user=self.user,
+        ))
+        self.assertEqual(self.client.get('/api/v1/finance/summary/').data['total_expense'], Decimal('42.00'))
+
+    def test_me_payload(self):
+        self.assertFalse(self.client.get('/api/v1/me/').data['settings']['dark_mode'])
+        settings_row = UserSettings.objects.get(user=self.user)
+        settings_row.dark_mode = True
+        self.assertInvalidatedOnCommit(ME_NAMESPACE, settings_row.save)
+        self.assertTrue(self.client.get('/api/v1/me/').data['settings']['dark_mode'])
+
+    def test_category_map_accepts_a_category_created_in_the_committed_write(self):
+        get_category_map(self.user.pk)
+        created = []
+        self.assertInvalidatedOnCommit(CATEGORY_MAP_NAMESPACE, lambda: created.append(
+            Category.objects.create(name='Farmácia', type='expense', user=self.user)
+        ))
+        response = self.client.post('/api/v1/finance/transactions/', {
+            'amount': '12.50', 'description': 'Remédio', 'date': '2024-01-10',
+            'type': 'expense', 'category': created[0].pk,
+        })
+        self.assertEqual(response.status_code, 201)
+
+    def test_bulk_category_upsert(self):
+        self.assertInvalidatedOnCommit(CATEGORY_LIST_NAMESPACE, lambda: upsert_categories(
+            self.user, [{'name': 'Aluguel', 'type': 'expense'}]
+        ))
+
+
+class TransactionCategoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('categories', 'categories@example.com', 'senha-segura-123')
+        cls.other = User.objects.create_user('other', 'other@example.com', 'senha-segura-123')
+        cls.expense = Category.objects.create(name='Mercado', type='expense', user=cls.user)
+        cls.income = Category.objects.create(name='Salário', type='income', user=cls.user)
+        cls.foreign = Category.objects.create(name='Mercado', type='expense', user=cls.other)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, category, type):
+        return self.client.post('/api/v1/finance/transactions/', {
+            'amount': '10.00', 'description': 'Compra', 'date': '2024-01-10', 'type': type, 'category': category.pk,
+        })
+
+    def test_category_must_belong_to_user_and_match_type(self):
+        self.assertEqual(self.post(self.foreign, 'expense').data, {'category': ['Categoria inválida.']})
+        self.assertIn('type', self.post(self.income, 'expense').data)
+
+        response = self.post(self.expense, 'expense')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['category_name'], 'Mercado')
+
+    def test_partial_update_checks_type_against_current_category(self):
+        transaction_id = self.post(self.expense, 'expense').data['id']
+        url = f'/api/v1/finance/transactions/{transaction_id}/'
+        self.assertEqual(self.client.patch(url, {'description': 'Feira'}).status_code, 200)
+        self.assertEqual(self.client.patch(url, {'type': 'income'}).status_code, 400)
+        response = self.client.patch(url, {'type': 'income', 'category': self.income.pk})
+        self.assertEqual(response.data['category_name'], 'Salário')
+
+    def test_renamed_category_is_rendered_with_new_name(self):
+        self.post(self.expense, 'expense')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(f'/api/v1/finance/categories/{self.expense.pk}/', {'name': 'Feira', 'type': 'expense'})
+        response = self.client.get('/api/v1/finance/transactions/')
+        self.assertEqual(response.data['results'][0]['category_name'], 'Feira')
+
+
+class CategoryUniquenessTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('unique', 'unique@example.com', 'senha-segura-123')
+        Category.objects.create(name='Mercado', type='expense', user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_duplicate_is_rejected_by_the_constraint(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/v1/finance/categories/', {'name': 'Mercado', 'type': 'expense'})
+        self.assertEqual(response.status_code, 400)
+        # Só o INSERT (entre savepoints), sem SELECT prévio
+        statements = [query['sql'].split()[0] for query in queries]
+        self.assertEqual([statement for statement in statements if statement in ('SELECT', 'INSERT')], ['INSERT'])
+        self.assertEqual(
+            response.data['non_field_errors'], ["Já existe uma categoria com o nome 'Mercado' para o tipo expense."]
+        )
+
+    def test_type_cannot_change_while_the_category_has_transactions(self):
+        category = Category.objects.get(user=self.user, name='Mercado')
+        Transaction.objects.create(
+            amount='10.00', description='Feira', date=date(2024, 1, 5), type='expense',
+            category=category, user=self.user,
+        )
+        url = f'/api/v1/finance/categories/{category.pk}/'
+        response = self.client.patch(url, {'type': 'income'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('type', response.data)
+        category.refresh_from_db()
+        self.assertEqual(category.type, 'expense')
+
+        # Renomear, ou repetir o mesmo tipo, continua permitido
+        response = self.client.patch(url, {'name': 'Feira', 'type': 'expense'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        empty = Category.objects.create(name='Vazia', type='expense', user=self.user)
+        response = self.client.patch(f'/api/v1/finance/categories/{empty.pk}/', {'type': 'income'}, format='json')
+        self.assertEqual((response.status_code, response.data['type']), (200, 'income'))
+
+    def test_bulk_creates_only_missing_categories(self):
+        response = self.client.post('/api/v1/finance/categories/bulk/', {'categories': [
+            {'name': 'Mercado', 'type': 'expense'},
+            {'name': 'Aluguel', 'type': 'expense'},
+            {'name': 'Aluguel', 'type': 'expense'},
+            {'name': 'Salário', 'type': 'income'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(len(response.data['categories']), 3)
+        self.assertEqual(Category.objects.filter(user=self.user).count(), 3)
+
+        response = self.client.post('/api/v1/finance/categories/bulk/', {
+            'categories': [{'name': 'Mercado', 'type': 'expense'}], 'on_conflict': 'update',
+        }, format='json')
+        self.assertEqual((response.status_code, response.data['created']), (200, 0))
+
+    @override_settings(DEFAULT_CATEGORIES=[('Salário', 'income'), ('Mercado', 'expense')])
+    def test_new_user_gets_default_categories(self):
+        user = User.objects.create_user('seeded', 'seeded@example.com', 'senha-segura-123')
+        self.assertEqual(set(Category.objects.filter(user=user).values_list('name', 'type')), {
+            ('Salário', 'income'), ('Mercado', 'expense'),
+        })
+
+
+class BulkTransactionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('lote', 'lote@example.com', 'senha-segura-123')
+        cls.other = User.objects.create_user('lote2', 'lote2@example.com', 'senha-segura-123')
+        cls.market = Category.objects.create(name='Mercado', type='expense', user=cls.user)
+        cls.salary = Category.objects.create(name='Salário', type='income', user=cls.user)
+        cls.foreign = Category.objects.create(name='Mercado', type='expense', user=cls.other)
+        cls.today = current_month_range()[0]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def row(self, **kwargs):
+        values = {'amount': '10.00', 'description': 'Compra', 'date': self.today.isoformat(),
+                  'type': 'expense', 'category': self.market.pk}
+        values.update(kwargs)
+        return values
+
+    def build(self, count, **kwargs):
+        values = {'amount': Decimal('1.00'), 'description': 'Lote', 'date': self.today, 'type': 'expense',
+                  'category': self.market, 'user': self.user}
+        values.update(kwargs)
+        return [Transaction(**values) for _ in range(count)]
+
+    def test_invalid_rows_are_reported_by_index_and_nothing_is_created(self):
+        response = self.client.post('/api/v1/finance/transactions/bulk/', {'transactions': [
+            self.row(),
+            self.row(amount='abc'),
+            self.row(category=self.foreign.pk),
+            self.row(category=self.salary.pk),
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Dados inválidos')
+        details = response.data['details']
+        self.assertEqual([item['index'] for item in details], [1, 2, 3])
+        self.assertIn('amount', details[0]['errors'])
+        self.assertEqual(details[1]['errors'], {'category': ['Categoria inválida.']})
+        self.assertIn('type', details[2]['errors'])
+        self.assertFalse(Transaction.objects.exists())
+
+        response = self.client.post('/api/v1/finance/transactions/bulk/', [], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Dados inválidos')
+
+    def test_failure_in_a_later_batch_rolls_back_everything(self):
+        # O terceiro lote viola o NOT NULL: os dois primeiros também são desfeitos
+        rows = self.build(4) + self.build(1, description=None)
+        with self.assertRaises(IntegrityError):
+            bulk_create_transactions(rows, batch_size=2)
+        self.assertFalse(Transaction.objects.exists())
+        self.assertFalse(MonthlyBalance.objects.exists())
+
+    def test_rollup_and_summary_follow_the_bulk_insert(self):
+        self.assertEqual(self.client.get('/api/v1/finance/summary/').data['total_expense'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/finance/transactions/bulk/', {'transactions': [
+                self.row(), self.row(amount='5.50'), self.row(amount='100.00', type='income', category=self.salary.pk),
+            ]}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data, {'created': 3})
+
+        summary = self.client.get('/api/v1/finance/summary/').data
+        self.assertEqual((summary['total_income'], summary['total_expense']), (Decimal('100.00'), Decimal('15.50')))
+        balances = sorted(MonthlyBalance.objects.filter(user=self.user).values_list('category_id', 'total', 'count'))
+        self.assertEqual(balances, [(self.market.pk, Decimal('15.50'), 2), (self.salary.pk, Decimal('100.00'), 1)])
+        rebuild_monthly_balances(self.user)
+        self.assertEqual(
+            sorted(MonthlyBalance.objects.filter(user=self.user).values_list('category_id', 'total', 'count')), balances
+        )
+
+    def test_queries_per_batch_do_not_grow_with_the_rows(self):
+        bulk_create_transactions(self.build(1))
+        rows = self.build(BULK_BATCH_SIZE * 2)
+        fields = [field for field in Transaction._meta.concrete_fields if not field.primary_key]
+        # INSERTs por lote: o SQLite limita os parâmetros por comando
+        inserts = -(-BULK_BATCH_SIZE // connection.ops.bulk_batch_size(fields, rows))
+        # Por lote: os INSERTs e um UPDATE no consolidado (com seu savepoint);
+        # mais o savepoint do atomic() externo
+        with self.assertNumQueries(2 * (inserts + 3) + 2) as ctx:
+            bulk_create_transactions(rows)
+        statements = [query['sql'].split(' ', 2)[:2] for query in ctx.captured_queries]
+        self.assertEqual(statements.count(['UPDATE', '"myapp_monthlybalance"']), 2)
+        self.assertEqual(MonthlyBalance.objects.get(user=self.user).count, BULK_BATCH_SIZE * 2 + 1)
+
+
+class StatementImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('extrato', 'extrato@example.com', 'senha-segura-123')
+        cls.market = Category.objects.create(name='Mercado', type='expense', user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def run_import(self, content, format='csv', encoding='utf-8'):
+        return StatementImporter(self.user).run(BytesIO(content.encode(encoding)), format)
+
+    def test_parse_amount_and_date(self):
+        self.assertEqual(parse_amount('1.234,56'), Decimal('1234.56'))
+        self.assertEqual(parse_amount('-1.234,56'), Decimal('-1234.56'))
+        self.assertEqual(parse_amount('R$ 1,234.5'), Decimal('1234.50'))
+        self.assertEqual(parse_amount('-10.00'), Decimal('-10.00'))
+        self.assertEqual(parse_date('31/01/2024'), date(2024, 1, 31))
+        self.assertEqual(parse_date('2024-01-31'), date(2024, 1, 31))
+        self.assertEqual(parse_date('20240131'), date(2024, 1, 31))
+        for value in ('abc', '1,2,3.4.5', 'NaN', '1e9'):
+            with self.subTest(value), self.assertRaises(ValueError):
+                parse_amount(value)
+        for value in ('31/02/2024', '2024-13-01', '20241301', ''):
+            with self.subTest(value), self.assertRaises(ValueError):
+                parse_date(value)
+
+    def test_csv_with_bom_and_pt_br_values(self):
+        result = self.run_import(
+            'Data,Descrição,Valor\n'
+            '05/03/2024,Salário,"3.000,00"\n'
+            '06/03/2024,Mercado,"-1.234,56"\n',
+            encoding='utf-8-sig',
+        )
+        self.assertEqual(result, {'created': 2, 'skipped': 0, 'errors': []})
+        rows = Transaction.objects.filter(user=self.user).order_by('date').values_list(
+            'date', 'description', 'amount', 'type'
+        )
+        self.assertEqual(list(rows), [
+            (date(2024, 3, 5), 'Salário', Decimal('3000.00'), 'income'),
+            (date(2024, 3, 6), 'Mercado', Decimal('1234.56'), 'expense'),
+        ])
+
+    def test_bad_rows_report_their_line_and_do_not_stop_the_import(self):
+        result = self.run_import(
+            'date,description,amount\n'
+            '2024-03-01,Primeira,10.00\n'
+            '2024-03-32,Data ruim,10.00\n'
+            '\n'
+            '2024-03-03,Valor ruim,dez\n'
+            '2024-03-04,Última,-5.00\n'
+        )
+        self.assertEqual(result['created'], 2)
+        self.assertEqual(result['skipped'], 2)
+        self.assertEqual([error['line'] for error in result['errors']], [3, 5])
+        self.assertEqual(
+            sorted(Transaction.objects.filter(user=self.user).values_list('description', flat=True)),
+            ['Primeira', 'Última'],
+        )
+
+    def test_ofx_blocks_with_and_without_closing_tags(self):
+        result = self.run_import(
+            'OFXHEADER:100\nDATA:OFXSGML\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n'
+            # SGML: elementos sem fechamento
+            '<STMTTRN>\n<TRNTYPE>DEBIT\n<DTPOSTED>20240305120000[-3:BRT]\n<TRNAMT>-42.50\n<NAME>Padaria\n</STMTTRN>\n'
+            # XML: tudo fechado e na mesma linha
+            '<STMTTRN><TRNTYPE>CREDIT</TRNTYPE><DTPOSTED>20240306</DTPOSTED><TRNAMT>1000.00</TRNAMT>'
+            '<MEMO>Pix recebido</MEMO></STMTTRN>\n'
+            # Bloco sem o </STMTTRN>, encerrado pelo próximo
+            '<STMTTRN>\n<TRNTYPE>DEBIT\n<DTPOSTED>20240307\n<TRNAMT>-10.00\n<NAME>Café\n'
+            '<STMTTRN>\n<TRNTYPE>DEBIT\n<DTPOSTED>20240308\n<TRNAMT>-3,50\n<NAME>Ônibus\n'
+            '</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n',
+            format='ofx',
+        )
+        self.assertEqual(result, {'created': 4, 'skipped': 0, 'errors': []})
+        rows = Transaction.objects.filter(user=self.user).order_by('date').values_list(
+            'date', 'description', 'amount', 'type'
+        )
+        self.assertEqual(list(rows), [
+            (date(2024, 3, 5), 'Padaria', Decimal('42.50'), 'expense'),
+            (date(2024, 3, 6), 'Pix recebido', Decimal('1000.00'), 'income'),
+            (date(2024, 3, 7), 'Café', Decimal('10.00'), 'expense'),
+            (date(2024, 3, 8), 'Ônibus', Decimal('3.50'), 'expense'),
+        ])
+
+    def test_unknown_categories_are_created_once(self):
+        resolver = CategoryResolver(self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(resolver.resolve('mercado', 'expense'), self.market.pk)
+        travel = resolver.resolve('Viagem', 'expense')
+        with self.assertNumQueries(0):
+            self.assertEqual(resolver.resolve('VIAGEM', 'expense'), travel)
+        self.assertNotEqual(resolver.resolve('Viagem', 'income'), travel)
+        self.assertEqual(Category.objects.get(pk=travel).name, 'Viagem')
+
+        result = self.run_import(
+            'data,descricao,valor,categoria\n'
+            '2024-03-01,Hotel,-300.00,viagem\n'
+            '2024-03-02,Sem categoria,-1.00,\n'
+        )
+        self.assertEqual(result['created'], 2)
+        self.assertEqual(
+            dict(Transaction.objects.filter(user=self.user).values_list('description', 'category__name')),
+            {'Hotel': 'Viagem', 'Sem categoria': 'Importado'},
+        )
+
+    def test_import_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        upload = SimpleUploadedFile('extrato.csv', '\ufeffdata,valor\n01/03/2024,"-1,00"\nontem,1\n'.encode())
+        response = client.post('/api/v1/finance/transactions/import/', {'file': upload})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors'], [{'line': 3, 'error': "Data inválida: 'ontem'"}])
+
+        upload = SimpleUploadedFile('extrato.txt', b'x')
+        response = client.post('/api/v1/finance/transactions/import/', {'file': upload, 'format': 'qif'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Dados inválidos')
+
+
+class TransactionExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('exporta', 'exporta@example.com', 'senha-segura-123')
+        cls.other = User.objects.create_user('exporta2', 'exporta2@example.com', 'senha-segura-123')
+        cls.market = Category.objects.create(name='Mercado', type='expense', user=cls.user)
+        cls.salary = Category.objects.create(name='Salário', type='income', user=cls.user)
+        cls.first = Transaction.objects.create(
+            amount='3000.00', description='Salário, março', date=date(2024, 3, 1),
+            type='income', category=cls.salary, user=cls.user,
+        )
+        cls.second = Transaction.objects.create(
+            amount='12.5', description='Pão "francês"', date=date(2024, 3, 2),
+            type='expense', category=cls.market, user=cls.user,
+        )
+        Transaction.objects.create(
+            amount='99.00', description='De outro usuário', date=date(2024, 3, 1), type='expense',
+            category=Category.objects.create(name='Mercado', type='expense', user=cls.other), user=cls.other,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, output):
+        response = self.client.get('/api/v1/finance/transactions/export/', {'output': output})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="transacoes.{output}"')
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export(self):
+        content = self.export('csv')
+        self.assertEqual(list(csv.reader(StringIO(content))), [
+            ['id', 'date', 'description', 'amount', 'type', 'category', 'category_name'],
+            [str(self.first.pk), '2024-03-01', 'Salário, março', '3000.00', 'income', str(self.salary.pk), 'Salário'],
+            [str(self.second.pk), '2024-03-02', 'Pão "francês"', '12.50', 'expense', str(self.market.pk), 'Mercado'],
+        ])
+
+    def test_ndjson_export(self):
+        lines = self.export('ndjson').splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [
+            {'id': self.first.pk, 'date': '2024-03-01', 'description': 'Salário, março', 'amount': '3000.00',
+             'type': 'income', 'category': self.salary.pk, 'category_name': 'Salário'},
+            {'id': self.second.pk, 'date': '2024-03-02', 'description': 'Pão "francês"', 'amount': '12.50',
+             'type': 'expense', 'category': self.market.pk, 'category_name': 'Mercado'},
+        ])
+        response = self.client.get('/api/v1/finance/transactions/export/', {'output': 'xml'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Dados inválidos')
+
+    def test_rows_without_category(self):
+        # A FK é obrigatória hoje; os formatadores ainda assim aceitam a linha sem ela
+        row = (7, date(2024, 3, 3), 'Sem categoria', Decimal('1.00'), 'expense', None, None)
+        self.assertEqual(list(iter_csv_export([row]))[1], '7,2024-03-03,Sem categoria,1.00,expense,,\r\n')
+        self.assertEqual(json.loads(next(iter_ndjson_export([row])))['category'], None)
+
+
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('async', 'async@example.com', 'senha-segura-123')
+        category = Category.objects.create(name='Mercado', type='expense', user=cls.user)
+        for index in range(12):
+            Transaction.objects.create(
+                amount='10.00', description=f'Compra {index}', date=date(2024, 1, 1 + index),
+                type='expense', category=category, user=cls.user,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def test_async_views_match_sync_views(self):
+        for path in ('finance/summary/', 'finance/transactions/?page=2', 'finance/transactions/?pagination=cursor',
+                     'finance/categories/', 'me/'):
+            cache.clear()
+            expected = self.client.get(f'/api/v1/{path}')
+            cache.clear()
+            response = self.client.get(f'/api/v1/async/{path}')
+            self.assertEqual(response.status_code, expected.status_code, path)
+            self.assertEqual(response.content.replace(b'/async', b''), expected.content, path)
+
+    def test_async_views_require_authentication(self):
+        response = APIClient().get('/api/v1/async/finance/summary/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('jwt', 'jwt@example.com', 'senha-segura-123')
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.token = str(AccessToken.for_user(self.user))
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def assertStatus(self, status_code):
+        self.assertEqual(self.client.get('/api/v1/finance/categories/').status_code, status_code)
+        self.assertEqual(self.client.get('/api/v1/async/finance/categories/').status_code, status_code)
+
+    def test_deactivated_user_is_rejected_despite_the_cached_record(self):
+        self.assertStatus(200)
+        self.assertIsNotNone(cache.get(auth_user_cache_key(self.user.pk)))
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.get(pk=self.user.pk)
+            user.is_active = False
+            user.save()
+        self.assertStatus(401)
+
+    def test_deleted_user_is_rejected(self):
+        self.assertStatus(200)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.get(pk=self.user.pk).delete()
+        self.assertStatus(401)
+
+    def test_expired_token_is_rejected_even_with_a_token_cache_hit(self):
+        self.assertStatus(200)
+        self.assertIsNotNone(token_cache.get(self.token.encode()))
+        later = datetime.now(dt_timezone.utc) + timedelta(hours=2)
+        with mock.patch('time.time', return_value=later.timestamp()), \
+                mock.patch('rest_framework_simplejwt.tokens.aware_utcnow', return_value=later):
+            self.assertIsNone(token_cache.get(self.token.encode()))
+            self.assertStatus(401)
+
+    def test_last_login_only_save_keeps_the_cached_record(self):
+        self.assertStatus(200)
+        key = auth_user_cache_key(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            update_last_login(None, self.user)
+        self.assertIsNotNone(cache.get(key))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Novo'
+            self.user.save()
+        self.assertIsNone(cache.get(key))
+
+    def test_slim_user_answers_staff_and_permission_checks(self):
+        permission = Permission.objects.get(codename='add_category')
+        self.user.user_permissions.add(permission)
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        authentication = CachedJWTAuthentication()
+        validated = authentication.get_validated_token(self.token.encode())
+        authentication.get_user(validated)
+        with self.assertNumQueries(0):
+            user = authentication.get_user(validated)
+        self.assertTrue(user.is_staff)
+        self.assertFalse(user.is_superuser)
+        self.assertTrue(user.has_perm('myapp.add_category'))
+        self.assertFalse(user.has_perm('myapp.delete_category'))
+
+        superuser = User.objects.create_superuser('raiz', 'raiz@example.com', 'senha-segura-123')
+        validated = authentication.get_validated_token(str(AccessToken.for_user(superuser)).encode())
+        self.assertTrue(authentication.get_user(validated).has_perm('myapp.delete_category'))
+
+
+class UserRowsTests(TestCase):
+    def test_new_user_gets_profile_and_settings(self):
+        user = User.objects.create_user('novo', 'novo@example.com', 'senha-segura-123')
+        self.assertTrue(UserProfile.objects.filter(user=user).exists())
+        self.assertTrue(UserSettings.objects.filter(user=user).exists())
+
+    def test_saving_an_existing_user_does_not_touch_profile_or_settings(self):
+        user = User.objects.create_user('existente', 'existente@example.com', 'senha-segura-123')
+        user = User.objects.get(pk=user.pk)
+        profile_updated_at = UserProfile.objects.get(user=user).updated_at
+        user.first_name = 'Maria'
+        with self.assertNumQueries(1) as ctx:
+            user.save()
+        self.assertTrue(ctx.captured_queries[0]['sql'].startswith('UPDATE "auth_user"'))
+        # O login grava só o last_login
+        with self.assertNumQueries(1):
+            update_last_login(None, user)
+        self.assertEqual(UserProfile.objects.get(user=user).updated_at, profile_updated_at)
+
+    def test_ensure_user_rows_repairs_missing_rows(self):
+        user = User.objects.create_user('incompleto', 'incompleto@example.com', 'senha-segura-123')
+        UserProfile.objects.filter(user=user).delete()
+        UserSettings.objects.filter(user=user).delete()
+        user = User.objects.get(pk=user.pk)
+        repaired = ensure_user_rows(user)
+        self.assertEqual(repaired.profile, UserProfile.objects.get(user=user))
+        self.assertEqual(repaired.settings, UserSettings.objects.get(user=user))
+        # Com as linhas já carregadas, não consulta de novo
+        with self.assertNumQueries(0):
+            ensure_user_rows(repaired)
+
+        # Só a que falta é criada
+        UserSettings.objects.filter(user=user).delete()
+        user = User.objects.get(pk=user.pk)
+        ensure_user_rows(user)
+        self.assertEqual(user.profile.pk, repaired.profile.pk)
+        self.assertEqual(UserSettings.objects.filter(user=user).count(), 1)
+
+        UserProfile.objects.filter(user=user).delete()
+        cache.clear()
+        client = APIClient()
+        client.force_authenticate(User.objects.get(pk=user.pk))
+        response = client.get('/api/v1/me/')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertTrue(UserProfile.objects.filter(user=user).exists())
+
+
+class MeETagTests(TestCase):
+    urls = ('/api/v1/me/', '/api/v1/users/me/', '/api/v1/async/me/')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('etag', 'etag@example.com', 'senha-segura-123')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def etags(self):
+        etags = {}
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            etags[url] = response['ETag']
+        return etags
+
+    def assertNotModified(self, etags):
+        for url, etag in etags.items():
+            with self.subTest(url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                self.assertEqual(response['ETag'], etag)
+
+    def assertChanged(self, etags):
+        for url, etag in etags.items():
+            with self.subTest(url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+                self.assertTrue(response.content)
+
+    def test_matching_etag_gives_304_with_empty_body(self):
+        self.assertNotModified(self.etags())
+
+    def test_profile_update_changes_the_etag(self):
+        etags = self.etags()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch('/api/v1/users/me/profile/', {'bio': 'Nova bio'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertChanged(etags)
+        self.assertEqual(self.client.get('/api/v1/me/').data['profile']['bio'], 'Nova bio')
+        self.assertNotModified(self.etags())
+
+    def test_settings_update_changes_the_etag(self):
+        etags = self.etags()
+        settings_id = UserSettings.objects.get(user=self.user).pk
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/v1/settings/{settings_id}/', {'dark_mode': True}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertChanged(etags)
+        self.assertTrue(self.client.get('/api/v1/me/').data['settings']['dark_mode'])
+
+
+class TimeseriesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('series', 'series@example.com', 'senha-segura-123')
+        cls.salary = Category.objects.create(name='Salário', type='income', user=cls.user)
+        cls.market = Category.objects.create(name='Mercado', type='expense', user=cls.user)
+        for day, amount, category in ((3, '1000.00', cls.salary), (3, '50.00', cls.market),
+                                      (10, '30.00', cls.market), (40, '20.00', cls.market)):
+            Transaction.objects.create(
+                amount=amount, description='Lançamento', date=date(2024, 1, 1) + timedelta(days=day - 1),
+                type=category.type, category=category, user=cls.user,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, **params):
+        return self.client.get('/api/v1/finance/timeseries/', params)
+
+    def test_monthly_series_is_read_from_the_rollup(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(start='2024-01-01', end='2024-03-31')
+        self.assertIn('myapp_monthlybalance', queries[-1]['sql'])
+        self.assertEqual(
+            [(point['period'], point['income'], point['expense'], point['balance']) for point in response.data['series']],
+            [(date(2024, 1, 1), '1000.00', '80.00', '920.00'),
+             (date(2024, 2, 1), '0.00', '20.00', '-20.00'),
+             (date(2024, 3, 1), '0.00', '0.00', '0.00')],
+        )
+        # Strings com duas casas no JSON, como o amount, nunca floats
+        self.assertEqual(response.json()['series'][1],
+                         {'period': '2024-02-01', 'income': '0.00', 'expense': '20.00', 'balance': '-20.00'})
+
+    def test_weekly_series_split_by_category(self):
+        response = self.get(start='2024-01-01', end='2024-01-14', granularity='week', by_category='true')
+        self.assertEqual([point['expense'] for point in response.json()['series']], ['50.00', '30.00'])
+        market = next(item for item in response.json()['categories'] if item['category'] == self.market.pk)
+        self.assertEqual(market['category_name'], 'Mercado')
+        self.assertEqual([point['total'] for point in market['series']], ['50.00', '30.00'])
+        salary = next(item for item in response.json()['categories'] if item['category'] == self.salary.pk)
+        self.assertEqual([point['total'] for point in salary['series']], ['1000.00', '0.00'])
+
+    def test_response_size_is_bounded(self):
+        response = self.get(start='2000-01-01', end='2024-01-01', granularity='day')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Dados inválidos')
+        self.assertEqual(self.get(start='2000-01-01', end='2024-12-31').status_code, 200)
+
+    def test_dates_near_the_calendar_limits_are_rejected(self):
+        for params in (
+            {'end': '9999-12-31'},
+            {'start': '9999-12-01', 'end': '9999-12-31'},
+            {'start': '9999-12-31', 'end': '9999-12-31', 'granularity': 'day'},
+            {'start': '9999-12-27', 'end': '9999-12-31', 'granularity': 'week'},
+            {'end': '0001-01-10'},
+            {'start': '0001-01-01', 'end': '0001-01-31'},
+        ):
+            with self.subTest(params):
+                response = self.get(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data['error'], 'Dados inválidos')
+        self.assertEqual(self.get(start='9998-12-01', end='9998-12-31').status_code, 200)
+        self.assertEqual(self.get(start='0002-01-01', end='0002-01-31', granularity='week').status_code, 200)
+
+
+class RunningBalanceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('saldo', 'saldo@example.com', 'senha-segura-123')
+        salary = Category.objects.create(name='Salário', type='income', user=cls.user)
+        market = Category.objects.create(name='Mercado', type='expense', user=cls.user)
+        # 30 transações em três meses, várias no mesmo dia
+        for i in range(30):
+            category = salary if i % 4 == 0 else market
+            Transaction.objects.create(
+                amount=Decimal(100 + i * 7) / 10, description='Lançamento',
+                date=date(2024, 1, 1) + timedelta(days=i * 3 - i % 2), type=category.type,
+                category=category, user=cls.user,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        balance, self.expected = Decimal('0'), {}
+        for item in Transaction.objects.filter(user=self.user).order_by('date', 'id'):
+            balance += item.amount if item.type == 'income' else -item.amount
+            self.expected[item.pk] = balance
+
+    def balances(self, response):
+        results = response.json()['results']
+        for item in results:
+            # Mesmo formato do amount: string com duas casas, nunca float
+            self.assertRegex(item['running_balance'], r'^-?\d+\.\d{2}$')
+        return {item['id']: Decimal(item['running_balance']) for item in results}
+
+    def test_balance_matches_the_ledger_on_every_page(self):
+        for page in (1, 2, 3):
+            response = self.client.get('/api/v1/finance/transactions/', {'page': page, 'running_balance': 'true'})
+            balances = self.balances(response)
+            self.assertTrue(balances)
+            self.assertEqual(balances, {pk: self.expected[pk] for pk in balances})
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        response = client.get('/api/v1/async/finance/transactions/', {'page': 3, 'running_balance': 'true'})
+        balances = self.balances(response)
+        self.assertEqual(balances, {pk: self.expected[pk] for pk in balances})
+
+    def test_filtered_pages_use_the_whole_ledger(self):
+        # Uma receita anos antes: entra no saldo pelo consolidado mensal
+        old = Transaction.objects.create(
+            amount=Decimal('1000.00'), description='Saldo inicial', date=date(2019, 6, 1), type='income',
+            category=Category.objects.get(user=self.user, name='Salário'), user=self.user,
+        )
+        self.setUp()
+        market = Category.objects.get(user=self.user, name='Mercado')
+        for params in ({'type': 'income'}, {'category': market.pk}, {'search': 'lancamento', 'page': 2},
+                       {'type': 'income', 'pagination': 'cursor', 'page_size': 3}, {'ordering': 'date'}):
+            with self.subTest(params):
+                with CaptureQueriesContext(connection) as ctx:
+                    response = self.client.get('/api/v1/finance/transactions/', {**params, 'running_balance': '1'})
+                balances = self.balances(response)
+                self.assertTrue(balances)
+                self.assertEqual(balances, {pk: self.expected[pk] for pk in balances})
+                # Checkpoints do consolidado e a window function dos meses da página
+                balance_queries = [query for query in ctx.captured_queries if 'OVER' in query['sql']
+                                   or 'myapp_monthlybalance' in query['sql']]
+                self.assertEqual(len(balance_queries), 2)
+        self.assertEqual(self.expected[old.pk], Decimal('1000.00'))
+
+    def test_balance_is_opt_in_and_served_by_the_async_list(self):
+        response = self.client.get('/api/v1/finance/transactions/')
+        self.assertNotIn('running_balance', response.data['results'][0])
+        expected = self.client.get('/api/v1/finance/transactions/', {'page': 2, 'running_balance': '1'})
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        response = client.get('/api/v1/async/finance/transactions/', {'page': 2, 'running_balance': '1'})
+        self.assertEqual(response.content.replace(b'/async', b''), expected.content)
+
+
+class TransactionCursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cursor', 'cursor@example.com', 'senha-segura-123')
+        cls.other = User.objects.create_user('cursor2', 'cursor2@example.com', 'senha-segura-123')
+        cls.category = category = Category.objects.create(name='Mercado', type='expense', user=cls.user)
+        # Várias transações no mesmo dia: o desempate é pelo id
+        Transaction.objects.bulk_create(
+            Transaction(amount='10.00', description=f'Compra {index}', date=date(2024, 3, 1 + index % 3),
+                        type='expense', category=category, user=cls.user)
+            for index in range(14)
+        )
+        Transaction.objects.create(
+            amount='1.00', description='Outro usuário', date=date(2024, 3, 2), type='expense',
+            category=Category.objects.create(name='Mercado', type='expense', user=cls.other), user=cls.other,
+        )
+        cls.expected = list(
+            Transaction.objects.filter(user=cls.user).order_by('-date', '-id').values_list('id', flat=True)
+        )
+
+    def setUp(self):
+        cache.clear()
+        # As views assíncronas autenticam pelo token, não pelo force_authenticate
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def get(self, url, params=None, status=200):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status, response.content)
+        return response.json()
+
+    def test_forward_and_backward_walks_have_no_duplicates_or_gaps(self):
+        for url in ('/api/v1/finance/transactions/', '/api/v1/async/finance/transactions/'):
+            with self.subTest(url):
+                page = self.get(url, {'pagination': 'cursor', 'page_size': 4})
+                self.assertIsNone(page['previous'])
+                pages = [[item['id'] for item in page['results']]]
+                while page['next']:
+                    page = self.get(page['next'])
+                    pages.append([item['id'] for item in page['results']])
+                self.assertEqual([len(ids) for ids in pages], [4, 4, 4, 2])
+                self.assertEqual(sum(pages, []), self.expected)
+
+                backward = [[item['id'] for item in page['results']]]
+                while page['previous']:
+                    page = self.get(page['previous'])
+                    backward.insert(0, [item['id'] for item in page['results']])
+                self.assertEqual(sum(backward, []), self.expected)
+                self.assertIsNone(page['previous'])
+
+    def test_tampered_cursor_is_a_client_error(self):
+        def encode(querystring):
+            return b64encode(querystring.encode()).decode()
+
+        cursors = (
+            'isto-não-é-base64',
+            'Zm9v=',
+            encode('d=2024-13-01&i=1'),
+            encode('d=2024-03-01'),
+            encode('d=2024-03-01&i=abc'),
+            encode('d=2024-03-01&i=99999999999999999999999'),
+            encode('d=2024-03-01&i=1&r=x'),
+            b64encode('d=2024-03-01&i=1&r=é'.encode()).decode(),
+        )
+        for url in ('/api/v1/finance/transactions/', '/api/v1/async/finance/transactions/'):
+            for cursor in cursors:
+                with self.subTest(url=url, cursor=cursor):
+                    response = self.client.get(url, {'cursor': cursor})
+                    self.assertIn(response.status_code, (400, 404), response.content)
+
+    def test_page_size_is_capped_at_max_page_size(self):
+        Transaction.objects.bulk_create(
+            Transaction(amount='1.00', description='Lote', date=date(2024, 1, 1), type='expense',
+                        category=self.category, user=self.user)
+            for _ in range(TransactionCursorPagination.max_page_size)
+        )
+        for url in ('/api/v1/finance/transactions/', '/api/v1/async/finance/transactions/'):
+            with self.subTest(url):
+                page = self.get(url, {'pagination': 'cursor', 'page_size': 1000})
+                self.assertEqual(len(page['results']), TransactionCursorPagination.max_page_size)
+                self.assertIsNotNone(page['next'])
+
+
+class TransactionFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('filtros', 'filtros@example.com', 'senha-segura-123')
+        cls.salary = Category.objects.create(name='Salário', type='income', user=cls.user)
+        cls.market = Category.objects.create(name='Mercado', type='expense', user=cls.user)
+        for day, amount, description, category in (
+            (2, '3000.00', 'Salário março', cls.salary),
+            (5, '120.50', 'Compra no Supermercado Pão', cls.market),
+            (9, '45.00', 'Farmácia', cls.market),
+            (20, '80.00', 'Mercado do bairro', cls.market),
+        ):
+            Transaction.objects.create(
+                amount=amount, description=description, date=date(2024, 3, day),
+                type=category.type, category=category, user=cls.user,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def descriptions(self, **params):
+        response = self.client.get('/api/v1/finance/transactions/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [item['description'] for item in response.data['results']]
+
+    def test_filters_and_ordering(self):
+        self.assertEqual(self.descriptions(start='2024-03-05', end='2024-03-09'), ['Farmácia', 'Compra no Supermercado Pão'])
+        self.assertEqual(self.descriptions(type='income'), ['Salário março'])
+        self.assertEqual(self.descriptions(category=self.salary.pk), ['Salário março'])
+        self.assertEqual(
+            self.descriptions(min_amount='50', max_amount='200', ordering='date'),
+            ['Compra no Supermercado Pão', 'Mercado do bairro'],
+        )
+
+    def test_search_uses_the_fts_index_and_follows_updates(self):
+        # Prefixo, sem acento e sem diferenciar maiúsculas
+        self.assertEqual(self.descriptions(search='farmacia'), ['Farmácia'])
+        self.assertEqual(self.descriptions(search='merc bairro'), ['Mercado do bairro'])
+        Transaction.objects.filter(description='Farmácia').update(description='Drogaria')
+        self.assertEqual(self.descriptions(search='farmacia'), [])
+        self.assertEqual(self.descriptions(search='droga'), ['Drogaria'])
+
+    def test_invalid_filters_return_the_api_error_shape(self):
+        response = self.client.get('/api/v1/finance/transactions/', {'ordering': 'amount'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Dados inválidos')
+        self.assertIn('ordering', response.data['details'])
+        response = self.client.get('/api/v1/finance/transactions/', {'pagination': 'cursor', 'ordering': 'date'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/v1/finance/transactions/', {'pagination': 'cursor', 'search': 'mercado'})
+        self.assertEqual(len(response.data['results']), 1)
+
+
+class ProfilePictureTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=media_root))
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('foto', 'foto@example.com', 'senha-segura-123')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, content, name='foto.png'):
+        return self.client.patch(
+            '/api/v1/users/me/profile/', {'profile_picture': SimpleUploadedFile(name, content)}, format='multipart'
+        )
+
+    def image(self, size=(640, 480), mode='RGBA', image_format='PNG'):
+        buffer = BytesIO()
+        Image.new(mode, size, (200, 30, 30, 128) if mode == 'RGBA' else (200, 30, 30)).save(buffer, image_format)
+        return buffer.getvalue()
+
+    def test_upload_is_stored_by_content_and_variants_are_built_off_request(self):
+        content = self.image()
+        with mock.patch.object(images.executor, 'submit') as submit, self.captureOnCommitCallbacks(execute=True):
+            response = self.upload(content)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['profile_picture_variants'], {})
+        digest = hashlib.sha256(content).hexdigest()[:32]
+        self.assertTrue(response.data['profile_picture'].endswith(f'/media/profile_pictures/{digest}.png'))
+
+        # O job agendado roda aqui, na thread do teste
+        job, profile_id, name = submit.call_args.args
+        self.assertEqual(job, images.profile_picture_job)
+        images.attach_profile_picture_variants(profile_id, name)
+        variants = self.client.get('/api/v1/me/').data['profile']['profile_picture_variants']
+        self.assertEqual(set(variants), {'64', '256'})
+        self.assertTrue(variants['64']['webp'].endswith(f'/media/profile_pictures/{digest}_64.webp'))
+        with default_storage.open(f'profile_pictures/{digest}_256.jpg') as variant:
+            self.assertEqual(Image.open(variant).size, (256, 256))
+
+    def test_invalid_uploads_are_rejected_from_the_header(self):
+        response = self.upload(b'isto nao e uma imagem')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('profile_picture', response.data['details'])
+        with override_settings(MAX_IMAGE_PIXELS=1000):
+            response = self.upload(self.image(size=(100, 100), mode='RGB', image_format='JPEG'), 'foto.jpg')
+        self.assertEqual(response.status_code, 400)
+
+
+class MediaServingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.media_root)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=cls.media_root))
+        super().setUpClass()
+        cls.content = bytes(range(256)) * 8
+        cls.hashed = f'profile_pictures/{hashlib.sha256(cls.content).hexdigest()[:32]}_64.webp'
+        for name in (cls.hashed, 'profile_pictures/antiga.png'):
+            default_storage.save(name, ContentFile(cls.content))
+
+    def test_hashed_names_are_immutable_and_revalidate_to_304(self):
+        response = self.client.get(f'/media/{self.hashed}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIsNone(response.get('Content-Encoding'))
+
+        response = self.client.get(f'/media/{self.hashed}', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_other_files_get_a_content_etag_and_ranges(self):
+        response = self.client.get('/media/profile_pictures/antiga.png', HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        self.assertEqual(response['ETag'], '"%s"' % hashlib.sha256(self.content).hexdigest()[:32])
+        self.assertIn('no-cache', response['Cache-Control'])
+        response = self.client.get('/media/profile_pictures/antiga.png', HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_open_ended_range_is_streamed_in_blocks(self):
+        size = len(self.content)
+        with mock.patch('django.http.FileResponse.block_size', 512):
+            response = self.client.get(f'/media/{self.hashed}', HTTP_RANGE='bytes=100-')
+            self.assertEqual(response.status_code, 206)
+            self.assertTrue(response.streaming)
+            chunks = list(response.streaming_content)
+        self.assertEqual(b''.join(chunks), self.content[100:])
+        # Lido em blocos do FileResponse, não num read() do intervalo inteiro
+        self.assertEqual([len(chunk) for chunk in chunks], [512, 512, 512, 512 - 100])
+        self.assertEqual(response['Content-Length'], str(size - 100))
+        self.assertEqual(response['Content-Range'], f'bytes 100-{size - 1}/{size}')
+        self.assertEqual(response['Content-Type'], 'image/webp')
+
+        response = self.client.get(f'/media/{self.hashed}', HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-10:])
+
+    def test_missing_and_outside_files_are_not_found(self):
+        self.assertEqual(self.client.get('/media/profile_pictures/nada.png').status_code, 404)
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+        self.assertEqual(self.client.post(f'/media/{self.hashed}').status_code, 405)
+
+
+class PerformanceMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='metrics', password='x')
+        category = Category.objects.create(user=cls.user, name='Mercado', type='expense')
+        Transaction.objects.bulk_create([
+            Transaction(user=cls.user, category=category, amount=Decimal('10.00'), type='expense',
+                        description=f'Compra {i}', date=date(2024, 1, 1) + timedelta(days=i))
+            for i in range(3)
+        ])
+
+    def setUp(self):
+        metrics.reset()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_reports_database_and_serializer(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/finance/transactions/')
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="%d queries"' % len(queries))
+        self.assertIn('serializer;dur=', timing)
+
+        response = self.client.patch('/api/v1/users/me/profile/', {'bio': 'Olá'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('serializer;dur=', response['Server-Timing'])
+
+    def test_metrics_endpoint_exposes_histograms_by_endpoint(self):
+        self.client.get('/api/v1/finance/transactions/')
+        self.client.get('/api/v1/finance/transactions/')
+        response = self.client.get('/api/v1/_metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        text = response.content.decode()
+        self.assertIn('# TYPE myapp_http_request_duration_seconds histogram', text)
+        self.assertIn('myapp_http_request_duration_seconds_bucket{endpoint="transaction-list",method="GET",le="+Inf"} 2', text)
+        self.assertIn('myapp_http_responses_total{endpoint="transaction-list",method="GET",status="200"} 2', text)
+        # O próprio endpoint de métricas não é registrado
+        self.assertNotIn('endpoint="metrics"', text)
+
+    def test_metrics_endpoint_is_restricted_by_ip(self):
+        response = self.client.get('/api/v1/_metrics', REMOTE_ADDR='203.0.113.5')
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(QUERY_INSPECTOR=True, QUERY_INSPECTOR_RAISE=True, QUERY_REPEAT_THRESHOLD=3)
+class QueryInspectorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(username=f'inspecionado{i}', password='x') for i in range(5)]
+        for user in cls.users:
+            ensure_user_rows(user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.users[0])}')
+
+    def test_normalized_signature_ignores_literals_and_in_list_size(self):
+        self.assertEqual(
+            normalize_sql("SELECT * FROM t WHERE a = 'x' AND b IN (%s, %s, %s) LIMIT 21"),
+            normalize_sql("SELECT *  FROM t WHERE a = 'y''z' AND b IN (%s) LIMIT 1"),
+        )
+
+    def test_repeated_queries_fail_with_the_offending_stack_logged_once(self):
+        # UserSerializer sem o select_related de setup_eager_loading: N+1
+        with self.assertLogs('myapp.queryinspector', 'WARNING') as logs:
+            for _ in range(2):
+                with self.assertRaisesRegex(QueryProblem, r'consulta repetida 5x \(limite 3\)'):
+                    with inspect_queries('usuarios'):
+                        UserSerializer(User.objects.order_by('id'), many=True).data
+        self.assertEqual(len(logs.output), 2)  # profile e settings, uma vez cada
+        self.assertIn('test_repeated_queries_fail', logs.output[0])
+
+        with inspect_queries('usuarios'):
+            UserSerializer(UserSerializer.setup_eager_loading(User.objects.order_by('id')), many=True).data
+
+    def test_api_endpoints_stay_within_the_query_budget(self):
+        for url in ('/api/v1/finance/summary/', '/api/v1/users/', '/api/v1/users/me/', '/api/v1/me/',
+                    '/api/v1/finance/transactions/', '/api/v1/async/finance/transactions/'):
+            self.assertEqual(self.client.get(url).status_code, 200, url)
+
+
+class BenchmarkSuiteTests(TestCase):
+    def test_generated_data_is_reproducible_and_rolled_up(self):
+        totals = []
+        for _ in range(2):
+            users = generate_benchmark_data(users=2, categories=3, transactions=40, prefix='gerado', batch_size=15)
+            transactions = Transaction.objects.filter(user__in=users)
+            self.assertEqual(transactions.count(), 80)
+            self.assertEqual(Category.objects.filter(user__in=users).count(), 6)
+            self.assertFalse(transactions.exclude(type=F('category__type')).exists())
+            self.assertEqual(
+                MonthlyBalance.objects.filter(user__in=users).aggregate(total=Sum('total'))['total'],
+                transactions.aggregate(total=Sum('amount'))['total'],
+            )
+            totals.append(transactions.aggregate(total=Sum('amount'))['total'])
+        self.assertEqual(totals[0], totals[1])
+        self.assertEqual(User.objects.filter(username__startswith='gerado-').count(), 2)
+
+    def test_workloads_run_against_the_test_client(self):
+        generate_benchmark_data(users=2, categories=2, transactions=30, prefix='carga')
+        users = benchmark_users('carga')
+        report = run_benchmark(TestClientTarget(), list(WORKLOADS), users, requests=2, warmup=0)
+        self.assertEqual(report['dataset'], {'users': 2, 'transactions': 60})
+        for name, result in report['workloads'].items():
+            self.assertEqual(result['errors'], 0, (name, result['statuses']))
+            self.assertLessEqual(result['p50'], result['p99'])
+        json.dumps(report)
@@ -0,0 +1,126 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .balances import money
+from .categories import get_category_map
+from .models import MonthlyBalance, Transaction
+
+GRANULARITIES = ('day', 'week', 'month')
+# Limites do tamanho da resposta: pontos da série e pontos por categoria
+TIMESERIES_MAX_BUCKETS = 500
+TIMESERIES_MAX_POINTS = 10000
+# Datas aceitas: next_bucket e o intervalo padrão andam até um ano a partir
+# das datas pedidas, o que estouraria (OverflowError) perto de date.min/max
+TIMESERIES_MIN_DATE = date(date.min.year + 1, 1, 1)
+TIMESERIES_MAX_DATE = date(date.max.year - 1, 12, 31)
+
+BUCKET_EXPRESSIONS = {
+    'day': F('date'),
+    'week': TruncWeek('date'),
+    'month': TruncMonth('date'),
+}
+
+
+def bucket_start(value, granularity):
+    if granularity == 'week':
+        return value - timedelta(days=value.weekday())
+    if granularity == 'month':
+        return value.replace(day=1)
+    return value
+
+
+def next_bucket(value, granularity):
+    if granularity == 'week':
+        return value + timedelta(days=7)
+    if granularity == 'month':
+        return (value + timedelta(days=32)).replace(day=1)
+    return value + timedelta(days=1)
+
+
+def month_end(value):
+    return next_bucket(value.replace(day=1), 'month') - timedelta(days=1)
+
+
+def iter_buckets(start, end, granularity):
+    bucket = bucket_start(start, granularity)
+    while bucket <= end:
+        yield bucket
+        bucket = next_bucket(bucket, granularity)
+
+
+def count_buckets(start, end, granularity):
+    start = bucket_start(start, granularity)
+    if granularity == 'month':
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    return (end - start).days // (7 if granularity == 'week' else 1) + 1
+
+
+def default_range(granularity, today=None):
+    # Últimos 12 meses (inteiros), 12 semanas ou 30 dias, terminando hoje
+    today = today or timezone.localdate()
+    if granularity == 'month':
+        start = today.replace(day=1)
+        for _ in range(11):
+            start = (start - timedelta(days=1)).replace(day=1)
+        return start, month_end(today)
+    return today - timedelta(days=12 * 7 - 1 if granularity == 'week' else 29), today
+
+
+def uses_rollup(start, end, granularity):
+    # Meses inteiros saem do consolidado mensal: O(meses x categorias) linhas
+    return granularity == 'month' and start.day == 1 and end == month_end(end)
+
+
+def bucket_rows(user, start, end, granularity, by_category=False):
+    group_by = ['bucket', 'category_id'] if by_category else ['bucket']
+    if uses_rollup(start, end, granularity):
+        queryset = MonthlyBalance.objects.filter(user=user, month__range=[start, end]).annotate(bucket=F('month'))
+        amount = 'total'
+    else:
+        # Agregação no banco sobre o índice (user, date), um grupo por período
+        queryset = Transaction.objects.filter(user=user, date__range=[start, end]).annotate(
+            bucket=BUCKET_EXPRESSIONS[granularity]
+        )
+        amount = 'amount'
+    return queryset.values(*group_by).annotate(
+        income=Sum(amount, filter=Q(type='income')),
+        expense=Sum(amount, filter=Q(type='expense')),
+    ).order_by(*group_by)
+
+
+def get_financial_timeseries(user, start, end, granularity, by_category=False):
+    buckets = list(iter_buckets(start, end, granularity))
+    totals = {bucket: [Decimal('0'), Decimal('0')] for bucket in buckets}
+    per_category = {}
+    for row in bucket_rows(user, start, end, granularity, by_category):
+        income, expense = row['income'] or Decimal('0'), row['expense'] or Decimal('0')
+        totals[row['bucket']][0] += income
+        totals[row['bucket']][1] += expense
+        if by_category:
+            per_category.setdefault(row['category_id'], {})[row['bucket']] = income + expense
+
+    data = {
+        'granularity': granularity,
+        'start': start,
+        'end': end,
+        'series': [
+            {'period': bucket, 'income': money(income), 'expense': money(expense), 'balance': money(income - expense)}
+            for bucket, (income, expense) in totals.items()
+        ],
+    }
+    if by_category:
+        categories = get_category_map(user.pk)
+        data['categories'] = [
+            {
+                'category': category_id,
+                'category_name': categories.get(category_id, (None, None))[0],
+                'type': categories.get(category_id, (None, None))[1],
+                'series': [{'period': bucket, 'total': money(series.get(bucket, Decimal('0')))} for bucket in buckets],
+            }
+            for category_id, series in sorted(per_category.items())
+        ]
+    return data
@@ -10,7 +10,6 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 import os
-
 from pathlib import Path
 from datetime import timedelta
 
@@ -53,6 +52,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Arquivos de MEDIA_URL, antes de sessão, autenticação e GZip
+    'myapp.media.MediaFilesMiddleware',
+    # Server-Timing e histogramas por endpoint (/api/v1/_metrics)
+    'myapp.metrics.PerformanceMiddleware',
+    # Detector de N+1 e consultas lentas nas views da API (QUERY_INSPECTOR)
+    'myapp.queryinspector.QueryInspectorMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -169,6 +174,12 @@ FILE_UPLOAD_DIRECTORY_PERMISSIONS = 0o755
 # Image upload settings
 ALLOWED_IMAGE_EXTENSIONS = ['jpg', 'jpeg', 'png', 'gif']
 MAX_IMAGE_SIZE = 5242880  # 5MB
+MAX_IMAGE_PIXELS = 40000000  # largura x altura
+
+# Variantes da foto de perfil (lado em px e formatos), geradas em segundo plano
+PROFILE_PICTURE_SIZES = [64, 256]
+PROFILE_PICTURE_FORMATS = ['webp', 'jpeg']
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -214,14 +225,14 @@ CORS_ALLOW_METHODS = [
 ]
 
 # Configurações adicionais de CORS
-CORS_EXPOSE_HEADERS = ['Content-Type', 'X-CSRFToken']
+CORS_EXPOSE_HEADERS = ['Content-Type', 'X-CSRFToken', 'Server-Timing']
 CORS_PREFLIGHT_MAX_AGE = 86400  # 24 horas
 
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'myapp.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -249,6 +260,9 @@ SIMPLE_JWT = {
     'JTI_CLAIM': 'jti',
 }
 
+# Tempo que o registro enxuto do usuário autenticado fica em cache
+AUTH_USER_CACHE_TTL = 60 * 5  # 5 minutos
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Minha API Django',
 }
@@ -285,8 +299,13 @@ LOGGING = {
         },
         'file': {
             'level': 'DEBUG',
-            'class': 'logging.FileHandler',
+            # Escrita em thread própria; ver myapp/logging_handlers.py. A rotação
+            # interna só vale com um processo (runserver): com vários workers,
+            # LOG_MAX_BYTES=0 (padrão sem DEBUG) e rotação externa (logrotate)
+            'class': 'myapp.logging_handlers.AsyncRotatingFileHandler',
             'filename': 'debug.log',
+            'maxBytes': int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024 if DEBUG else 0)),
+            'backupCount': 5,
             'formatter': 'verbose',
         },
         'django.server': {
@@ -308,7 +327,8 @@ LOGGING = {
         },
         'myapp': {
             'handlers': ['console', 'file'],
-            'level': 'DEBUG',
+            # Payloads e passos de validação saem em DEBUG; em produção fica INFO
+            'level': os.environ.get('MYAPP_LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO'),
             'propagate': True,
         },
     },
@@ -336,12 +356,47 @@ CSRF_TRUSTED_ORIGINS = [
 ]
 
 # Cache settings
+# Cache compartilhado entre os workers num arquivo SQLite próprio; ver
+# myapp/cache_backends.py. Resumo, categorias e /me passam por myapp/cache.py.
 CACHES = {
+    'default': {
+        'BACKEND': 'myapp.cache_backends.SQLiteCache',
+        'LOCATION': os.environ.get('CACHE_LOCATION', BASE_DIR / 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+        },
+    }
+}
+# Cache dos testes, aplicado pelo TEST_RUNNER em qualquer comando de teste:
+# eles não leem nem gravam o cache.sqlite3 do servidor de desenvolvimento
+TEST_CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+        'LOCATION': 'myapp-tests',
     }
 }
+TEST_RUNNER = 'myproject.test_runner.TestRunner'
+APP_CACHE_ALIAS = 'default'
+
+# Categorias criadas para cada novo usuário, em uma única instrução:
+# [('Salário', 'income'), ('Mercado', 'expense'), ...]
+DEFAULT_CATEGORIES = []
+
+# Métricas de desempenho (myapp.metrics): Server-Timing em cada resposta e
+# histogramas por endpoint em /api/v1/_metrics, liberado só para estes IPs
+PERFORMANCE_METRICS = os.environ.get('PERFORMANCE_METRICS', 'true').lower() != 'false'
+METRICS_ALLOWED_IPS = os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+
+# Detector de N+1 e consultas lentas (myapp.queryinspector): loga a pilha uma
+# vez por assinatura quando a mesma consulta normalizada roda mais de
+# QUERY_REPEAT_THRESHOLD vezes numa requisição ou passa de QUERY_SLOW_MS;
+# com QUERY_INSPECTOR_RAISE=true a detecção vira erro (e falha os testes).
+# Desligado por padrão: a captura de pilha custa caro e não deve ligar junto
+# com um DEBUG esquecido em produção
+QUERY_INSPECTOR = os.environ.get('QUERY_INSPECTOR', 'false').lower() == 'true'
+QUERY_REPEAT_THRESHOLD = int(os.environ.get('QUERY_REPEAT_THRESHOLD', 5))
+QUERY_SLOW_MS = int(os.environ.get('QUERY_SLOW_MS', 100))
+QUERY_INSPECTOR_RAISE = os.environ.get('QUERY_INSPECTOR_RAISE', 'false').lower() == 'true'
 
 # Cache timeout
 CACHE_TTL = 60 * 15  # 15 minutos
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    DiscoverRunner com o cache de settings.TEST_CACHES. A troca acontece no
+    próprio runner, e não nos settings, para valer em manage.py test,
+    django-admin test ou com outro DJANGO_SETTINGS_MODULE.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.caches_override = override_settings(CACHES=settings.TEST_CACHES)
+        self.caches_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.caches_override.disable()
+        super().teardown_test_environment(**kwargs)